@@ -0,0 +1,294 @@
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+import orjson
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import CacheGeneration, engine, write_engine
+from app.metrics import RESPONSE_CACHE_REQUESTS
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis is optional; the in-process cache stands in for it
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "cache:generation"
+# Table written by an INSERT / UPDATE / DELETE / REPLACE statement
+DML_TABLE = re.compile(r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE|DELETE\s+FROM|REPLACE\s+INTO)\s+"?(\w+)', re.IGNORECASE)
+# Writes to these tables never change a cached response; the leader lease alone is renewed every few seconds
+UNCACHED_TABLES = {"leader_leases"}
+
+# Response headers stored with a cached body; everything else is added per request by outer middleware
+CACHED_HEADERS = {b"content-type", b"etag", b"cache-control", b"x-next-cursor"}
+
+
+class MemoryCache:
+    """In-process LRU with per-entry TTL, exposing the subset of the Redis API the cache uses"""
+    
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._counters = {}
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    async def set(self, key: str, value: bytes, ex: Optional[float] = None) -> None:
+        self._entries[key] = (value, time.monotonic() + ex if ex else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+    
+    async def aclose(self) -> None:
+        pass
+
+
+class ResponseCache:
+    """Cache of whole GET responses, keyed by path, query string and the write generation.
+    
+    Every commit that wrote rows bumps the generation, which moves all keys
+    to a fresh namespace; stale entries are never read again and age out by
+    LRU or TTL. The generation is shared by every worker process: with Redis
+    it is a Redis counter, otherwise the cache_generation row, bumped inside
+    the committing transaction. A worker re-reads that row after its own
+    commits and at most every ``generation_check`` seconds otherwise, so
+    cache hits don't touch the database and a commit of another worker is
+    seen within that interval.
+    """
+    
+    def __init__(self, backend, ttl: float, max_body_bytes: int, generation_check: float = 1.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_body_bytes = max_body_bytes
+        self.generation_check = generation_check
+        self.shared = not isinstance(backend, MemoryCache)
+        self._pending: Set[asyncio.Task] = set()
+        self._generation = 0
+        self._generation_read: Optional[float] = None
+        self._local_commits = 0
+    
+    @classmethod
+    def from_settings(cls) -> Optional["ResponseCache"]:
+        if settings.CACHE_BACKEND == "none":
+            return None
+        
+        backend = None
+        if settings.CACHE_BACKEND == "redis":
+            if redis is None:
+                logger.warning("CACHE_BACKEND=redis but the 'redis' package is not installed, falling back to the in-process cache")
+            else:
+                backend = redis.from_url(settings.CACHE_REDIS_URL)
+        if backend is None:
+            backend = MemoryCache(settings.CACHE_MAX_ENTRIES)
+        return cls(
+            backend,
+            settings.CACHE_TTL_SECONDS,
+            settings.CACHE_MAX_ENTRY_BYTES,
+            settings.CACHE_GENERATION_CHECK_SECONDS
+        )
+    
+    async def generation(self) -> int:
+        if self.shared:
+            return int(await self.backend.get(GENERATION_KEY) or 0)
+        
+        now = time.monotonic()
+        if self._generation_read is None or now - self._generation_read >= self.generation_check:
+            local_commits = self._local_commits
+            async with engine.connect() as connection:
+                self._generation = await connection.scalar(
+                    select(CacheGeneration.value).where(CacheGeneration.id == 1)
+                ) or 0
+            # A commit during the read may not be in the value read, so it stays due for another read
+            if local_commits == self._local_commits:
+                self._generation_read = now
+        return self._generation
+    
+    def invalidate(self) -> None:
+        """Start a new generation after a commit; safe to call from synchronous engine events"""
+        if self.shared:
+            task = asyncio.get_running_loop().create_task(self.backend.incr(GENERATION_KEY))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+        else:
+            # The commit bumped the cache_generation row; read it on the next request
+            self._local_commits += 1
+            self._generation_read = None
+    
+    @staticmethod
+    def key(generation: int, path: str, query_string: bytes) -> str:
+        query = urlencode(sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)))
+        return f"response:{generation}:{path}?{query}"
+    
+    async def get(self, key: str) -> Optional[Tuple[list, bytes]]:
+        entry = await self.backend.get(key)
+        if entry is None:
+            return None
+        header_json, body = entry.split(b"\n", 1)
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in orjson.loads(header_json)]
+        return headers, body
+    
+    async def set(self, key: str, headers: list, body: bytes) -> None:
+        header_json = orjson.dumps([(name.decode("latin-1"), value.decode("latin-1")) for name, value in headers])
+        # Redis only accepts whole seconds for ex; 0 means no expiry, as in MemoryCache
+        await self.backend.set(key, header_json + b"\n" + body, ex=math.ceil(self.ttl) or None)
+    
+    async def close(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        await self.backend.aclose()
+
+
+response_cache = ResponseCache.from_settings()
+
+
+def _note_write(conn, cursor, statement, parameters, context, executemany):
+    match = DML_TABLE.match(statement)
+    if match and match.group(1).lower() not in UNCACHED_TABLES:
+        conn.info["cache_dirty"] = True
+
+
+def _bump_generation(session):
+    """Bump the cache_generation row inside the transaction of a session that is committing writes"""
+    if response_cache is None or response_cache.shared or not session.in_transaction():
+        return
+    
+    # Pending ORM changes are flushed now, so their statements are seen by _note_write
+    session.flush()
+    connection = session.connection()
+    if connection.info.get("cache_dirty"):
+        connection.execute(
+            update(CacheGeneration).where(CacheGeneration.id == 1).values(value=CacheGeneration.value + 1)
+        )
+
+
+def _on_commit(conn):
+    if conn.info.pop("cache_dirty", False) and response_cache is not None:
+        response_cache.invalidate()
+
+
+def _on_rollback(conn):
+    conn.info.pop("cache_dirty", None)
+
+
+# Every write goes through the writer engine, so its commits are the invalidation points
+event.listen(write_engine.sync_engine, "after_cursor_execute", _note_write)
+event.listen(write_engine.sync_engine, "commit", _on_commit)
+event.listen(write_engine.sync_engine, "rollback", _on_rollback)
+event.listen(Session, "before_commit", _bump_generation)
+
+
+def _etag_matches(if_none_match: Optional[bytes], etag: bytes) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix(b"W/") for tag in if_none_match.split(b",")}
+    return b"*" in tags or etag.removeprefix(b"W/") in tags
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving repeated GETs under ``prefixes`` from the response cache.
+    
+    Successful responses get an ETag (their own, or a hash of the body) and
+    ``Cache-Control: no-cache``, so browsers revalidate with If-None-Match and
+    get a bodiless 304 straight from the cache. ``X-Cache`` tells HIT from MISS.
+    """
+    
+    def __init__(self, app, prefixes: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+        self.exclude = tuple(exclude)
+    
+    def _cacheable(self, scope) -> bool:
+        return (
+            response_cache is not None
+            and scope["type"] == "http"
+            and scope["method"] == "GET"
+            and scope["path"].startswith(self.prefixes)
+            and not scope["path"].startswith(self.exclude)
+        )
+    
+    async def __call__(self, scope, receive, send):
+        if not self._cacheable(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        if_none_match = dict(scope["headers"]).get(b"if-none-match")
+        key = response_cache.key(await response_cache.generation(), scope["path"], scope["query_string"])
+        cached = await response_cache.get(key)
+        if cached is not None:
+            RESPONSE_CACHE_REQUESTS.labels("hit").inc()
+            headers, body = cached
+            await self._send(send, headers, body, if_none_match, b"HIT")
+            return
+        
+        RESPONSE_CACHE_REQUESTS.labels("miss").inc()
+        start_message = None
+        chunks = []
+        
+        async def capture(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+        
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+        
+        if start_message["status"] != 200 or len(body) > response_cache.max_body_bytes:
+            await send({**start_message, "headers": [*start_message.get("headers", []), (b"x-cache", b"BYPASS")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        
+        headers = [(name, value) for name, value in start_message.get("headers", []) if name.lower() in CACHED_HEADERS]
+        header_names = {name.lower() for name, _ in headers}
+        if b"etag" not in header_names:
+            headers.append((b"etag", f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'.encode()))
+        if b"cache-control" not in header_names:
+            headers.append((b"cache-control", b"no-cache"))
+        
+        await response_cache.set(key, headers, body)
+        await self._send(send, headers, body, if_none_match, b"MISS")
+    
+    @staticmethod
+    async def _send(send, headers: list, body: bytes, if_none_match: Optional[bytes], cache_status: bytes) -> None:
+        etag = next(value for name, value in headers if name.lower() == b"etag")
+        if _etag_matches(if_none_match, etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", etag), (b"x-cache", cache_status)]
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+        
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [*headers, (b"content-length", str(len(body)).encode()), (b"x-cache", cache_status)]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -8,11 +8,52 @@ class Settings:
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./activities.db")
     
+    # SQLite tuning (ignored for other databases)
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))  # bytes, 0 disables mmap
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    
     # Intervals.icu API
     INTERVALS_ICU_API_KEY: str = os.getenv("INTERVALS_ICU_API_KEY", "")
     INTERVALS_ICU_ATHLETE_ID: str = os.getenv("INTERVALS_ICU_ATHLETE_ID", "")
     INTERVALS_ICU_BASE_URL: str = os.getenv("INTERVALS_ICU_BASE_URL", "https://intervals.icu/api/v1")
     
+    # Intervals.icu HTTP connection pool
+    INTERVALS_ICU_MAX_CONNECTIONS: int = int(os.getenv("INTERVALS_ICU_MAX_CONNECTIONS", "20"))
+    INTERVALS_ICU_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("INTERVALS_ICU_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    INTERVALS_ICU_KEEPALIVE_EXPIRY: float = float(os.getenv("INTERVALS_ICU_KEEPALIVE_EXPIRY", "30"))
+    INTERVALS_ICU_HTTP2: bool = os.getenv("INTERVALS_ICU_HTTP2", "false").lower() == "true"
+    
+    # Intervals.icu rate limiting and retries
+    INTERVALS_ICU_MAX_CONCURRENCY: int = int(os.getenv("INTERVALS_ICU_MAX_CONCURRENCY", "8"))
+    INTERVALS_ICU_REQUESTS_PER_SECOND: float = float(os.getenv("INTERVALS_ICU_REQUESTS_PER_SECOND", "10"))
+    INTERVALS_ICU_RATE_BURST: int = int(os.getenv("INTERVALS_ICU_RATE_BURST", "10"))
+    INTERVALS_ICU_MAX_RETRIES: int = int(os.getenv("INTERVALS_ICU_MAX_RETRIES", "3"))
+    INTERVALS_ICU_BACKOFF_BASE: float = float(os.getenv("INTERVALS_ICU_BACKOFF_BASE", "0.5"))
+    INTERVALS_ICU_BACKOFF_MAX: float = float(os.getenv("INTERVALS_ICU_BACKOFF_MAX", "30"))
+    # Retries per endpoint may add at most this fraction of its requests in the last 10 s, plus a floor of RETRY_BUDGET_MIN
+    INTERVALS_ICU_RETRY_BUDGET_RATIO: float = float(os.getenv("INTERVALS_ICU_RETRY_BUDGET_RATIO", "0.2"))
+    INTERVALS_ICU_RETRY_BUDGET_MIN: int = int(os.getenv("INTERVALS_ICU_RETRY_BUDGET_MIN", "10"))
+    
+    # Intervals.icu timeouts (seconds): connecting, then a whole request per endpoint
+    INTERVALS_ICU_CONNECT_TIMEOUT: float = float(os.getenv("INTERVALS_ICU_CONNECT_TIMEOUT", "5"))
+    INTERVALS_ICU_TIMEOUT_ATHLETE: float = float(os.getenv("INTERVALS_ICU_TIMEOUT_ATHLETE", "5"))
+    INTERVALS_ICU_TIMEOUT_ACTIVITIES: float = float(os.getenv("INTERVALS_ICU_TIMEOUT_ACTIVITIES", "30"))
+    INTERVALS_ICU_TIMEOUT_ACTIVITY: float = float(os.getenv("INTERVALS_ICU_TIMEOUT_ACTIVITY", "15"))
+    INTERVALS_ICU_TIMEOUT_STREAMS: float = float(os.getenv("INTERVALS_ICU_TIMEOUT_STREAMS", "60"))
+    
+    # Intervals.icu circuit breaker: this many failed attempts in a row (5xx, timeouts, connection errors)
+    # make requests fail fast for BREAKER_RESET_SECONDS, after which one trial request may close it again
+    INTERVALS_ICU_BREAKER_FAILURES: int = int(os.getenv("INTERVALS_ICU_BREAKER_FAILURES", "5"))
+    INTERVALS_ICU_BREAKER_RESET_SECONDS: float = float(os.getenv("INTERVALS_ICU_BREAKER_RESET_SECONDS", "30"))
+    
+    # /health/intervals caches its upstream probe: fresh for HEALTH_TTL_SECONDS, then served stale while
+    # a background probe refreshes it, up to HEALTH_MAX_STALE_SECONDS past that
+    INTERVALS_ICU_HEALTH_TTL_SECONDS: float = float(os.getenv("INTERVALS_ICU_HEALTH_TTL_SECONDS", "30"))
+    INTERVALS_ICU_HEALTH_MAX_STALE_SECONDS: float = float(os.getenv("INTERVALS_ICU_HEALTH_MAX_STALE_SECONDS", "300"))
+    
     # Application
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-key")
@@ -22,5 +63,50 @@ class Settings:
     
     # Scheduler
     FETCH_INTERVAL_MINUTES: int = int(os.getenv("FETCH_INTERVAL_MINUTES", "60"))
+    SYNC_ATHLETE_CONCURRENCY: int = int(os.getenv("SYNC_ATHLETE_CONCURRENCY", "8"))  # athletes fetched in parallel
+    SYNC_STAGGER_SECONDS: float = float(os.getenv("SYNC_STAGGER_SECONDS", "60"))  # athlete start times spread over this
+    
+    # Leader election: with several workers or machines only the lease holder runs the scheduler and sync jobs
+    LEADER_ELECTION: bool = os.getenv("LEADER_ELECTION", "true").lower() == "true"
+    LEADER_LEASE_SECONDS: float = float(os.getenv("LEADER_LEASE_SECONDS", "30"))  # failover time after a leader dies
+    
+    # Webhooks: with a secret set, pushed events drive ingestion and polling only reconciles
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_RECONCILE_MINUTES: int = int(os.getenv("WEBHOOK_RECONCILE_MINUTES", "360"))
+    
+    # Full-history diff against Intervals.icu: catches upstream deletions and edits older than the sync lookback
+    RECONCILE_INTERVAL_HOURS: float = float(os.getenv("RECONCILE_INTERVAL_HOURS", "24"))
+    
+    # Sync
+    SYNC_UPSERT_CHUNK_SIZE: int = int(os.getenv("SYNC_UPSERT_CHUNK_SIZE", "500"))
+    SYNC_INITIAL_DAYS: int = int(os.getenv("SYNC_INITIAL_DAYS", "7"))  # range of the first incremental sync
+    SYNC_LOOKBACK_DAYS: int = int(os.getenv("SYNC_LOOKBACK_DAYS", "1"))  # re-checked days before the cursor
+    SYNC_JOB_WORKERS: int = int(os.getenv("SYNC_JOB_WORKERS", "2"))  # sync jobs run concurrently
+    SYNC_JOB_WINDOW_DAYS: int = int(os.getenv("SYNC_JOB_WINDOW_DAYS", "30"))  # days fetched per job page
+    SYNC_JOB_POLL_SECONDS: float = float(os.getenv("SYNC_JOB_POLL_SECONDS", "2"))  # how often the leader picks up sync jobs and webhook events queued by other workers
+    
+    # Training load (CTL/ATL time constants in days)
+    FITNESS_CTL_DAYS: int = int(os.getenv("FITNESS_CTL_DAYS", "42"))
+    FITNESS_ATL_DAYS: int = int(os.getenv("FITNESS_ATL_DAYS", "7"))
+    ATHLETE_FTP: float = float(os.getenv("ATHLETE_FTP", "0"))  # watts; 0 derives FTP from the stored NP / IF
+    
+    # Backfill
+    BACKFILL_WINDOW_DAYS: int = int(os.getenv("BACKFILL_WINDOW_DAYS", "30"))
+    
+    # Raw payload archive: keeps every synced payload (compressed) so new fields can be re-parsed without the API
+    RAW_ARCHIVE: bool = os.getenv("RAW_ARCHIVE", "true").lower() == "true"
+    
+    # Response cache for GET /activities*: memory (in-process LRU), redis (shared, needs the redis package) or none
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory").lower()
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_TTL_SECONDS: float = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+    CACHE_MAX_ENTRY_BYTES: int = int(os.getenv("CACHE_MAX_ENTRY_BYTES", "1048576"))  # larger responses are not cached
+    CACHE_GENERATION_CHECK_SECONDS: float = float(os.getenv("CACHE_GENERATION_CHECK_SECONDS", "1"))  # memory backend: how soon other workers' writes are seen
+    
+    # Instrumentation
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "0"))  # log queries slower than this; 0 disables
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "false").lower() == "true"  # exposes /debug/profile
+    PROFILER_MAX_SECONDS: float = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
 
 settings = Settings()
\ No newline at end of file
@@ -1,24 +1,90 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Text, Boolean
+from sqlalchemy import cast, event, func, insert, inspect, select, update, Column, ForeignKey, Index, Integer, String, Date, DateTime, Float, Text, Boolean, LargeBinary
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import relationship
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import List, Optional
+import asyncio
+import logging
 
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Async drivers used when DATABASE_URL names only the database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Map a plain DATABASE_URL (sqlite:///, postgresql://) to its async driver"""
+    scheme, separator, rest = url.partition("://")
+    if not separator or "+" in scheme:
+        return url
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+DATABASE_URL = get_async_database_url(settings.DATABASE_URL)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLite performance profile to every new connection"""
+    cursor = dbapi_connection.cursor()
+    # busy_timeout first so the remaining pragmas wait instead of failing
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    # Negative cache_size is in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # SQLite ignores REFERENCES clauses unless enabled on each connection
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def _apply_sqlite_writer_pragmas(dbapi_connection, connection_record):
+    """Writer-only settings; journal_mode is persistent, so setting it once here covers readers too"""
+    _apply_sqlite_pragmas(dbapi_connection, connection_record)
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.close()
+
 # Create engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+engine = create_async_engine(DATABASE_URL)
+
+# SQLite allows a single writer at a time: all writes go through one
+# connection, serialized by a lock, so readers (WAL) never see "database is locked"
+if IS_SQLITE:
+    write_engine = create_async_engine(DATABASE_URL, pool_size=1, max_overflow=0)
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    event.listen(write_engine.sync_engine, "connect", _apply_sqlite_writer_pragmas)
+else:
+    write_engine = engine
+
+_write_lock = asyncio.Lock() if IS_SQLITE else None
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes must stay loaded after commit, async sessions cannot lazy-load
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+WriteSessionLocal = async_sessionmaker(write_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 class Activity(Base):
     __tablename__ = "activities"
+    __table_args__ = (
+        # Keyset pagination over (start_date DESC, id DESC)
+        Index("ix_activities_start_date_id", "start_date", "id"),
+        # Same pagination within one athlete
+        Index("ix_activities_athlete_start_date_id", "athlete_id", "start_date", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     intervals_icu_id = Column(String, unique=True, index=True)
+    # NULL for activities synced with the INTERVALS_ICU_* credentials. Deleting an athlete
+    # with activities is refused: deactivate it instead, so the summaries and the changes
+    # feed, which are maintained by the ORM writes, never miss a row
+    athlete_id = Column(Integer, ForeignKey("athletes.id", ondelete="RESTRICT"))
+    athlete = relationship("Athlete", back_populates="activities", lazy="raise")  # async: load with selectinload
     
     # Basic activity info
     name = Column(String, index=True)
@@ -51,15 +117,391 @@ class Activity(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     synced_at = Column(DateTime)
+    content_hash = Column(String(64))  # SHA-256 of the synced fields, used to skip unchanged rows
+    change_seq = Column(Integer, index=True)  # position in the changes feed, bumped on every write
+
+class ActivityTag(Base):
+    """One tag of an activity, normalized out of Activity.tags so tag filters are index lookups"""
+    __tablename__ = "activity_tags"
+    __table_args__ = (
+        Index("ix_activity_tags_tag_activity_id", "tag", "activity_id"),
+    )
+    
+    activity_id = Column(Integer, primary_key=True)
+    tag = Column(String, primary_key=True)  # lower-cased, see split_tags
+
+def split_tags(tags: Optional[str]) -> List[str]:
+    """Split a comma-separated tags string into unique, trimmed, lower-cased tags"""
+    return list(dict.fromkeys(tag.strip().lower() for tag in (tags or "").split(",") if tag.strip()))
+
+class ActivityTombstone(Base):
+    """A deleted activity, kept so the changes feed can tell clients to drop it"""
+    __tablename__ = "activity_tombstones"
+    
+    change_seq = Column(Integer, primary_key=True)
+    activity_id = Column(Integer, nullable=False)
+    intervals_icu_id = Column(String)
+    athlete_id = Column(Integer)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+class ChangeSequence(Base):
+    """Counter handing out the change_seq of activity writes and tombstones"""
+    __tablename__ = "change_sequence"
+    
+    id = Column(Integer, primary_key=True)  # single row, id=1
+    value = Column(Integer, nullable=False, default=0)  # last number handed out
+
+class CacheGeneration(Base):
+    """Response cache generation shared by all worker processes, bumped in every commit that wrote rows"""
+    __tablename__ = "cache_generation"
+    
+    id = Column(Integer, primary_key=True)  # single row, id=1
+    value = Column(Integer, nullable=False, default=0)
+
+class Athlete(Base):
+    __tablename__ = "athletes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    intervals_icu_athlete_id = Column(String, unique=True, nullable=False)
+    name = Column(String)
+    api_key = Column(String)  # NULL falls back to INTERVALS_ICU_API_KEY (e.g. a coach key with access to the team)
+    active = Column(Boolean, default=True, nullable=False)
+    
+    last_sync_at = Column(DateTime)
+    last_sync_status = Column(String)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # passive_deletes="all": the ORM leaves the activities alone and the database refuses the delete
+    activities = relationship("Activity", back_populates="athlete", lazy="raise", passive_deletes="all")
+    
+    @property
+    def has_api_key(self) -> bool:
+        return bool(self.api_key)
+
+class ActivityStream(Base):
+    """One recorded channel (power, heart rate, ...) of an activity, stored as a single compressed blob"""
+    __tablename__ = "activity_streams"
+    
+    activity_id = Column(Integer, primary_key=True)
+    channel = Column(String, primary_key=True)
+    
+    length = Column(Integer, nullable=False)  # number of samples
+    scale = Column(Float, nullable=False)  # stored integers are round(value * scale)
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed little-endian int32 deltas
+    missing = Column(LargeBinary)  # zlib-compressed bitmap of null samples, NULL when complete
+    
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+class ActivityCurve(Base):
+    """Mean-maximal curve of one channel of an activity, cached when its streams are stored"""
+    __tablename__ = "activity_curves"
+    
+    activity_id = Column(Integer, primary_key=True)
+    channel = Column(String, primary_key=True)
+    
+    # Copied from the activity so season-best queries don't need a join
+    start_date = Column(DateTime, index=True)
+    type = Column(String)
+    
+    values = Column(LargeBinary, nullable=False)  # float32 best average per CURVE_DURATIONS entry, NaN when too short
+    
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class ActivityRaw(Base):
+    """Raw Intervals.icu payload of an activity, compressed, so it can be re-parsed without the API"""
+    __tablename__ = "activity_raw"
+    
+    intervals_icu_id = Column(String, primary_key=True)
+    athlete_id = Column(Integer)  # athlete whose credentials fetched it, NULL for the INTERVALS_ICU_* ones
+    
+    codec = Column(String, nullable=False)  # zstd or zlib
+    dictionary_id = Column(Integer)  # archive_dictionaries row it was compressed with, NULL for none
+    payload_hash = Column(String(32), nullable=False)  # BLAKE2b of the canonical JSON, to skip unchanged payloads
+    size = Column(Integer, nullable=False)  # uncompressed bytes
+    data = Column(LargeBinary, nullable=False)
+    
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+class ArchiveDictionary(Base):
+    """Compression dictionary shared by archived payloads, trained once enough of them are archived"""
+    __tablename__ = "archive_dictionaries"
+    
+    id = Column(Integer, primary_key=True)
+    codec = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    samples = Column(Integer)  # payloads it was built from
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ActivitySummaryRow(Base):
+    """Materialized totals behind /activities/summary, maintained on every write"""
+    __tablename__ = "activity_summary"
+    
+    id = Column(Integer, primary_key=True)  # single row, id=1
+    total_activities = Column(Integer, nullable=False, default=0)
+    total_distance = Column(Float, nullable=False, default=0.0)
+    total_moving_time = Column(Integer, nullable=False, default=0)
+    recent_activity_id = Column(Integer)
+    
+    # Incremented on every change, used as the summary ETag
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DailyRollup(Base):
+    """Per-day, per-type training totals, refreshed for the affected days on every write"""
+    __tablename__ = "daily_rollups"
+    
+    day = Column(Date, primary_key=True)
+    type = Column(String, primary_key=True)  # empty string for activities without a type
+    
+    activity_count = Column(Integer, nullable=False, default=0)
+    distance = Column(Float, nullable=False, default=0.0)  # meters
+    moving_time = Column(Integer, nullable=False, default=0)  # seconds
+    tss = Column(Float, nullable=False, default=0.0)
+
+class SyncJob(Base):
+    """A queued POST /activities/sync run over a date range, with its progress"""
+    __tablename__ = "sync_jobs"
+    __table_args__ = (
+        Index("ix_sync_jobs_status", "status"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    athlete_id = Column(Integer)  # NULL for the INTERVALS_ICU_* credentials
+    
+    # Requested range; limit caps a single-page fetch, NULL walks the whole range in windows
+    oldest = Column(Date, nullable=False)
+    newest = Column(Date, nullable=False)
+    limit = Column(Integer)
+    
+    status = Column(String, nullable=False, default="queued")  # queued, running, success, error
+    pages_total = Column(Integer, default=0)
+    pages_fetched = Column(Integer, default=0)
+    activities_fetched = Column(Integer, default=0)
+    activities_created = Column(Integer, default=0)
+    activities_updated = Column(Integer, default=0)
+    activities_unchanged = Column(Integer, default=0)
+    error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class WebhookEvent(Base):
+    """Activity change received by a process that isn't the leader, waiting for the leader's webhook worker"""
+    __tablename__ = "webhook_events"
+    
+    intervals_icu_id = Column(String, primary_key=True)  # one row per activity: later events replace the action
+    action = Column(String, nullable=False)  # upsert or delete
+    athlete_id = Column(String)  # Intervals.icu athlete id from the event
+    received_at = Column(DateTime, default=datetime.utcnow)
+
+class LeaderLease(Base):
+    """Time-limited lock naming the one process allowed to run background work"""
+    __tablename__ = "leader_leases"
+    
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)  # host:pid:nonce of the process holding the lease
+    acquired_at = Column(DateTime)
+    renewed_at = Column(DateTime)
+    expires_at = Column(DateTime, nullable=False)  # any process may take the lease over after this (UTC)
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+    
+    name = Column(String, primary_key=True)
+    
+    # High-water marks of the last successful sync
+    cursor_start_date = Column(DateTime)  # newest activity start_date seen
+    cursor_updated = Column(DateTime)  # newest server-side modification timestamp seen (UTC)
+    last_success_at = Column(DateTime)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+@asynccontextmanager
+async def write_session():
+    """Session on the serialized writer connection, for code that modifies data"""
+    if _write_lock is None:
+        async with WriteSessionLocal() as db:
+            yield db
+        return
+    
+    async with _write_lock:
+        async with WriteSessionLocal() as db:
+            yield db
+
+# Dependency for endpoints that write
+async def get_write_db():
+    async with write_session() as db:
         yield db
-    finally:
-        db.close()
+
+# Text searched by GET /activities/search; the PostgreSQL index and queries must use this exact expression
+SEARCH_DOCUMENT_SQL = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(tags, ''))"
+)
+
+# External-content FTS5 index over the activities table, kept in sync by triggers
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts USING fts5("
+    "name, description, tags, content='activities', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS activities_fts_insert AFTER INSERT ON activities BEGIN "
+    "INSERT INTO activities_fts(rowid, name, description, tags) VALUES (new.id, new.name, new.description, new.tags); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS activities_fts_delete AFTER DELETE ON activities BEGIN "
+    "INSERT INTO activities_fts(activities_fts, rowid, name, description, tags) "
+    "VALUES ('delete', old.id, old.name, old.description, old.tags); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS activities_fts_update AFTER UPDATE OF name, description, tags ON activities BEGIN "
+    "INSERT INTO activities_fts(activities_fts, rowid, name, description, tags) "
+    "VALUES ('delete', old.id, old.name, old.description, old.tags); "
+    "INSERT INTO activities_fts(rowid, name, description, tags) VALUES (new.id, new.name, new.description, new.tags); "
+    "END",
+]
+
+def _create_search_index(connection):
+    """Create the full-text index: FTS5 on SQLite, a GIN expression index on PostgreSQL"""
+    if connection.dialect.name == "sqlite":
+        exists = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'activities_fts'").first()
+        for statement in SQLITE_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        if not exists:
+            # Index the rows stored before the table existed
+            connection.exec_driver_sql("INSERT INTO activities_fts(activities_fts) VALUES ('rebuild')")
+            logger.info("Created full-text index activities_fts")
+    elif connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_activities_search ON activities USING gin (({SEARCH_DOCUMENT_SQL}))")
+
+def _backfill_activity_tags(connection):
+    """Fill activity_tags from the tags strings of activities stored before the table existed"""
+    rows = connection.execute(select(Activity.id, Activity.tags).where(Activity.tags != "")).all()
+    tag_rows = [{"activity_id": activity_id, "tag": tag} for activity_id, tags in rows for tag in split_tags(tags)]
+    if tag_rows:
+        connection.execute(insert(ActivityTag), tag_rows)
+        logger.info(f"Backfilled {len(tag_rows)} activity tags")
+
+def _backfill_change_seq(connection):
+    """Number activities stored before the changes feed existed and create the sequence row"""
+    current = connection.execute(select(ChangeSequence.value).where(ChangeSequence.id == 1)).scalar()
+    if current is None:
+        current = connection.execute(select(func.max(Activity.change_seq))).scalar() or 0
+        connection.execute(insert(ChangeSequence).values(id=1, value=current))
+    
+    result = connection.execute(
+        update(Activity).where(Activity.change_seq.is_(None)).values(change_seq=Activity.id + current)
+    )
+    if result.rowcount:
+        last = connection.execute(select(func.max(Activity.change_seq))).scalar()
+        connection.execute(update(ChangeSequence).where(ChangeSequence.id == 1).values(value=last))
+        logger.info(f"Assigned change sequence numbers to {result.rowcount} activities")
+
+def _create_activity_summary(connection):
+    """Compute the materialized summary row for databases that don't have one yet"""
+    if connection.execute(select(ActivitySummaryRow.id).where(ActivitySummaryRow.id == 1)).first() is not None:
+        return
+    
+    totals = connection.execute(
+        select(func.count(Activity.id), func.sum(Activity.distance), func.sum(Activity.moving_time))
+    ).first()
+    recent_activity_id = connection.execute(
+        select(Activity.id).order_by(Activity.start_date.desc(), Activity.id.desc()).limit(1)
+    ).scalar()
+    connection.execute(insert(ActivitySummaryRow).values(
+        id=1,
+        total_activities=totals[0] or 0,
+        total_distance=float(totals[1] or 0),
+        total_moving_time=int(totals[2] or 0),
+        recent_activity_id=recent_activity_id,
+        version=1
+    ))
+    logger.info(f"Created activity summary: {totals[0] or 0} activities")
+
+def _backfill_daily_rollups(connection):
+    """Populate rollups for databases that have activities from before rollups existed"""
+    if (
+        connection.execute(select(DailyRollup.day).limit(1)).first() is not None
+        or connection.execute(select(Activity.id).limit(1)).first() is None
+    ):
+        return
+    
+    if connection.dialect.name == "sqlite":
+        day_expression = func.date(Activity.start_date, type_=Date)
+    else:
+        day_expression = cast(Activity.start_date, Date)
+    rollups = select(
+        day_expression,
+        func.coalesce(Activity.type, ""),
+        func.count(Activity.id),
+        func.coalesce(func.sum(Activity.distance), 0.0),
+        func.coalesce(func.sum(Activity.moving_time), 0),
+        func.coalesce(func.sum(Activity.tss), 0.0)
+    ).where(Activity.start_date.isnot(None)).group_by(day_expression, func.coalesce(Activity.type, ""))
+    
+    result = connection.execute(
+        insert(DailyRollup).from_select(["day", "type", "activity_count", "distance", "moving_time", "tss"], rollups)
+    )
+    logger.info(f"Created {result.rowcount} daily rollups")
+
+def _create_cache_generation(connection):
+    if connection.execute(select(CacheGeneration.id).where(CacheGeneration.id == 1)).first() is None:
+        connection.execute(insert(CacheGeneration).values(id=1, value=0))
+
+def _upgrade_existing_tables(connection):
+    """Add columns and indexes introduced after a table was first created.
+    
+    ``create_all`` only creates missing tables, so existing databases would
+    otherwise never receive new nullable columns or indexes.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            logger.info(f"Added column {table.name}.{column.name}")
+        
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=connection)
+                logger.info(f"Created index {index.name}")
 
 async def init_db():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    async with write_engine.begin() as connection:
+        existing_tables = await connection.run_sync(lambda sync_connection: set(inspect(sync_connection).get_table_names()))
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(_upgrade_existing_tables)
+        await connection.run_sync(_create_search_index)
+        if "activity_tags" not in existing_tables:
+            await connection.run_sync(_backfill_activity_tags)
+        await connection.run_sync(_backfill_change_seq)
+        await connection.run_sync(_create_activity_summary)
+        await connection.run_sync(_backfill_daily_rollups)
+        await connection.run_sync(_create_cache_generation)
+
+async def dispose_db():
+    """Close all pooled database connections"""
+    if IS_SQLITE:
+        # Let SQLite refresh planner statistics for tables that changed during this run
+        try:
+            async with write_engine.connect() as connection:
+                await connection.exec_driver_sql("PRAGMA optimize")
+        except Exception as e:
+            logger.warning(f"PRAGMA optimize failed: {e}")
+        await write_engine.dispose()
+    await engine.dispose()
\ No newline at end of file
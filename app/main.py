@@ -5,9 +5,12 @@ from contextlib import asynccontextmanager
 import logging
 from pathlib import Path
 
-from app.database import init_db
-from app.routers import activities, health
-from app.scheduler import start_scheduler
+from app.cache import ResponseCacheMiddleware, response_cache
+from app.database import dispose_db, init_db
+from app.metrics import MetricsMiddleware, instrument_engines
+from app.routers import activities, athletes, health, metrics, sync_jobs, webhooks
+from app.scheduler import leader_election
+from app.services.intervals_client import intervals_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,14 +21,21 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
     logger.info("Starting up application...")
+    instrument_engines()
     await init_db()
-    start_scheduler()
+    await intervals_client.start()
+    await leader_election.start()
     logger.info("Application started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    await leader_election.stop()
+    await intervals_client.close()
+    if response_cache is not None:
+        await response_cache.close()
+    await dispose_db()
 
 app = FastAPI(
     title="Intervals.icu Activity Tracker",
@@ -34,6 +44,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Serve repeated reads of the activity endpoints from the response cache (inside CORS, so cached
+# responses carry no per-origin headers); exports stream and are never cached
+app.add_middleware(
+    ResponseCacheMiddleware,
+    prefixes=["/api/v1/activities"],
+    exclude=["/api/v1/activities/export"]
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -41,11 +59,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-DB-Queries", "X-Cache"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(health.router, prefix="/api/v1", tags=["health"])
 app.include_router(activities.router, prefix="/api/v1", tags=["activities"])
+app.include_router(athletes.router, prefix="/api/v1", tags=["athletes"])
+app.include_router(sync_jobs.router, prefix="/api/v1", tags=["sync"])
+app.include_router(webhooks.router, prefix="/api/v1", tags=["webhooks"])
+app.include_router(metrics.debug_router, prefix="/api/v1", tags=["debug"])
+app.include_router(metrics.router, tags=["metrics"])
 
 # Mount static files
 static_dir = Path(__file__).parent.parent / "static"
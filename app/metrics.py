@@ -0,0 +1,163 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import engine, write_engine
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests served by the API",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries executed per HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+INTERVALS_REQUEST_SECONDS = Histogram(
+    "intervals_icu_request_duration_seconds",
+    "Latency of each Intervals.icu request attempt, retries included",
+    ["endpoint", "status"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+SYNC_PHASE_SECONDS = Histogram(
+    "sync_phase_duration_seconds",
+    "Time one sync spent in each phase (fetch, parse, archive, lookup, write, commit)",
+    ["phase"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+SYNC_ACTIVITIES = Counter(
+    "sync_activities_total",
+    "Activities processed by syncs, by outcome",
+    ["outcome"]
+)
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests_total",
+    "Cacheable GET requests by cache result (hit or miss)",
+    ["result"]
+)
+LEADER = Gauge(
+    "leader",
+    "1 while this process holds the named leader lease",
+    ["name"]
+)
+INTERVALS_CIRCUIT_STATE = Gauge(
+    "intervals_icu_circuit_state",
+    "State of the Intervals.icu circuit breaker: 0 closed, 1 half-open, 2 open",
+    ["name"]
+)
+INTERVALS_CIRCUIT_REJECTIONS = Counter(
+    "intervals_icu_circuit_rejections_total",
+    "Intervals.icu requests failed fast by an open circuit breaker",
+    ["name"]
+)
+INTERVALS_RETRIES = Counter(
+    "intervals_icu_retries_total",
+    "Intervals.icu retries by endpoint, allowed or denied by the retry budget",
+    ["endpoint", "result"]
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Latency of database statements by SQL verb",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+
+# Query counter of the HTTP request being served, None outside requests
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+def observe_sync(timings: Dict[str, float], created: int = 0, updated: int = 0, unchanged: int = 0) -> None:
+    """Record the ``<phase>_ms`` timings and outcome counts of one sync"""
+    for key, ms in timings.items():
+        SYNC_PHASE_SECONDS.labels(key.removesuffix("_ms")).observe(ms / 1000)
+    SYNC_ACTIVITIES.labels("created").inc(created)
+    SYNC_ACTIVITIES.labels("updated").inc(updated)
+    SYNC_ACTIVITIES.labels("unchanged").inc(unchanged)
+
+
+def observe_intervals_request(endpoint: str, status: str, seconds: float) -> None:
+    INTERVALS_REQUEST_SECONDS.labels(endpoint, status).observe(seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    DB_QUERY_SECONDS.labels(operation).observe(elapsed)
+    
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        rows = len(parameters) if executemany else 1
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms, {rows} parameter sets): {' '.join(statement.split())[:500]}")
+
+
+def instrument_engines() -> None:
+    """Time every statement of the read and write engines (idempotent)"""
+    for async_engine in {engine, write_engine}:
+        if not event.contains(async_engine.sync_engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(async_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(async_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_template(scope) -> str:
+    """Request path with path parameter values replaced by ``{name}``.
+    
+    Requests served by the static files mount are labelled "static" and
+    anything no route matched "unmatched", so arbitrary paths never become labels.
+    """
+    if "route" not in scope:
+        return "static" if "endpoint" in scope else "unmatched"
+    
+    placeholders = {str(value): f"{{{name}}}" for name, value in scope.get("path_params", {}).items()}
+    return "/".join(placeholders.get(segment, segment) for segment in scope["path"].split("/"))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and database query count per route.
+    
+    Routes are labelled by their path template (``/api/v1/activities/{activity_id}``)
+    so label cardinality stays bounded; the query count is also returned in
+    the ``X-DB-Queries`` header.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        queries = [0]
+        token = _request_queries.set(queries)
+        status = "500"
+        started = time.perf_counter()
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                message["headers"] = [*message.get("headers", []), (b"x-db-queries", str(queries[0]).encode())]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_queries.reset(token)
+            route_path = _route_template(scope)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_path, status).observe(time.perf_counter() - started)
+            HTTP_REQUEST_DB_QUERIES.labels(scope["method"], route_path).observe(queries[0])
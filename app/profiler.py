@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Tuple
+
+# Leaf frames of an event loop that is waiting for I/O
+IDLE_FUNCTIONS = {("selectors.py", "select"), ("selectors.py", "poll")}
+
+_profile_lock = asyncio.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_thread(thread_id: int, seconds: float, interval: float) -> Tuple[Counter, int]:
+    """Sample the stack of ``thread_id`` every ``interval`` seconds.
+    
+    Returns the counts of folded stacks (root first, ``;``-separated) and the
+    number of samples taken while the thread was idle in the selector.
+    """
+    stacks: Counter = Counter()
+    idle = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+        
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FUNCTIONS:
+            idle += 1
+        else:
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return stacks, idle
+
+
+def is_profiling() -> bool:
+    return _profile_lock.locked()
+
+
+async def profile_event_loop(seconds: float, interval: float) -> Tuple[Counter, int]:
+    """Sample the event loop thread from a helper thread while the loop keeps serving.
+    
+    Only one profile runs at a time; callers check ``is_profiling`` first.
+    """
+    async with _profile_lock:
+        loop_thread_id = threading.get_ident()
+        return await asyncio.to_thread(sample_thread, loop_thread_id, seconds, interval)
+
+
+def folded(stacks: Counter) -> str:
+    """Folded-stack text (``stack count`` per line) for flamegraph.pl or speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import date
 
-from app.database import get_db
-from app.schemas.activity import Activity, ActivityUpdate, ActivitySummary, SyncStatus
-from app.services.activity_service import ActivityService
+from app.database import get_db, get_write_db, write_session
+from app.config import settings
+from app.responses import ORJSONResponse
+from app.schemas.activity import (
+    Activity, ActivityChanges, ActivityUpdate, ActivitySummary, SyncStatus, DetailSyncRequest,
+    AggregateBucket, FitnessPoint, CurvePoint, PowerMetrics, SyncJobStatus
+)
+from app.services.activity_service import ActivityService, reparse_archive, sync_activity_details
+from app.services.analytics_service import AnalyticsService
+from app.services.athlete_service import AthleteService
+from app.services.curve_service import CURVE_CHANNELS, CurveService
+from app.services.export_service import MEDIA_TYPES, export_activities
+from app.services.raw_archive import RawArchive
+from app.services.stream_service import StreamService
+from app.services.sync_jobs import sync_job_runner
 
 router = APIRouter()
 
@@ -16,45 +29,200 @@ async def get_activities(
     activity_type: Optional[str] = Query(None),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,start_date"),
+    athlete_id: Optional[int] = Query(None, description="Only activities of this registered athlete"),
+    tag: Optional[str] = Query(None, description="Only activities with this tag (case-insensitive)"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get list of activities with optional filtering"""
+    """Get list of activities with optional filtering.
+    
+    When a full page is returned, the X-Next-Cursor response header holds the
+    cursor for the next page.
+    """
     activity_service = ActivityService(db)
-    activities = activity_service.get_activities(
-        skip=skip, 
-        limit=limit,
-        activity_type=activity_type,
-        start_date=start_date,
-        end_date=end_date
-    )
-    return activities
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    
+    try:
+        rows, next_cursor = await activity_service.get_activity_rows(
+            fields=field_list,
+            skip=skip, 
+            limit=limit,
+            activity_type=activity_type,
+            start_date=start_date,
+            end_date=end_date,
+            cursor=cursor,
+            athlete_id=athlete_id,
+            tag=tag
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(rows, headers=headers)
+
+@router.get("/activities/search", response_model=List[Activity])
+async def search_activities(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in name, description and tags"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    activity_type: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    athlete_id: Optional[int] = Query(None),
+    tag: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search over activity names, descriptions and tags, best matches first"""
+    activity_service = ActivityService(db)
+    try:
+        rows = await activity_service.search_activities(
+            q, skip, limit, activity_type, start_date, end_date, athlete_id, tag
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(rows)
+
+@router.get("/activities/changes", response_model=ActivityChanges)
+async def get_activity_changes(
+    since: Optional[str] = Query(None, description="next_token of the previous batch; omit for a full initial load"),
+    limit: int = Query(500, ge=1, le=5000),
+    athlete_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Activities created, updated or deleted since the token, for incremental client sync.
+    
+    Keep calling with the returned ``next_token`` while ``has_more`` is true,
+    then store the last token for the next refresh.
+    """
+    activity_service = ActivityService(db)
+    try:
+        changes = await activity_service.get_changes(since, limit, athlete_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(changes)
 
 @router.get("/activities/summary", response_model=ActivitySummary)
-async def get_activity_summary(db: Session = Depends(get_db)):
-    """Get summary statistics for all activities"""
+async def get_activity_summary(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get summary statistics for all activities, answering 304 when the client's ETag is current"""
+    activity_service = ActivityService(db)
+    etag = f'W/"summary-{await activity_service.get_summary_version()}"'
+    
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
+    return await activity_service.get_activity_summary()
+
+@router.post("/activities/summary/rebuild", response_model=ActivitySummary)
+async def rebuild_activity_summary(db: AsyncSession = Depends(get_write_db)):
+    """Recompute the materialized summary from all activities"""
     activity_service = ActivityService(db)
-    return activity_service.get_activity_summary()
+    await activity_service.rebuild_activity_summary()
+    return await activity_service.get_activity_summary()
+
+@router.get("/activities/aggregates", response_model=List[AggregateBucket])
+async def get_activity_aggregates(
+    bucket: str = Query("week", pattern="^(day|week|month)$"),
+    activity_type: Optional[str] = Query(None, alias="type"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get distance, moving time and TSS totals per day, week (from Monday) or month"""
+    analytics_service = AnalyticsService(db)
+    return await analytics_service.get_aggregates(bucket, activity_type, start_date, end_date)
+
+@router.post("/activities/aggregates/rebuild")
+async def rebuild_activity_aggregates(db: AsyncSession = Depends(get_write_db)):
+    """Recompute the daily rollups behind the aggregates and fitness endpoints"""
+    analytics_service = AnalyticsService(db)
+    days = await analytics_service.rebuild_daily_rollups()
+    return {"message": "Daily rollups rebuilt", "days": days}
+
+@router.get("/activities/fitness", response_model=List[FitnessPoint])
+async def get_fitness(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    activity_type: Optional[str] = Query(None, alias="type"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get daily fitness (CTL), fatigue (ATL) and form (TSB) computed from TSS"""
+    analytics_service = AnalyticsService(db)
+    return await analytics_service.get_fitness(start_date, end_date, activity_type)
+
+@router.get("/activities/curves", response_model=List[CurvePoint])
+async def get_best_curve(
+    channel: str = Query("power", description="power or heart_rate"),
+    activity_type: Optional[str] = Query(None, alias="type"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Best mean-maximal values per duration across activities in the range (season-best curve)"""
+    if channel not in CURVE_CHANNELS:
+        raise HTTPException(status_code=400, detail=f"Unknown channel: {channel}")
+    return await CurveService(db).get_best_curve(channel, start_date, end_date, activity_type)
+
+@router.post("/activities/curves/rebuild")
+async def rebuild_activity_curves(db: AsyncSession = Depends(get_write_db)):
+    """Recompute the cached curves of every activity from its stored streams"""
+    activities = await StreamService(db).rebuild_curves()
+    return {"message": "Curves rebuilt", "activities": activities}
+
+@router.get("/activities/export")
+async def export_activities_endpoint(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv|parquet)$"),
+    activity_type: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    athlete_id: Optional[int] = Query(None)
+):
+    """Stream all matching activities as NDJSON, CSV or Parquet"""
+    try:
+        content = export_activities(export_format, activity_type, start_date, end_date, athlete_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="activities.{export_format}"'}
+    )
 
 @router.get("/activities/{activity_id}", response_model=Activity)
-async def get_activity(activity_id: int, db: Session = Depends(get_db)):
+async def get_activity(
+    activity_id: int,
+    include: Optional[str] = Query(None, pattern="^raw$", description="'raw' adds the archived Intervals.icu payload"),
+    db: AsyncSession = Depends(get_db)
+):
     """Get a specific activity by ID"""
     activity_service = ActivityService(db)
-    activity = activity_service.get_activity(activity_id)
+    activity = await activity_service.get_activity(activity_id)
     
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
     
+    if include == "raw":
+        # The raw payload is decompressed only on request, so plain reads stay as cheap as before
+        raw = await RawArchive(db).get(activity.intervals_icu_id)
+        return ORJSONResponse({**Activity.model_validate(activity).model_dump(), "raw": raw})
+    
     return activity
 
 @router.put("/activities/{activity_id}", response_model=Activity)
 async def update_activity(
     activity_id: int, 
     activity_data: ActivityUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update an activity"""
     activity_service = ActivityService(db)
-    activity = activity_service.update_activity(activity_id, activity_data)
+    activity = await activity_service.update_activity(activity_id, activity_data)
     
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
@@ -62,36 +230,152 @@ async def update_activity(
     return activity
 
 @router.delete("/activities/{activity_id}")
-async def delete_activity(activity_id: int, db: Session = Depends(get_db)):
+async def delete_activity(activity_id: int, db: AsyncSession = Depends(get_write_db)):
     """Delete an activity"""
     activity_service = ActivityService(db)
-    success = activity_service.delete_activity(activity_id)
+    success = await activity_service.delete_activity(activity_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Activity not found")
     
     return {"message": "Activity deleted successfully"}
 
-@router.post("/activities/sync", response_model=SyncStatus)
+@router.get("/activities/{activity_id}/streams")
+async def get_activity_streams(
+    activity_id: int,
+    channels: Optional[str] = Query(None, description="Comma-separated channels, e.g. power,heart_rate (default: all)"),
+    resolution: int = Query(1, ge=1, le=3600, description="Seconds per returned point; samples are averaged"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the recorded streams of an activity, downsampled on the server"""
+    channel_list = [channel.strip() for channel in channels.split(",") if channel.strip()] if channels else None
+    
+    try:
+        streams = await StreamService(db).get_streams(activity_id, channel_list, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if streams is None:
+        raise HTTPException(status_code=404, detail="No streams stored for this activity")
+    
+    return ORJSONResponse(streams)
+
+@router.get("/activities/{activity_id}/curve", response_model=List[CurvePoint])
+async def get_activity_curve(
+    activity_id: int,
+    channel: str = Query("power", description="power or heart_rate"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Mean-maximal curve (best 1 s ... 5 h average) of an activity"""
+    if channel not in CURVE_CHANNELS:
+        raise HTTPException(status_code=400, detail=f"Unknown channel: {channel}")
+    
+    curve = await CurveService(db).get_activity_curve(activity_id, channel)
+    if curve is None:
+        raise HTTPException(status_code=404, detail="No curve stored for this activity")
+    return curve
+
+@router.get("/activities/{activity_id}/power-metrics", response_model=PowerMetrics)
+async def get_activity_power_metrics(activity_id: int, db: AsyncSession = Depends(get_db)):
+    """NP / IF / TSS recomputed from the power stream, next to the stored values"""
+    activity = await ActivityService(db).get_activity(activity_id)
+    if not activity:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    
+    metrics = await StreamService(db).get_power_metrics(activity)
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="No power stream stored for this activity")
+    return metrics
+
+@router.post("/activities/{activity_id}/streams/sync")
+async def sync_activity_streams(activity_id: int, db: AsyncSession = Depends(get_db)):
+    """Fetch the streams of an activity from Intervals.icu and store them"""
+    activity = await ActivityService(db).get_activity(activity_id)
+    if not activity:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    
+    # The download happens before taking the writer, so other writes aren't blocked meanwhile
+    try:
+        rows, decoded = await StreamService(db).fetch_streams(activity)
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    
+    async with write_session() as write_db:
+        activity = await ActivityService(write_db).get_activity(activity_id)
+        if not activity:
+            raise HTTPException(status_code=404, detail="Activity not found")
+        stored_channels = await StreamService(write_db).store_streams(activity, rows, decoded)
+    
+    return {"activity_id": activity_id, "channels": stored_channels}
+
+@router.post("/activities/sync", response_model=SyncJobStatus, status_code=202)
 async def sync_activities(
     oldest: Optional[date] = Query(None, description="Oldest date to sync (YYYY-MM-DD)"),
     newest: Optional[date] = Query(None, description="Newest date to sync (YYYY-MM-DD)"),
-    limit: int = Query(100, ge=1, le=1000, description="Maximum number of activities to sync"),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of activities to sync (default: the whole range)"),
+    athlete_id: Optional[int] = Query(None, description="Registered athlete to sync (default: the INTERVALS_ICU_* credentials)"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Manually trigger sync of activities from Intervals.icu"""
-    activity_service = ActivityService(db)
+    """Queue a sync of activities from Intervals.icu; poll GET /sync/jobs/{id} for progress.
     
+    A range already covered by a queued or running job of the same athlete
+    returns that job instead of starting another one.
+    """
     # If no oldest date provided, default to 30 days ago
     if oldest is None:
         from datetime import timedelta
         oldest = date.today() - timedelta(days=30)
+    newest = newest or date.today()
+    if newest < oldest:
+        raise HTTPException(status_code=400, detail="newest must not be before oldest")
+    await _require_athlete(db, athlete_id)
     
-    result = await activity_service.sync_from_intervals_icu(oldest, newest, limit)
-    
+    return await sync_job_runner.submit(oldest, newest, limit, athlete_id=athlete_id)
+
+@router.post("/activities/sync/details", response_model=SyncStatus)
+async def sync_details(request: DetailSyncRequest):
+    """Fetch full details for the given Intervals.icu activities concurrently and store them"""
+    result = await sync_activity_details(request.intervals_icu_ids)
+    return _sync_status(result)
+
+@router.post("/activities/reparse", response_model=SyncStatus)
+async def reparse_activities():
+    """Re-parse every archived raw payload into its activity, without calling Intervals.icu"""
+    result = await reparse_archive()
+    return _sync_status(result)
+
+def _sync_status(result: dict) -> SyncStatus:
     return SyncStatus(
         last_sync=result.get("last_sync"),
         activities_synced=result.get("activities_synced", 0),
+        activities_updated=result.get("activities_updated", 0),
+        activities_unchanged=result.get("activities_unchanged", 0),
+        activities_failed=result.get("activities_failed", 0),
+        total_processed=result.get("total_processed", 0),
         status=result.get("status", "error"),
-        message=result.get("message")
-    )
\ No newline at end of file
+        message=result.get("message"),
+        timings=result.get("timings")
+    )
+
+@router.post("/activities/backfill", response_model=SyncJobStatus, status_code=202)
+async def backfill_activities(
+    oldest: date = Query(..., description="Oldest date to backfill (YYYY-MM-DD)"),
+    newest: Optional[date] = Query(None, description="Newest date to backfill (YYYY-MM-DD), defaults to today"),
+    athlete_id: Optional[int] = Query(None, description="Registered athlete to backfill (default: the INTERVALS_ICU_* credentials)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue a backfill of the full activity history as a sync job; poll GET /sync/jobs/{id} for progress.
+    
+    The job walks the range in SYNC_JOB_WINDOW_DAYS windows and resumes after
+    its last committed window when interrupted.
+    """
+    newest = newest or date.today()
+    if newest < oldest:
+        raise HTTPException(status_code=400, detail="newest must not be before oldest")
+    await _require_athlete(db, athlete_id)
+    
+    return await sync_job_runner.submit(oldest, newest, athlete_id=athlete_id)
+
+async def _require_athlete(db: AsyncSession, athlete_id: Optional[int]) -> None:
+    if athlete_id is not None and await AthleteService(db).get_athlete(athlete_id) is None:
+        raise HTTPException(status_code=404, detail="Athlete not found")
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.database import get_db, get_write_db
+from app.schemas.activity import SyncStatus
+from app.schemas.athlete import Athlete, AthleteCreate, AthleteUpdate
+from app.services.athlete_service import AthleteService, sync_athlete
+
+router = APIRouter()
+
+@router.get("/athletes", response_model=List[Athlete])
+async def get_athletes(active: Optional[bool] = Query(None), db: AsyncSession = Depends(get_db)):
+    """List registered athletes"""
+    return await AthleteService(db).get_athletes(active)
+
+@router.post("/athletes", response_model=Athlete, status_code=201)
+async def create_athlete(athlete_data: AthleteCreate, db: AsyncSession = Depends(get_write_db)):
+    """Register an athlete whose activities are synced by the scheduler"""
+    try:
+        return await AthleteService(db).create_athlete(athlete_data)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/athletes/{athlete_id}", response_model=Athlete)
+async def get_athlete(athlete_id: int, db: AsyncSession = Depends(get_db)):
+    """Get a specific athlete by ID"""
+    athlete = await AthleteService(db).get_athlete(athlete_id)
+    if not athlete:
+        raise HTTPException(status_code=404, detail="Athlete not found")
+    return athlete
+
+@router.put("/athletes/{athlete_id}", response_model=Athlete)
+async def update_athlete(athlete_id: int, athlete_data: AthleteUpdate, db: AsyncSession = Depends(get_write_db)):
+    """Update an athlete's name, API key or active flag"""
+    athlete = await AthleteService(db).update_athlete(athlete_id, athlete_data)
+    if not athlete:
+        raise HTTPException(status_code=404, detail="Athlete not found")
+    return athlete
+
+@router.post("/athletes/{athlete_id}/sync", response_model=SyncStatus)
+async def sync_athlete_activities(athlete_id: int):
+    """Incrementally sync one athlete's activities now"""
+    result = await sync_athlete(athlete_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Athlete not found")
+    
+    return SyncStatus(
+        last_sync=result.get("last_sync"),
+        activities_synced=result.get("activities_synced", 0),
+        activities_updated=result.get("activities_updated", 0),
+        activities_unchanged=result.get("activities_unchanged", 0),
+        total_processed=result.get("total_processed", 0),
+        status=result.get("status", "error"),
+        message=result.get("message"),
+        timings=result.get("timings")
+    )
@@ -1,24 +1,44 @@
 from fastapi import APIRouter
+from app.config import settings
+from app.scheduler import leader_election
 from app.services.intervals_client import intervals_client
+from app.services.resilience import CachedCheck
 
 router = APIRouter()
 
+# Load balancer probes are answered from this cache, so they don't spend API quota or wait on the upstream
+intervals_health = CachedCheck(
+    intervals_client.test_connection,
+    settings.INTERVALS_ICU_HEALTH_TTL_SECONDS,
+    settings.INTERVALS_ICU_HEALTH_MAX_STALE_SECONDS
+)
+
 @router.get("/health")
 async def health_check():
     """Basic health check endpoint"""
     return {
         "status": "healthy",
         "service": "Intervals.icu Activity Tracker",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "leader": leader_election.is_leader  # whether this process runs the scheduler and sync jobs
     }
 
 @router.get("/health/intervals")
 async def intervals_health_check():
-    """Check connection to Intervals.icu API"""
-    is_connected = await intervals_client.test_connection()
+    """Check connection to Intervals.icu API (cached, see INTERVALS_ICU_HEALTH_TTL_SECONDS)"""
+    is_connected, age, stale = await intervals_health.get()
     
     return {
         "status": "healthy" if is_connected else "unhealthy",
         "service": "Intervals.icu API",
-        "connected": is_connected
-    }
\ No newline at end of file
+        "connected": is_connected,
+        "checked_at": intervals_health.checked_at.isoformat(),
+        "age_seconds": round(age, 3),
+        "stale": stale,  # a background probe is refreshing it
+        "circuit": intervals_client.breaker.snapshot()
+    }
+
+@router.get("/health/intervals/circuit")
+async def intervals_circuit():
+    """State of the Intervals.icu circuit breaker in this process, without probing the upstream"""
+    return intervals_client.breaker.snapshot()
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.config import settings
+from app.profiler import folded, is_profiling, profile_event_loop
+
+router = APIRouter()
+debug_router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@debug_router.post("/debug/profile")
+async def profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1, le=1000)
+):
+    """Sample the event loop for ``seconds`` and return folded stacks (opt-in via PROFILER_ENABLED).
+    
+    Requests keep being served while sampling, so run it during a slow sync
+    and feed the output to flamegraph.pl or speedscope.
+    """
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.PROFILER_MAX_SECONDS:g}")
+    if is_profiling():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    stacks, idle = await profile_event_loop(seconds, interval_ms / 1000)
+    return Response(
+        folded(stacks),
+        media_type="text/plain",
+        headers={"X-Profile-Samples": str(sum(stacks.values()) + idle), "X-Profile-Idle-Samples": str(idle)}
+    )
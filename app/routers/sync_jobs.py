@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.database import SyncJob, get_db
+from app.schemas.activity import SyncJobStatus
+from app.services.sync_jobs import job_status
+
+router = APIRouter()
+
+@router.get("/sync/jobs", response_model=List[SyncJobStatus])
+async def get_sync_jobs(
+    status: Optional[str] = Query(None, description="queued, running, success or error"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """List recent sync jobs, newest first"""
+    query = select(SyncJob).order_by(desc(SyncJob.id)).limit(limit)
+    if status:
+        query = query.where(SyncJob.status == status)
+    return [job_status(job) for job in await db.scalars(query)]
+
+@router.get("/sync/jobs/{job_id}", response_model=SyncJobStatus)
+async def get_sync_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Progress of a sync job: pages fetched, rows written and throughput"""
+    job = await db.get(SyncJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return job_status(job)
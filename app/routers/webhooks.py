@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Body, Header, HTTPException
+from typing import Any, Dict, Optional
+import hmac
+
+from app.config import settings
+from app.services.webhook_queue import parse_webhook_events, webhook_queue
+
+router = APIRouter()
+
+@router.post("/webhooks/intervals", status_code=202)
+async def receive_intervals_webhook(
+    payload: Dict[str, Any] = Body(...),
+    x_webhook_secret: Optional[str] = Header(None)
+):
+    """Receive Intervals.icu activity events and queue the affected activities.
+    
+    The shared secret is accepted in the body's ``secret`` field (as sent by
+    Intervals.icu) or the X-Webhook-Secret header.
+    """
+    if not settings.WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhooks are not configured")
+    
+    secret = payload.get("secret") or x_webhook_secret or ""
+    if not hmac.compare_digest(str(secret).encode(), settings.WEBHOOK_SECRET.encode()):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    
+    events = parse_webhook_events(payload)
+    queued = await webhook_queue.submit(events)
+    
+    return {"accepted": len(events), "queued": queued, "pending": webhook_queue.depth}
+
+@router.get("/webhooks/status")
+async def webhook_status():
+    """Queue depth and counters of the webhook worker"""
+    return {
+        "enabled": bool(settings.WEBHOOK_SECRET),
+        "pending": webhook_queue.depth,
+        "coalesced": webhook_queue.coalesced,
+        "applied": webhook_queue.applied
+    }
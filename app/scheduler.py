@@ -1,11 +1,17 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import logging
-from datetime import datetime, timedelta
+import time
+
+from sqlalchemy import select
 
 from app.config import settings
-from app.database import SessionLocal
-from app.services.activity_service import ActivityService
+from app.database import Athlete, SessionLocal, write_session
+from app.services.activity_service import ActivityService, reconcile_activities
+from app.services.athlete_service import sync_all_athletes
+from app.services.leader import LeaderElection
+from app.services.sync_jobs import sync_job_runner
+from app.services.webhook_queue import webhook_queue
 
 logger = logging.getLogger(__name__)
 
@@ -16,45 +22,103 @@ async def sync_activities_job():
     try:
         logger.info("Starting scheduled activity sync...")
         
-        db = SessionLocal()
-        try:
-            activity_service = ActivityService(db)
+        # Commits are fenced: a process that lost the lease meanwhile can't write
+        with leader_election.fenced():
+            # Registered athletes are synced in parallel; otherwise fall back to the INTERVALS_ICU_* credentials
+            statuses = await sync_all_athletes()
+            if statuses:
+                return
             
-            # Sync activities from the last week
-            oldest_date = datetime.now().date() - timedelta(days=7)
+            if not settings.INTERVALS_ICU_API_KEY:
+                logger.info("No athletes registered and no Intervals.icu API key configured, nothing to sync")
+                return
             
-            result = await activity_service.sync_from_intervals_icu(
-                oldest=oldest_date,
-                limit=200
-            )
+            # Only fetch and write activities past the persisted high-water mark; the fetch holds no write session
+            async with SessionLocal() as db:
+                activity_service = ActivityService(db)
+                oldest = await activity_service.incremental_sync_oldest()
             
-            logger.info(f"Scheduled sync completed: {result}")
+            started = time.perf_counter()
+            activities_data = await activity_service.client.fetch_activities(oldest, None, limit=0)
+            timings = {"fetch_ms": (time.perf_counter() - started) * 1000}
             
-        finally:
-            db.close()
+            async with write_session() as db:
+                result = await ActivityService(db).apply_incremental_sync(activities_data, timings=timings)
             
+            logger.info(f"Scheduled sync completed: {result}")
+    
     except Exception as e:
         logger.error(f"Error in scheduled activity sync: {e}")
 
+async def reconcile_activities_job():
+    """Scheduled full-history diff repairing deletions and edits that syncs and webhooks missed"""
+    try:
+        async with SessionLocal() as db:
+            athletes = list(await db.scalars(select(Athlete).where(Athlete.active.is_(True)).order_by(Athlete.id)))
+        
+        # Same credentials as sync_activities_job: registered athletes, otherwise the INTERVALS_ICU_* ones
+        if not athletes and not settings.INTERVALS_ICU_API_KEY:
+            return
+        with leader_election.fenced():
+            for athlete in athletes or [None]:
+                result = await reconcile_activities(athlete)
+                logger.info(f"Reconciliation of {athlete.id if athlete else 'default athlete'} completed: {result['status']}")
+    
+    except Exception as e:
+        logger.error(f"Error in scheduled reconciliation: {e}")
+
 def start_scheduler():
     """Start the background scheduler"""
     if not settings.INTERVALS_ICU_API_KEY:
-        logger.warning(f"No Intervals.icu API key configured (key: '{settings.INTERVALS_ICU_API_KEY}'), skipping scheduler start")
-        return
+        # Athletes registered later may carry their own keys, so the job still runs
+        logger.warning("No Intervals.icu API key configured, only registered athletes with their own keys will be synced")
+    
+    # With webhooks enabled, polling only catches recent events that were missed; older edits and
+    # deletions are left to the full-history reconciliation below
+    interval_minutes = settings.WEBHOOK_RECONCILE_MINUTES if settings.WEBHOOK_SECRET else settings.FETCH_INTERVAL_MINUTES
     
     # Add the sync job
     scheduler.add_job(
         sync_activities_job,
-        trigger=IntervalTrigger(minutes=settings.FETCH_INTERVAL_MINUTES),
+        trigger=IntervalTrigger(minutes=interval_minutes),
         id="sync_activities",
         name="Sync activities from Intervals.icu",
         replace_existing=True
     )
     
-    logger.info(f"Scheduler started with {settings.FETCH_INTERVAL_MINUTES} minute intervals")
+    scheduler.add_job(
+        reconcile_activities_job,
+        trigger=IntervalTrigger(hours=settings.RECONCILE_INTERVAL_HOURS),
+        id="reconcile_activities",
+        name="Reconcile the stored history with Intervals.icu",
+        replace_existing=True
+    )
+    
+    logger.info(f"Scheduler started with {interval_minutes} minute intervals")
     scheduler.start()
 
 def stop_scheduler():
     """Stop the background scheduler"""
     scheduler.shutdown()
-    logger.info("Scheduler stopped")
\ No newline at end of file
+    logger.info("Scheduler stopped")
+
+async def _on_elected():
+    # Tasks started here inherit the fence, so a demoted process can't commit their writes
+    with leader_election.fenced():
+        await sync_job_runner.start()
+        webhook_queue.start()
+    if scheduler.running:
+        scheduler.resume()
+    else:
+        start_scheduler()
+
+async def _on_demoted():
+    # Nothing new starts; running jobs stop after their current page and anything they still try to
+    # commit is rejected by the lease fence
+    scheduler.pause()
+    await sync_job_runner.stop()
+    await webhook_queue.stop()
+
+# Every process serves reads and stores webhook events, but only the lease holder runs the
+# scheduler, the sync jobs and the webhook worker
+leader_election = LeaderElection("scheduler", _on_elected, _on_demoted)
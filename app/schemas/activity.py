@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, date
+from typing import Dict, List, Optional
 
 class ActivityBase(BaseModel):
     name: str
@@ -32,6 +32,7 @@ class ActivityUpdate(BaseModel):
 class Activity(ActivityBase):
     id: int
     intervals_icu_id: str
+    athlete_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
     synced_at: Optional[datetime] = None
@@ -39,6 +40,21 @@ class Activity(ActivityBase):
     class Config:
         from_attributes = True
 
+# Public activity fields, in response order; also the allowed ``fields=`` projection
+ACTIVITY_FIELDS = list(Activity.model_fields)
+
+class ActivityTombstone(BaseModel):
+    id: int
+    intervals_icu_id: Optional[str] = None
+    athlete_id: Optional[int] = None
+    deleted_at: datetime
+
+class ActivityChanges(BaseModel):
+    upserted: List[Activity]
+    deleted: List[ActivityTombstone]
+    next_token: str  # pass as ``since`` to get the changes after this batch
+    has_more: bool
+
 class ActivitySummary(BaseModel):
     total_activities: int
     total_distance: float
@@ -46,8 +62,71 @@ class ActivitySummary(BaseModel):
     avg_distance: float
     recent_activity: Optional[Activity] = None
     
+class DetailSyncRequest(BaseModel):
+    intervals_icu_ids: List[str] = Field(..., min_length=1, max_length=5000)
+
+class AggregateBucket(BaseModel):
+    bucket_start: date
+    activity_count: int
+    distance: float
+    moving_time: int
+    tss: float
+
+class FitnessPoint(BaseModel):
+    day: date
+    tss: float
+    ctl: float  # fitness
+    atl: float  # fatigue
+    tsb: float  # form
+
+class CurvePoint(BaseModel):
+    duration: int  # seconds
+    value: Optional[float] = None  # best average over the duration
+    activity_id: Optional[int] = None  # activity that set it (season-best curves)
+
+class PowerMetrics(BaseModel):
+    activity_id: int
+    ftp: Optional[float] = None
+    normalized_power: Optional[float] = None
+    intensity_factor: Optional[float] = None
+    tss: Optional[float] = None
+    # Values currently stored on the activity, for comparison
+    stored_normalized_power: Optional[float] = None
+    stored_intensity_factor: Optional[float] = None
+    stored_tss: Optional[float] = None
+
 class SyncStatus(BaseModel):
     last_sync: Optional[datetime] = None
     activities_synced: int
+    activities_updated: int = 0
+    activities_unchanged: int = 0
+    activities_failed: int = 0
+    total_processed: int = 0
     status: str = "success"
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None  # milliseconds per sync phase
+
+class SyncJobStatus(BaseModel):
+    id: int
+    athlete_id: Optional[int] = None
+    oldest: date
+    newest: date
+    limit: Optional[int] = None
+    status: str
+    pages_total: int = 0
+    pages_fetched: int = 0
+    activities_fetched: int = 0
+    activities_created: int = 0
+    activities_updated: int = 0
+    activities_unchanged: int = 0
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed_seconds: Optional[float] = None
+    activities_per_second: Optional[float] = None  # fetched activities per second of run time
+    deduplicated: bool = False  # the request was fully covered by this already active job
+    related_job_ids: List[int] = []  # other jobs covering parts of the requested range
+    
+    class Config:
+        from_attributes = True
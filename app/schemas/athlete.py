@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+class AthleteBase(BaseModel):
+    intervals_icu_athlete_id: str = Field(..., min_length=1)
+    name: Optional[str] = None
+    active: bool = True
+
+class AthleteCreate(AthleteBase):
+    api_key: Optional[str] = None  # defaults to INTERVALS_ICU_API_KEY
+
+class AthleteUpdate(BaseModel):
+    name: Optional[str] = None
+    api_key: Optional[str] = None
+    active: Optional[bool] = None
+
+class Athlete(AthleteBase):
+    id: int
+    has_api_key: bool = False  # the key itself is never returned
+    last_sync_at: Optional[datetime] = None
+    last_sync_status: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
@@ -1,29 +1,93 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
-from datetime import datetime, date
-from typing import List, Optional, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, and_, bindparam, column, delete, desc, func, insert, literal_column, or_, select, table, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from pydantic import ValidationError
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+import asyncio
+import base64
+import hashlib
+import json
 import logging
+import re
+import time
 
-from app.database import Activity
-from app.schemas.activity import ActivityCreate, ActivityUpdate, ActivitySummary
+from app.config import settings
+from app.database import (
+    SEARCH_DOCUMENT_SQL, Activity, ActivityCurve, ActivityStream, ActivityTag, ActivityTombstone, Athlete,
+    ActivitySummaryRow, ChangeSequence, SessionLocal, SyncJob, SyncState, split_tags, write_session
+)
+from app.metrics import observe_sync
+from app.schemas.activity import ACTIVITY_FIELDS, ActivityCreate, ActivityUpdate, ActivitySummary
+from app.services.analytics_service import AnalyticsService
+from app.services.detail_fetcher import DetailFetcher, detail_fetcher
 from app.services.intervals_client import intervals_client
+from app.services.raw_archive import RawArchive, decode_row
 
 logger = logging.getLogger(__name__)
 
+# Dialect-specific INSERT constructs supporting ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+# FTS5 table created by init_db; rowid is the activity id
+ACTIVITIES_FTS = table("activities_fts", column("rowid"))
+
 class ActivityService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, athlete: Optional[Athlete] = None):
+        """``athlete`` scopes syncs to that athlete's credentials; without it the INTERVALS_ICU_* settings are used"""
         self.db = db
+        self.athlete = athlete
+        if athlete is None:
+            self.client = intervals_client
+        else:
+            self.client = intervals_client.for_athlete(athlete.intervals_icu_athlete_id, athlete.api_key)
     
-    def get_activities(
-        self, 
-        skip: int = 0, 
-        limit: int = 100,
+    @staticmethod
+    def encode_cursor(activity) -> str:
+        """Build the opaque keyset cursor pointing just past ``activity`` (an Activity or row)"""
+        payload = json.dumps([activity.start_date.isoformat(), activity.id])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """Decode a keyset cursor into its (start_date, id) position"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            start_date, activity_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(start_date), int(activity_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+    
+    @staticmethod
+    def encode_change_token(change_seq: int) -> str:
+        """Build the opaque changes feed token for everything after ``change_seq``"""
+        return base64.urlsafe_b64encode(json.dumps({"seq": change_seq}).encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_change_token(token: str) -> int:
+        """Decode a changes feed token into its change sequence number"""
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            return int(json.loads(base64.urlsafe_b64decode(padded.encode()))["seq"])
+        except (ValueError, TypeError, KeyError) as e:
+            raise ValueError("Invalid change token") from e
+    
+    def _apply_filters(
+        self,
+        query,
         activity_type: Optional[str] = None,
         start_date: Optional[date] = None,
-        end_date: Optional[date] = None
-    ) -> List[Activity]:
-        """Get activities with optional filtering"""
-        query = self.db.query(Activity)
+        end_date: Optional[date] = None,
+        athlete_id: Optional[int] = None,
+        tag: Optional[str] = None
+    ):
+        """Apply the list filters shared by listing and search to an ORM query or select()"""
+        if athlete_id is not None:
+            query = query.filter(Activity.athlete_id == athlete_id)
         
         if activity_type:
             query = query.filter(Activity.type == activity_type)
@@ -34,77 +98,366 @@ class ActivityService:
         if end_date:
             query = query.filter(Activity.start_date <= end_date)
         
-        return query.order_by(desc(Activity.start_date)).offset(skip).limit(limit).all()
+        if tag:
+            # Resolved through the (tag, activity_id) index instead of scanning the tags strings
+            query = query.filter(Activity.id.in_(select(ActivityTag.activity_id).where(ActivityTag.tag == tag.strip().lower())))
+        
+        return query
+    
+    def _filter_activities(
+        self,
+        query,
+        activity_type: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        cursor: Optional[str] = None,
+        athlete_id: Optional[int] = None,
+        tag: Optional[str] = None
+    ):
+        """Apply list filters and the keyset cursor to an ORM query or select()"""
+        query = self._apply_filters(query, activity_type, start_date, end_date, athlete_id, tag)
+        
+        if cursor:
+            cursor_start_date, cursor_id = self.decode_cursor(cursor)
+            query = query.filter(tuple_(Activity.start_date, Activity.id) < tuple_(cursor_start_date, cursor_id))
+        
+        return query.order_by(desc(Activity.start_date), desc(Activity.id))
+    
+    async def get_activities(
+        self, 
+        skip: int = 0, 
+        limit: int = 100,
+        activity_type: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        cursor: Optional[str] = None,
+        athlete_id: Optional[int] = None,
+        tag: Optional[str] = None
+    ) -> List[Activity]:
+        """Get activities with optional filtering.
+        
+        With a ``cursor`` (from ``encode_cursor``) the page starts right after
+        that position using the (start_date, id) index, so deep pages cost the
+        same as the first one; ``skip`` is then ignored.
+        """
+        query = self._filter_activities(select(Activity), activity_type, start_date, end_date, cursor, athlete_id, tag)
+        result = await self.db.scalars(query.offset(0 if cursor else skip).limit(limit))
+        return list(result)
+    
+    async def get_activity_rows(
+        self,
+        fields: Optional[List[str]] = None,
+        skip: int = 0,
+        limit: int = 100,
+        activity_type: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        cursor: Optional[str] = None,
+        athlete_id: Optional[int] = None,
+        tag: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get activities as plain dicts of the selected columns, plus the next page cursor.
+        
+        Selects only the requested columns (all public ones by default) without
+        loading ORM objects, for responses serialized directly to JSON.
+        """
+        fields = fields or ACTIVITY_FIELDS
+        unknown = [field for field in fields if field not in ACTIVITY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        
+        # The cursor needs (start_date, id) even when they are not requested
+        columns = list(dict.fromkeys([*fields, "start_date", "id"]))
+        query = select(*(getattr(Activity, column) for column in columns))
+        query = self._filter_activities(query, activity_type, start_date, end_date, cursor, athlete_id, tag)
+        rows = (await self.db.execute(query.offset(0 if cursor else skip).limit(limit))).all()
+        
+        next_cursor = self.encode_cursor(rows[-1]) if len(rows) == limit else None
+        return [{field: getattr(row, field) for field in fields} for row in rows], next_cursor
+    
+    async def search_activities(
+        self,
+        q: str,
+        skip: int = 0,
+        limit: int = 20,
+        activity_type: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        athlete_id: Optional[int] = None,
+        tag: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Full-text search over name, description and tags, best matches first.
+        
+        Every word of ``q`` must match, as a prefix, so partial input already
+        finds results. SQLite ranks with FTS5 bm25 (name weighted highest),
+        PostgreSQL with ts_rank over the indexed tsvector; other databases fall
+        back to unranked substring matching.
+        """
+        words = re.findall(r"\w+", q)
+        if not words:
+            raise ValueError("Search query must contain at least one word")
+        
+        query = select(*(getattr(Activity, field) for field in ACTIVITY_FIELDS))
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "sqlite":
+            match = " ".join(f'"{word}"*' for word in words)
+            query = (
+                query.join(ACTIVITIES_FTS, ACTIVITIES_FTS.c.rowid == Activity.id)
+                .where(text("activities_fts MATCH :match").bindparams(match=match))
+                .order_by(text("bm25(activities_fts, 10.0, 1.0, 5.0)"))
+            )
+        elif dialect == "postgresql":
+            document = literal_column(SEARCH_DOCUMENT_SQL)
+            ts_query = func.to_tsquery(literal_column("'simple'"), bindparam("ts_query", " & ".join(f"{word}:*" for word in words)))
+            query = query.where(document.op("@@")(ts_query)).order_by(desc(func.ts_rank(document, ts_query)))
+        else:
+            query = query.where(and_(*(
+                or_(Activity.name.ilike(f"%{word}%"), Activity.description.ilike(f"%{word}%"), Activity.tags.ilike(f"%{word}%"))
+                for word in words
+            )))
+        
+        query = self._apply_filters(query, activity_type, start_date, end_date, athlete_id, tag)
+        query = query.order_by(desc(Activity.start_date), desc(Activity.id)).offset(skip).limit(limit)
+        rows = (await self.db.execute(query)).all()
+        return [dict(row._mapping) for row in rows]
+    
+    async def get_changes(
+        self,
+        since: Optional[str] = None,
+        limit: int = 500,
+        athlete_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Activities written and deleted after the ``since`` token, oldest change first.
+        
+        Upserts and tombstones are merged by change_seq and cut at ``limit``;
+        ``next_token`` resumes right after the last change returned, so a
+        client repeats the call until ``has_more`` is false. Without a token
+        the feed starts from the beginning, which doubles as the initial load.
+        """
+        since_seq = self.decode_change_token(since) if since else 0
+        
+        columns = list(dict.fromkeys([*ACTIVITY_FIELDS, "change_seq"]))
+        upsert_query = select(*(getattr(Activity, column) for column in columns)).where(Activity.change_seq > since_seq)
+        tombstone_query = select(ActivityTombstone).where(ActivityTombstone.change_seq > since_seq)
+        if athlete_id is not None:
+            upsert_query = upsert_query.where(Activity.athlete_id == athlete_id)
+            tombstone_query = tombstone_query.where(ActivityTombstone.athlete_id == athlete_id)
+        
+        # One row past the limit on each side tells whether another batch follows
+        upserts = (await self.db.execute(upsert_query.order_by(Activity.change_seq).limit(limit + 1))).all()
+        tombstones = list(await self.db.scalars(tombstone_query.order_by(ActivityTombstone.change_seq).limit(limit + 1)))
+        
+        changes = sorted([*upserts, *tombstones], key=lambda change: change.change_seq)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        
+        return {
+            "upserted": [
+                {field: getattr(row, field) for field in ACTIVITY_FIELDS}
+                for row in changes if not isinstance(row, ActivityTombstone)
+            ],
+            "deleted": [
+                {
+                    "id": tombstone.activity_id,
+                    "intervals_icu_id": tombstone.intervals_icu_id,
+                    "athlete_id": tombstone.athlete_id,
+                    "deleted_at": tombstone.deleted_at
+                }
+                for tombstone in changes if isinstance(tombstone, ActivityTombstone)
+            ],
+            "next_token": self.encode_change_token(changes[-1].change_seq if changes else since_seq),
+            "has_more": has_more
+        }
     
-    def get_activity(self, activity_id: int) -> Optional[Activity]:
+    async def get_activity(self, activity_id: int) -> Optional[Activity]:
         """Get a single activity by ID"""
-        return self.db.query(Activity).filter(Activity.id == activity_id).first()
+        return await self.db.get(Activity, activity_id)
     
-    def get_activity_by_intervals_id(self, intervals_icu_id: str) -> Optional[Activity]:
+    async def get_activity_by_intervals_id(self, intervals_icu_id: str) -> Optional[Activity]:
         """Get activity by Intervals.icu ID"""
-        return self.db.query(Activity).filter(Activity.intervals_icu_id == intervals_icu_id).first()
+        return await self.db.scalar(select(Activity).where(Activity.intervals_icu_id == intervals_icu_id))
     
-    def create_activity(self, activity_data: ActivityCreate) -> Activity:
+    async def create_activity(self, activity_data: ActivityCreate) -> Activity:
         """Create a new activity"""
         db_activity = Activity(**activity_data.dict())
         db_activity.synced_at = datetime.utcnow()
+        db_activity.change_seq = await self._next_change_seq()
         
         self.db.add(db_activity)
-        self.db.commit()
-        self.db.refresh(db_activity)
+        await self.db.flush()
+        await self._replace_tags({db_activity.id: db_activity.tags})
+        await self._adjust_summary(1, db_activity.distance or 0.0, db_activity.moving_time or 0)
+        await self._refresh_rollups([db_activity.start_date])
+        await self.db.commit()
+        await self.db.refresh(db_activity)
         
         logger.info(f"Created activity: {db_activity.name} (ID: {db_activity.id})")
         return db_activity
     
-    def update_activity(self, activity_id: int, activity_data: ActivityUpdate) -> Optional[Activity]:
+    async def update_activity(self, activity_id: int, activity_data: ActivityUpdate) -> Optional[Activity]:
         """Update an existing activity"""
-        db_activity = self.get_activity(activity_id)
+        db_activity = await self.get_activity(activity_id)
         if not db_activity:
             return None
         
-        for field, value in activity_data.dict(exclude_unset=True).items():
+        changes = activity_data.dict(exclude_unset=True)
+        for field, value in changes.items():
             setattr(db_activity, field, value)
         
         db_activity.updated_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(db_activity)
+        db_activity.change_seq = await self._next_change_seq()
+        if "tags" in changes:
+            await self._replace_tags({activity_id: db_activity.tags})
+        await self._adjust_summary(0, 0.0, 0)
+        await self.db.commit()
+        await self.db.refresh(db_activity)
         
         logger.info(f"Updated activity: {db_activity.name} (ID: {db_activity.id})")
         return db_activity
     
-    def delete_activity(self, activity_id: int) -> bool:
+    async def delete_activity(self, activity_id: int) -> bool:
         """Delete an activity"""
-        db_activity = self.get_activity(activity_id)
+        db_activity = await self.get_activity(activity_id)
         if not db_activity:
             return False
         
-        self.db.delete(db_activity)
-        self.db.commit()
+        await self.db.delete(db_activity)
+        self.db.add(ActivityTombstone(
+            change_seq=await self._next_change_seq(),
+            activity_id=activity_id,
+            intervals_icu_id=db_activity.intervals_icu_id,
+            athlete_id=db_activity.athlete_id
+        ))
+        await self.db.execute(delete(ActivityStream).where(ActivityStream.activity_id == activity_id))
+        await self.db.execute(delete(ActivityCurve).where(ActivityCurve.activity_id == activity_id))
+        await self.db.execute(delete(ActivityTag).where(ActivityTag.activity_id == activity_id))
+        await RawArchive(self.db).delete([db_activity.intervals_icu_id])
+        await self.db.flush()
+        await self._adjust_summary(-1, -(db_activity.distance or 0.0), -(db_activity.moving_time or 0))
+        await self._refresh_rollups([db_activity.start_date])
+        await self.db.commit()
         
         logger.info(f"Deleted activity ID: {activity_id}")
         return True
     
-    def get_activity_summary(self) -> ActivitySummary:
-        """Get summary statistics for all activities"""
-        try:
-            total_activities = self.db.query(Activity).count()
-            
-            # Calculate totals
-            totals = self.db.query(
+    async def delete_activity_by_intervals_id(self, intervals_icu_id: str) -> bool:
+        """Delete an activity by its Intervals.icu ID"""
+        db_activity = await self.get_activity_by_intervals_id(intervals_icu_id)
+        if not db_activity:
+            return False
+        return await self.delete_activity(db_activity.id)
+    
+    async def _next_change_seq(self, count: int = 1) -> int:
+        """Reserve ``count`` consecutive change sequence numbers and return the first.
+        
+        The counter row stays locked by the UPDATE until commit, so concurrent
+        writers commit their numbers in the order they were handed out and the
+        changes feed never skips past a transaction still in flight.
+        """
+        result = await self.db.execute(
+            update(ChangeSequence)
+            .where(ChangeSequence.id == 1)
+            .values(value=ChangeSequence.value + count)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            # init_db creates the row; recover if it went missing
+            last = max(
+                await self.db.scalar(select(func.max(Activity.change_seq))) or 0,
+                await self.db.scalar(select(func.max(ActivityTombstone.change_seq))) or 0
+            )
+            self.db.add(ChangeSequence(id=1, value=last + count))
+            await self.db.flush()
+            return last + 1
+        
+        return await self.db.scalar(select(ChangeSequence.value).where(ChangeSequence.id == 1)) - count + 1
+    
+    async def _recent_activity_id(self) -> Optional[int]:
+        return await self.db.scalar(
+            select(Activity.id).order_by(desc(Activity.start_date), desc(Activity.id)).limit(1)
+        )
+    
+    async def rebuild_activity_summary(self, commit: bool = True) -> ActivitySummaryRow:
+        """Recompute the materialized summary from the activities table"""
+        totals = (await self.db.execute(
+            select(
+                func.count(Activity.id).label("total_activities"),
                 func.sum(Activity.distance).label("total_distance"),
                 func.sum(Activity.moving_time).label("total_moving_time")
-            ).first()
+            )
+        )).first()
+        
+        summary = await self.db.get(ActivitySummaryRow, 1, populate_existing=True)
+        if summary is None:
+            summary = ActivitySummaryRow(id=1, version=0)
+            self.db.add(summary)
+        
+        summary.total_activities = totals.total_activities or 0
+        summary.total_distance = float(totals.total_distance or 0)
+        summary.total_moving_time = int(totals.total_moving_time or 0)
+        summary.recent_activity_id = await self._recent_activity_id()
+        summary.version = (summary.version or 0) + 1
+        
+        if commit:
+            await self.db.commit()
+        else:
+            await self.db.flush()
+        
+        logger.info(f"Rebuilt activity summary: {summary.total_activities} activities")
+        return summary
+    
+    async def _adjust_summary(self, count: int, distance: float, moving_time: int) -> None:
+        """Apply a delta to the materialized summary inside the current transaction.
+        
+        Totals are updated with SQL expressions so concurrent writers do not lose
+        updates; the most recent activity is re-resolved through the start_date index.
+        """
+        result = await self.db.execute(
+            update(ActivitySummaryRow)
+            .where(ActivitySummaryRow.id == 1)
+            .values(
+                total_activities=ActivitySummaryRow.total_activities + count,
+                total_distance=ActivitySummaryRow.total_distance + distance,
+                total_moving_time=ActivitySummaryRow.total_moving_time + moving_time,
+                recent_activity_id=await self._recent_activity_id(),
+                version=ActivitySummaryRow.version + 1,
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            await self.rebuild_activity_summary(commit=False)
+    
+    async def _refresh_rollups(self, start_dates: Iterable[Optional[datetime]]) -> None:
+        """Refresh the daily rollups of the days containing the given start dates"""
+        await AnalyticsService(self.db).refresh_daily_rollups(
+            start_date.date() for start_date in start_dates if start_date is not None
+        )
+    
+    async def get_summary_version(self) -> int:
+        """Return the current summary version, used as its ETag"""
+        # init_db creates the row; reads never write it
+        version = await self.db.scalar(select(ActivitySummaryRow.version).where(ActivitySummaryRow.id == 1))
+        return version or 0
+    
+    async def get_activity_summary(self) -> ActivitySummary:
+        """Get summary statistics for all activities from the materialized summary row"""
+        try:
+            summary = await self.db.get(ActivitySummaryRow, 1, populate_existing=True)
+            if summary is None:
+                raise LookupError("activity_summary row is missing, init_db has not run")
             
-            total_distance = float(totals.total_distance or 0)
-            total_moving_time = int(totals.total_moving_time or 0)
+            total_activities = summary.total_activities
+            total_distance = float(summary.total_distance or 0)
             
-            # Get most recent activity
-            recent_activity = self.db.query(Activity).order_by(desc(Activity.start_date)).first()
+            recent_activity = None
+            if summary.recent_activity_id is not None:
+                recent_activity = await self.get_activity(summary.recent_activity_id)
             
             return ActivitySummary(
                 total_activities=total_activities,
                 total_distance=total_distance,
-                total_moving_time=total_moving_time,
+                total_moving_time=int(summary.total_moving_time or 0),
                 avg_distance=total_distance / total_activities if total_activities > 0 else 0.0,
                 recent_activity=recent_activity
             )
@@ -119,6 +472,208 @@ class ActivityService:
                 recent_activity=None
             )
     
+    @staticmethod
+    def _content_hash(parsed_data: Dict[str, Any]) -> str:
+        """Hash the synced fields of an activity so unchanged payloads can be skipped"""
+        payload = json.dumps(parsed_data, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _parse_activities(self, activities_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Parse and validate raw Intervals.icu payloads, keeping the last payload per ID"""
+        parsed_by_id: Dict[str, Dict[str, Any]] = {}
+        
+        for activity_data in activities_data:
+            parsed_data = self.client._parse_activity_data(activity_data)
+            if self.athlete is not None:
+                parsed_data["athlete_id"] = self.athlete.id
+            
+            if not parsed_data.get("intervals_icu_id"):
+                logger.warning("Skipping activity without ID")
+                continue
+            
+            try:
+                ActivityCreate(**parsed_data)
+            except ValidationError as e:
+                logger.error(f"Error processing activity {parsed_data['intervals_icu_id']}: {e}")
+                continue
+            
+            parsed_data["content_hash"] = self._content_hash(parsed_data)
+            parsed_by_id[parsed_data["intervals_icu_id"]] = parsed_data
+        
+        return list(parsed_by_id.values())
+    
+    async def _get_existing_rows(self, intervals_icu_ids: List[str]) -> Dict[str, Row]:
+        """Map already stored Intervals.icu IDs to their content hash, totals and day, in one query per chunk"""
+        chunk_size = settings.SYNC_UPSERT_CHUNK_SIZE
+        existing: Dict[str, Row] = {}
+        
+        for i in range(0, len(intervals_icu_ids), chunk_size):
+            chunk = intervals_icu_ids[i:i + chunk_size]
+            rows = await self.db.execute(
+                select(
+                    Activity.intervals_icu_id,
+                    Activity.content_hash,
+                    Activity.distance,
+                    Activity.moving_time,
+                    Activity.start_date
+                ).where(Activity.intervals_icu_id.in_(chunk))
+            )
+            existing.update((row.intervals_icu_id, row) for row in rows)
+        
+        return existing
+    
+    async def _bulk_upsert(self, rows: List[Dict[str, Any]], existing_ids: Iterable[str]) -> None:
+        """Write rows with INSERT ... ON CONFLICT DO UPDATE in chunks, without committing.
+        
+        As with the per-row sync, a None value from Intervals.icu never overwrites
+        a stored value.
+        """
+        chunk_size = settings.SYNC_UPSERT_CHUNK_SIZE
+        upsert_insert = UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+        
+        if upsert_insert is None:
+            # No portable upsert: bulk INSERT new rows and bulk UPDATE existing ones by intervals_icu_id
+            new_rows = [row for row in rows if row["intervals_icu_id"] not in existing_ids]
+            updated_rows = [row for row in rows if row["intervals_icu_id"] in existing_ids]
+            for i in range(0, len(new_rows), chunk_size):
+                await self.db.execute(insert(Activity), new_rows[i:i + chunk_size])
+            for row in updated_rows:
+                values = {k: v for k, v in row.items() if v is not None and k not in ("intervals_icu_id", "created_at")}
+                await self.db.execute(
+                    update(Activity).where(Activity.intervals_icu_id == row["intervals_icu_id"]).values(**values)
+                )
+            return
+        
+        stmt = upsert_insert(Activity)
+        update_columns = {
+            column: func.coalesce(stmt.excluded[column], getattr(Activity, column))
+            for column in rows[0]
+            if column not in ("intervals_icu_id", "created_at", "updated_at", "synced_at")
+        }
+        update_columns["updated_at"] = stmt.excluded.updated_at
+        update_columns["synced_at"] = stmt.excluded.synced_at
+        stmt = stmt.on_conflict_do_update(index_elements=[Activity.intervals_icu_id], set_=update_columns)
+        
+        # executemany batches each chunk into multi-row INSERTs while reusing the compiled statement
+        for i in range(0, len(rows), chunk_size):
+            await self.db.execute(stmt, rows[i:i + chunk_size])
+    
+    async def _replace_tags(self, tags_by_activity: Dict[int, Optional[str]]) -> None:
+        """Rewrite the activity_tags rows of the given activity IDs from their tags strings"""
+        chunk_size = settings.SYNC_UPSERT_CHUNK_SIZE
+        activity_ids = list(tags_by_activity)
+        for i in range(0, len(activity_ids), chunk_size):
+            await self.db.execute(delete(ActivityTag).where(ActivityTag.activity_id.in_(activity_ids[i:i + chunk_size])))
+        
+        tag_rows = [
+            {"activity_id": activity_id, "tag": tag}
+            for activity_id, tags in tags_by_activity.items()
+            for tag in split_tags(tags)
+        ]
+        for i in range(0, len(tag_rows), chunk_size):
+            await self.db.execute(insert(ActivityTag), tag_rows[i:i + chunk_size])
+    
+    async def _replace_synced_tags(self, rows: List[Dict[str, Any]]) -> None:
+        """Refresh the tags of upserted rows, looking up their activity IDs by Intervals.icu ID"""
+        tags_by_intervals_id = {row["intervals_icu_id"]: row["tags"] for row in rows if row.get("tags") is not None}
+        intervals_icu_ids = list(tags_by_intervals_id)
+        chunk_size = settings.SYNC_UPSERT_CHUNK_SIZE
+        
+        tags_by_activity: Dict[int, str] = {}
+        for i in range(0, len(intervals_icu_ids), chunk_size):
+            ids = await self.db.execute(
+                select(Activity.id, Activity.intervals_icu_id).where(Activity.intervals_icu_id.in_(intervals_icu_ids[i:i + chunk_size]))
+            )
+            tags_by_activity.update((row.id, tags_by_intervals_id[row.intervals_icu_id]) for row in ids)
+        
+        await self._replace_tags(tags_by_activity)
+    
+    @staticmethod
+    def _summary_delta(changed: List[Dict[str, Any]], existing: Dict[str, Row]) -> Tuple[int, float, int]:
+        """Compute the (count, distance, moving_time) change caused by upserting ``changed``"""
+        count = 0
+        distance = 0.0
+        moving_time = 0
+        
+        for row in changed:
+            old = existing.get(row["intervals_icu_id"])
+            if old is None:
+                count += 1
+                distance += row["distance"] or 0.0
+                moving_time += row["moving_time"] or 0
+            else:
+                # None never overwrites a stored value, see _bulk_upsert
+                if row["distance"] is not None:
+                    distance += row["distance"] - (old.distance or 0.0)
+                if row["moving_time"] is not None:
+                    moving_time += row["moving_time"] - (old.moving_time or 0)
+        
+        return count, distance, moving_time
+    
+    async def _upsert_activities(
+        self,
+        activities_data: List[Dict[str, Any]],
+        timings: Optional[Dict[str, float]] = None
+    ) -> Tuple[int, int, int]:
+        """Create or update activities from raw Intervals.icu payloads in bulk.
+        
+        Rows whose content hash matches the stored one are skipped entirely.
+        Returns a (created, updated, unchanged) tuple. Writes are left
+        uncommitted; per-phase durations in milliseconds are recorded into
+        ``timings`` when given.
+        """
+        timings = timings if timings is not None else {}
+        
+        started = time.perf_counter()
+        parsed = self._parse_activities(activities_data)
+        timings["parse_ms"] = timings.get("parse_ms", 0.0) + (time.perf_counter() - started) * 1000
+        
+        if not parsed:
+            return 0, 0, 0
+        
+        if settings.RAW_ARCHIVE:
+            started = time.perf_counter()
+            payloads = {str(activity_data.get("id", "")): activity_data for activity_data in activities_data}
+            await RawArchive(self.db).store(
+                {row["intervals_icu_id"]: payloads[row["intervals_icu_id"]] for row in parsed},
+                self.athlete.id if self.athlete is not None else None
+            )
+            timings["archive_ms"] = timings.get("archive_ms", 0.0) + (time.perf_counter() - started) * 1000
+        
+        return await self._upsert_parsed(parsed, timings)
+    
+    async def _upsert_parsed(self, parsed: List[Dict[str, Any]], timings: Dict[str, float]) -> Tuple[int, int, int]:
+        """Write parsed activities whose content hash changed; see ``_upsert_activities``"""
+        started = time.perf_counter()
+        existing = await self._get_existing_rows([row["intervals_icu_id"] for row in parsed])
+        changed = [
+            row for row in parsed
+            if row["intervals_icu_id"] not in existing
+            or existing[row["intervals_icu_id"]].content_hash != row["content_hash"]
+        ]
+        timings["lookup_ms"] = timings.get("lookup_ms", 0.0) + (time.perf_counter() - started) * 1000
+        
+        started = time.perf_counter()
+        if changed:
+            now = datetime.utcnow()
+            first_seq = await self._next_change_seq(len(changed))
+            rows = [
+                {**row, "created_at": now, "updated_at": now, "synced_at": now, "change_seq": first_seq + i}
+                for i, row in enumerate(changed)
+            ]
+            await self._bulk_upsert(rows, existing.keys())
+            await self._replace_synced_tags(changed)
+            await self._adjust_summary(*self._summary_delta(changed, existing))
+            await self._refresh_rollups(
+                [row["start_date"] for row in changed]
+                + [existing[row["intervals_icu_id"]].start_date for row in changed if row["intervals_icu_id"] in existing]
+            )
+        timings["write_ms"] = timings.get("write_ms", 0.0) + (time.perf_counter() - started) * 1000
+        
+        created_count = sum(1 for row in changed if row["intervals_icu_id"] not in existing)
+        updated_count = len(changed) - created_count
+        return created_count, updated_count, len(parsed) - len(changed)
+    
     async def sync_from_intervals_icu(
         self, 
         oldest: Optional[date] = None,
@@ -126,59 +681,374 @@ class ActivityService:
         limit: int = 100
     ) -> Dict[str, Any]:
         """Sync activities from Intervals.icu API"""
+        timings: Dict[str, float] = {}
         try:
             # Fetch activities from Intervals.icu
-            activities_data = await intervals_client.fetch_activities(oldest, newest, limit)
+            started = time.perf_counter()
+            activities_data = await self.client.fetch_activities(oldest, newest, limit)
+            timings["fetch_ms"] = (time.perf_counter() - started) * 1000
+            
+            synced_count, updated_count, unchanged_count = await self._upsert_activities(activities_data, timings)
+            
+            started = time.perf_counter()
+            await self.db.commit()
+            timings["commit_ms"] = (time.perf_counter() - started) * 1000
+            observe_sync(timings, synced_count, updated_count, unchanged_count)
             
-            synced_count = 0
-            updated_count = 0
+            return {
+                "status": "success",
+                "activities_synced": synced_count,
+                "activities_updated": updated_count,
+                "activities_unchanged": unchanged_count,
+                "total_processed": len(activities_data),
+                "last_sync": datetime.utcnow(),
+                "timings": {phase: round(ms, 3) for phase, ms in timings.items()}
+            }
+        
+        except Exception as e:
+            logger.error(f"Error syncing activities: {e}")
+            await self.db.rollback()
+            return {
+                "status": "error",
+                "message": str(e),
+                "activities_synced": 0,
+                "activities_updated": 0
+            }
+    
+    async def apply_sync_job_page(
+        self,
+        job_id: int,
+        activities_data: List[Dict[str, Any]],
+        timings: Optional[Dict[str, float]] = None
+    ) -> None:
+        """Upsert one fetched page of a sync job and record its progress in the same commit"""
+        timings = timings if timings is not None else {}
+        created, updated, unchanged = await self._upsert_activities(activities_data, timings)
+        
+        job = await self.db.get(SyncJob, job_id)
+        job.pages_fetched += 1
+        job.activities_fetched += len(activities_data)
+        job.activities_created += created
+        job.activities_updated += updated
+        job.activities_unchanged += unchanged
+        
+        started = time.perf_counter()
+        await self.db.commit()
+        timings["commit_ms"] = (time.perf_counter() - started) * 1000
+        observe_sync(timings, created, updated, unchanged)
+    
+    async def incremental_sync_oldest(self, state_name: str = "activities") -> date:
+        """First day to request in the next incremental sync of ``state_name``"""
+        state = await self.db.get(SyncState, state_name)
+        if state is not None and state.cursor_start_date:
+            return state.cursor_start_date.date() - timedelta(days=settings.SYNC_LOOKBACK_DAYS)
+        return date.today() - timedelta(days=settings.SYNC_INITIAL_DAYS)
+    
+    async def incremental_sync_from_intervals_icu(self, state_name: str = "activities") -> Dict[str, Any]:
+        """Sync only activities newer than, or modified since, the persisted high-water mark.
+        
+        The first run covers SYNC_INITIAL_DAYS. Later runs request from the
+        cursor date minus SYNC_LOOKBACK_DAYS, drop payloads whose server-side
+        modification time is not past the cursor and skip rows whose content
+        hash is unchanged. The cursor only advances after a successful commit.
+        """
+        try:
+            oldest = await self.incremental_sync_oldest(state_name)
             
+            started = time.perf_counter()
+            activities_data = await self.client.fetch_activities(oldest, None, limit=0)
+            fetch_ms = (time.perf_counter() - started) * 1000
+        except Exception as e:
+            logger.error(f"Error in incremental activity sync: {e}")
+            return {
+                "status": "error",
+                "message": str(e),
+                "activities_synced": 0,
+                "activities_updated": 0
+            }
+        
+        return await self.apply_incremental_sync(activities_data, state_name, {"fetch_ms": fetch_ms})
+    
+    async def apply_incremental_sync(
+        self,
+        activities_data: List[Dict[str, Any]],
+        state_name: str = "activities",
+        timings: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """Write the payloads fetched from ``incremental_sync_oldest`` and advance the cursor.
+        
+        Split from the fetch so callers syncing many athletes can fetch
+        concurrently and only hold a write session for this part.
+        """
+        timings = timings if timings is not None else {}
+        try:
+            state = await self.db.get(SyncState, state_name)
+            if state is None:
+                state = SyncState(name=state_name)
+                self.db.add(state)
+            
+            cursor_start_date = state.cursor_start_date
+            cursor_updated = state.cursor_updated
+            modified = []
             for activity_data in activities_data:
-                try:
-                    # Parse the activity data
-                    parsed_data = intervals_client._parse_activity_data(activity_data)
-                    
-                    if not parsed_data.get("intervals_icu_id"):
-                        logger.warning("Skipping activity without ID")
-                        continue
-                    
-                    # Check if activity already exists
-                    existing_activity = self.get_activity_by_intervals_id(parsed_data["intervals_icu_id"])
-                    
-                    if existing_activity:
-                        # Update existing activity
-                        for field, value in parsed_data.items():
-                            if value is not None and field != "intervals_icu_id":
-                                setattr(existing_activity, field, value)
-                        
-                        existing_activity.synced_at = datetime.utcnow()
-                        existing_activity.updated_at = datetime.utcnow()
-                        updated_count += 1
-                    else:
-                        # Create new activity
-                        activity_create = ActivityCreate(**parsed_data)
-                        self.create_activity(activity_create)
-                        synced_count += 1
-                
-                except Exception as e:
-                    logger.error(f"Error processing activity: {e}")
+                updated = self.client._parse_updated(activity_data)
+                if updated and state.cursor_updated and updated <= state.cursor_updated:
                     continue
+                modified.append(activity_data)
+                
+                if updated and (cursor_updated is None or updated > cursor_updated):
+                    cursor_updated = updated
+                start_date = self.client._parse_datetime(activity_data.get("start_date_local"))
+                if start_date and (cursor_start_date is None or start_date > cursor_start_date):
+                    cursor_start_date = start_date
             
-            self.db.commit()
+            synced_count, updated_count, unchanged_count = await self._upsert_activities(modified, timings)
+            
+            state.cursor_start_date = cursor_start_date
+            state.cursor_updated = cursor_updated
+            state.last_success_at = datetime.utcnow()
+            
+            started = time.perf_counter()
+            await self.db.commit()
+            timings["commit_ms"] = (time.perf_counter() - started) * 1000
+            observe_sync(timings, synced_count, updated_count, unchanged_count + len(activities_data) - len(modified))
             
             return {
                 "status": "success",
                 "activities_synced": synced_count,
                 "activities_updated": updated_count,
+                "activities_unchanged": unchanged_count + len(activities_data) - len(modified),
                 "total_processed": len(activities_data),
-                "last_sync": datetime.utcnow()
+                "last_sync": state.last_success_at,
+                "cursor": cursor_start_date,
+                "timings": {phase: round(ms, 3) for phase, ms in timings.items()}
             }
-            
+        
         except Exception as e:
-            logger.error(f"Error syncing activities: {e}")
+            logger.error(f"Error in incremental activity sync: {e}")
+            await self.db.rollback()
             return {
                 "status": "error",
                 "message": str(e),
                 "activities_synced": 0,
                 "activities_updated": 0
-            }
\ No newline at end of file
+            }
+
+
+async def reparse_archive() -> Dict[str, Any]:
+    """Re-run the parser over every archived payload and write what changed, without calling Intervals.icu.
+    
+    After a field is added to ``_parse_activity_data`` (and to the Activity
+    model), this fills it in for the whole history. Archived rows are read
+    with no write session held; each batch is written in its own short write
+    session, while the next batch is decompressed and parsed in a worker
+    thread. As in a sync, rows whose content hash did not change are skipped.
+    """
+    timings: Dict[str, float] = {}
+    created_count = updated_count = unchanged_count = processed = 0
+    batch_size = settings.SYNC_UPSERT_CHUNK_SIZE
+    
+    async def read_batch(after: str) -> List[Any]:
+        async with SessionLocal() as db:
+            return await RawArchive(db).read_batch(after, batch_size)
+    
+    # Each payload is parsed as the athlete that fetched it, so content hashes match the synced rows
+    async with SessionLocal() as db:
+        await RawArchive(db).load_dictionaries()
+        athletes = {athlete.id: athlete for athlete in await db.scalars(select(Athlete))}
+    parsers = {None: ActivityService(None)}
+    parsers.update((athlete_id, ActivityService(None, athlete)) for athlete_id, athlete in athletes.items())
+    
+    def parse_batch(rows) -> Tuple[Dict[Optional[int], List[Dict[str, Any]]], float]:
+        started = time.perf_counter()
+        payloads = defaultdict(list)
+        for row in rows:
+            payloads[row.athlete_id if row.athlete_id in parsers else None].append(decode_row(row))
+        parsed = {athlete_id: parsers[athlete_id]._parse_activities(batch) for athlete_id, batch in payloads.items()}
+        return parsed, (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    try:
+        rows = await read_batch("")
+        pending = asyncio.create_task(asyncio.to_thread(parse_batch, rows)) if rows else None
+        
+        while pending is not None:
+            parsed_by_athlete, parse_ms = await pending
+            timings["parse_ms"] = timings.get("parse_ms", 0.0) + parse_ms
+            processed += len(rows)
+            
+            # Decode the next batch while this one is written
+            rows = await read_batch(rows[-1].intervals_icu_id) if len(rows) == batch_size else []
+            pending = asyncio.create_task(asyncio.to_thread(parse_batch, rows)) if rows else None
+            
+            async with write_session() as db:
+                for athlete_id, parsed in parsed_by_athlete.items():
+                    activity_service = ActivityService(db, athletes.get(athlete_id))
+                    created, updated, unchanged = await activity_service._upsert_parsed(parsed, timings)
+                    created_count += created
+                    updated_count += updated
+                    unchanged_count += unchanged
+                await db.commit()
+        
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+        observe_sync(timings, created_count, updated_count, unchanged_count)
+        logger.info(f"Re-parsed {processed} archived payloads: {updated_count} updated, {created_count} created")
+        
+        return {
+            "status": "success",
+            "activities_synced": created_count,
+            "activities_updated": updated_count,
+            "activities_unchanged": unchanged_count,
+            "total_processed": processed,
+            "timings": {phase: round(ms, 3) for phase, ms in timings.items()}
+        }
+    
+    except Exception as e:
+        logger.error(f"Error re-parsing archived payloads: {e}")
+        return {
+            "status": "error",
+            "message": str(e),
+            "activities_synced": created_count,
+            "activities_updated": updated_count,
+            "activities_unchanged": unchanged_count,
+            "total_processed": processed
+        }
+
+
+async def sync_activity_details(intervals_icu_ids: List[str], athlete: Optional[Athlete] = None) -> Dict[str, Any]:
+    """Fetch details for the given activities concurrently and upsert them in batches.
+    
+    No session is held while fetching: each batch of SYNC_UPSERT_CHUNK_SIZE
+    fetched activities is written in its own short write session while the
+    remaining requests are still in flight.
+    """
+    if athlete is None:
+        fetcher = detail_fetcher
+    else:
+        fetcher = DetailFetcher(intervals_client.for_athlete(athlete.intervals_icu_athlete_id, athlete.api_key))
+    
+    timings: Dict[str, float] = {}
+    synced_count = updated_count = unchanged_count = failed_count = 0
+    batch: List[Dict[str, Any]] = []
+    
+    async def flush() -> None:
+        nonlocal synced_count, updated_count, unchanged_count
+        async with write_session() as db:
+            created, updated, unchanged = await ActivityService(db, athlete)._upsert_activities(batch, timings)
+            await db.commit()
+        synced_count += created
+        updated_count += updated
+        unchanged_count += unchanged
+        batch.clear()
+    
+    started = time.perf_counter()
+    try:
+        async for intervals_icu_id, details in fetcher.iter_details(intervals_icu_ids):
+            if details is None:
+                failed_count += 1
+                continue
+            
+            batch.append(details)
+            if len(batch) >= settings.SYNC_UPSERT_CHUNK_SIZE:
+                await flush()
+        
+        if batch:
+            await flush()
+        
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+        observe_sync(timings, synced_count, updated_count, unchanged_count)
+        
+        return {
+            "status": "success" if failed_count == 0 else "partial",
+            "activities_synced": synced_count,
+            "activities_updated": updated_count,
+            "activities_unchanged": unchanged_count,
+            "activities_failed": failed_count,
+            "total_processed": synced_count + updated_count + unchanged_count + failed_count,
+            "last_sync": datetime.utcnow(),
+            "timings": {phase: round(ms, 3) for phase, ms in timings.items()}
+        }
+    
+    except Exception as e:
+        logger.error(f"Error syncing activity details: {e}")
+        return {
+            "status": "error",
+            "message": str(e),
+            "activities_synced": synced_count,
+            "activities_updated": updated_count
+        }
+
+
+async def reconcile_activities(athlete: Optional[Athlete] = None) -> Dict[str, Any]:
+    """Diff the whole stored history of one athlete against Intervals.icu and repair it.
+    
+    Incremental syncs only look back SYNC_LOOKBACK_DAYS and webhooks can be
+    missed, so edits to older activities and upstream deletions would
+    otherwise never arrive. Every window from the oldest stored activity to
+    today is fetched with no session held and upserted in a short write
+    session (unchanged rows are skipped by content hash). Once every window
+    was fetched, stored activities missing upstream are deleted, leaving
+    tombstones for the changes feed.
+    """
+    athlete_filter = Activity.athlete_id.is_(None) if athlete is None else Activity.athlete_id == athlete.id
+    async with SessionLocal() as db:
+        oldest, newest = (await db.execute(
+            select(func.min(Activity.start_date), func.max(Activity.start_date)).where(athlete_filter)
+        )).one()
+    if oldest is None:
+        return {"status": "success", "activities_synced": 0, "activities_updated": 0, "activities_deleted": 0}
+    
+    client = intervals_client if athlete is None else intervals_client.for_athlete(athlete.intervals_icu_athlete_id, athlete.api_key)
+    started_at = datetime.utcnow()
+    synced_count = updated_count = unchanged_count = deleted_count = 0
+    remote_ids = set()
+    try:
+        async for _, _, activities_data in client.iter_activity_windows(
+            oldest.date(), max(newest.date(), date.today()), settings.BACKFILL_WINDOW_DAYS
+        ):
+            remote_ids.update(str(activity_data.get("id", "")) for activity_data in activities_data)
+            async with write_session() as db:
+                created, updated, unchanged = await ActivityService(db, athlete)._upsert_activities(activities_data)
+                await db.commit()
+            synced_count += created
+            updated_count += updated
+            unchanged_count += unchanged
+        
+        # Only a complete listing proves an activity is gone; a failed window raised above
+        async with SessionLocal() as db:
+            # Rows written since the listing began (a webhook, a sync) may be newer than the windows already fetched
+            stored = await db.execute(
+                select(Activity.id, Activity.intervals_icu_id)
+                .where(athlete_filter, or_(Activity.synced_at.is_(None), Activity.synced_at < started_at))
+            )
+            missing = [row.id for row in stored if row.intervals_icu_id not in remote_ids]
+        
+        if missing:
+            async with write_session() as db:
+                activity_service = ActivityService(db, athlete)
+                for activity_id in missing:
+                    deleted_count += await activity_service.delete_activity(activity_id)
+    
+    except Exception as e:
+        logger.error(f"Error reconciling activities: {e}")
+        return {
+            "status": "error",
+            "message": str(e),
+            "activities_synced": synced_count,
+            "activities_updated": updated_count,
+            "activities_deleted": deleted_count
+        }
+    
+    logger.info(
+        f"Reconciled {len(remote_ids)} activities: {synced_count} created, {updated_count} updated, "
+        f"{deleted_count} deleted as missing upstream"
+    )
+    return {
+        "status": "success",
+        "activities_synced": synced_count,
+        "activities_updated": updated_count,
+        "activities_unchanged": unchanged_count,
+        "activities_deleted": deleted_count,
+        "total_processed": len(remote_ids),
+        "last_sync": datetime.utcnow()
+    }
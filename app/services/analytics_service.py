@@ -0,0 +1,210 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Date, cast, delete, func, insert, select
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+import logging
+import math
+
+import numpy as np
+
+from app.config import settings
+from app.database import Activity, DailyRollup
+from app.schemas.activity import AggregateBucket, FitnessPoint
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("day", "week", "month")
+
+# Days per block in the vectorized EWMA; keeps decay**-block within float range
+EWMA_BLOCK_SIZE = 128
+
+
+def ewma(values: np.ndarray, time_constant: float, initial: float = 0.0) -> np.ndarray:
+    """Exponentially weighted moving average y[t] = y[t-1] + alpha * (x[t] - y[t-1]).
+    
+    Evaluated block by block with the closed form
+    y[k] = d**(k+1) * y0 + alpha * d**k * cumsum(x[j] * d**-j), d = 1 - alpha,
+    so a multi-year daily series is a handful of NumPy operations instead of a
+    Python loop per day.
+    """
+    alpha = 1 - math.exp(-1 / time_constant)
+    decay = 1 - alpha
+    out = np.empty(len(values), dtype=np.float64)
+    
+    steps = np.arange(EWMA_BLOCK_SIZE, dtype=np.float64)
+    growth = decay ** -steps
+    powers = decay ** steps
+    
+    state = initial
+    for start in range(0, len(values), EWMA_BLOCK_SIZE):
+        block = np.asarray(values[start:start + EWMA_BLOCK_SIZE], dtype=np.float64)
+        n = len(block)
+        y = powers[:n] * (decay * state + alpha * np.cumsum(block * growth[:n]))
+        out[start:start + n] = y
+        state = y[-1]
+    
+    return out
+
+
+class AnalyticsService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    @property
+    def _dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+    
+    def _day_expression(self):
+        """SQL expression truncating Activity.start_date to a date"""
+        if self._dialect == "sqlite":
+            return func.date(Activity.start_date, type_=Date)
+        return cast(Activity.start_date, Date)
+    
+    def _bucket_expression(self, bucket: str):
+        """SQL expression truncating DailyRollup.day to the start of its day/week/month bucket"""
+        if bucket == "day":
+            return DailyRollup.day
+        
+        if self._dialect == "sqlite":
+            if bucket == "week":
+                # Weeks start on Monday
+                return func.date(DailyRollup.day, "weekday 0", "-6 days", type_=Date)
+            return func.date(DailyRollup.day, "start of month", type_=Date)
+        
+        return cast(func.date_trunc(bucket, DailyRollup.day), Date)
+    
+    async def refresh_daily_rollups(self, days: Iterable[date]) -> None:
+        """Recompute the rollups of the given days from the activities table, without committing"""
+        days = sorted(set(days))
+        if not days:
+            return
+        
+        day_expression = self._day_expression()
+        chunk_size = settings.SYNC_UPSERT_CHUNK_SIZE
+        
+        for i in range(0, len(days), chunk_size):
+            chunk = days[i:i + chunk_size]
+            await self.db.execute(delete(DailyRollup).where(DailyRollup.day.in_(chunk)))
+            
+            # The start_date range lets the index narrow the scan before grouping by day
+            rollups = select(
+                day_expression,
+                func.coalesce(Activity.type, ""),
+                func.count(Activity.id),
+                func.coalesce(func.sum(Activity.distance), 0.0),
+                func.coalesce(func.sum(Activity.moving_time), 0),
+                func.coalesce(func.sum(Activity.tss), 0.0)
+            ).where(
+                Activity.start_date >= datetime.combine(chunk[0], datetime.min.time()),
+                Activity.start_date < datetime.combine(chunk[-1] + timedelta(days=1), datetime.min.time()),
+                day_expression.in_(chunk)
+            ).group_by(day_expression, func.coalesce(Activity.type, ""))
+            
+            await self.db.execute(
+                insert(DailyRollup).from_select(
+                    ["day", "type", "activity_count", "distance", "moving_time", "tss"],
+                    rollups
+                )
+            )
+        
+        await self.db.flush()
+    
+    async def rebuild_daily_rollups(self, commit: bool = True) -> int:
+        """Recompute all rollups from scratch, returning the number of days covered"""
+        await self.db.execute(delete(DailyRollup))
+        
+        day_expression = self._day_expression()
+        days = list(await self.db.scalars(
+            select(day_expression).where(Activity.start_date.isnot(None)).distinct()
+        ))
+        await self.refresh_daily_rollups(days)
+        
+        if commit:
+            await self.db.commit()
+        
+        logger.info(f"Rebuilt daily rollups for {len(days)} days")
+        return len(days)
+    
+    async def get_aggregates(
+        self,
+        bucket: str = "week",
+        activity_type: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> List[AggregateBucket]:
+        """Get distance, moving time and TSS totals per day/week/month bucket"""
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+        
+        bucket_expression = self._bucket_expression(bucket).label("bucket")
+        query = select(
+            bucket_expression,
+            func.sum(DailyRollup.activity_count),
+            func.sum(DailyRollup.distance),
+            func.sum(DailyRollup.moving_time),
+            func.sum(DailyRollup.tss)
+        )
+        
+        if activity_type:
+            query = query.where(DailyRollup.type == activity_type)
+        if start_date:
+            query = query.where(DailyRollup.day >= start_date)
+        if end_date:
+            query = query.where(DailyRollup.day <= end_date)
+        
+        rows = await self.db.execute(query.group_by(bucket_expression).order_by(bucket_expression))
+        return [
+            AggregateBucket(
+                bucket_start=bucket_start,
+                activity_count=int(count or 0),
+                distance=float(distance or 0),
+                moving_time=int(moving_time or 0),
+                tss=float(tss or 0)
+            )
+            for bucket_start, count, distance, moving_time, tss in rows
+        ]
+    
+    async def get_fitness(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        activity_type: Optional[str] = None
+    ) -> List[FitnessPoint]:
+        """Get the daily fitness (CTL), fatigue (ATL) and form (TSB) series.
+        
+        CTL and ATL are exponentially weighted averages of daily TSS with
+        FITNESS_CTL_DAYS / FITNESS_ATL_DAYS time constants, computed over the
+        whole history so the values in the requested range are exact. Form is
+        the previous day's CTL minus ATL.
+        """
+        end_date = end_date or date.today()
+        
+        query = select(DailyRollup.day, func.sum(DailyRollup.tss)).where(DailyRollup.day <= end_date)
+        if activity_type:
+            query = query.where(DailyRollup.type == activity_type)
+        rows = (await self.db.execute(query.group_by(DailyRollup.day).order_by(DailyRollup.day))).all()
+        
+        if not rows:
+            return []
+        
+        first_day = rows[0][0]
+        length = (end_date - first_day).days + 1
+        daily_tss = np.zeros(length, dtype=np.float64)
+        offsets = np.fromiter(((day - first_day).days for day, _ in rows), dtype=np.int64, count=len(rows))
+        daily_tss[offsets] = [tss or 0.0 for _, tss in rows]
+        
+        ctl = ewma(daily_tss, settings.FITNESS_CTL_DAYS)
+        atl = ewma(daily_tss, settings.FITNESS_ATL_DAYS)
+        tsb = np.concatenate(([0.0], (ctl - atl)[:-1]))
+        
+        start_offset = max(0, (start_date - first_day).days) if start_date else 0
+        return [
+            FitnessPoint(
+                day=first_day + timedelta(days=offset),
+                tss=round(float(daily_tss[offset]), 2),
+                ctl=round(float(ctl[offset]), 2),
+                atl=round(float(atl[offset]), 2),
+                tsb=round(float(tsb[offset]), 2) + 0.0  # avoid -0.0
+            )
+            for offset in range(start_offset, length)
+        ]
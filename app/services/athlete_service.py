@@ -0,0 +1,133 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.database import Athlete, SessionLocal, write_session
+from app.schemas.athlete import AthleteCreate, AthleteUpdate
+from app.services.activity_service import ActivityService
+
+logger = logging.getLogger(__name__)
+
+
+def athlete_state_name(athlete_id: int) -> str:
+    """SyncState row holding the incremental sync cursor of one athlete"""
+    return f"activities:athlete:{athlete_id}"
+
+
+class AthleteService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_athletes(self, active: Optional[bool] = None) -> List[Athlete]:
+        query = select(Athlete).order_by(Athlete.id)
+        if active is not None:
+            query = query.where(Athlete.active == active)
+        return list(await self.db.scalars(query))
+    
+    async def get_athlete(self, athlete_id: int) -> Optional[Athlete]:
+        return await self.db.get(Athlete, athlete_id)
+    
+    async def create_athlete(self, athlete_data: AthleteCreate) -> Athlete:
+        """Register an athlete; raises ValueError if the Intervals.icu athlete is already registered"""
+        existing = await self.db.scalar(
+            select(Athlete.id).where(Athlete.intervals_icu_athlete_id == athlete_data.intervals_icu_athlete_id)
+        )
+        if existing is not None:
+            raise ValueError(f"Athlete {athlete_data.intervals_icu_athlete_id} is already registered")
+        
+        athlete = Athlete(**athlete_data.dict())
+        self.db.add(athlete)
+        await self.db.commit()
+        await self.db.refresh(athlete)
+        
+        logger.info(f"Registered athlete {athlete.intervals_icu_athlete_id} (ID: {athlete.id})")
+        return athlete
+    
+    async def update_athlete(self, athlete_id: int, athlete_data: AthleteUpdate) -> Optional[Athlete]:
+        athlete = await self.get_athlete(athlete_id)
+        if not athlete:
+            return None
+        
+        for field, value in athlete_data.dict(exclude_unset=True).items():
+            setattr(athlete, field, value)
+        
+        await self.db.commit()
+        await self.db.refresh(athlete)
+        return athlete
+
+
+async def sync_athlete(athlete_id: int) -> Optional[Dict[str, Any]]:
+    """Incrementally sync one athlete; None when the athlete does not exist.
+    
+    The fetch runs outside the write session, so many athletes can be
+    fetched in parallel while their writes are serialized.
+    """
+    async with SessionLocal() as db:
+        athlete = await db.get(Athlete, athlete_id)
+        if athlete is None:
+            return None
+        activity_service = ActivityService(db, athlete)
+        state_name = athlete_state_name(athlete_id)
+        oldest = await activity_service.incremental_sync_oldest(state_name)
+    
+    try:
+        started = time.perf_counter()
+        activities_data = await activity_service.client.fetch_activities(oldest, None, limit=0)
+        timings = {"fetch_ms": (time.perf_counter() - started) * 1000}
+    except Exception as e:
+        logger.error(f"Error fetching activities for athlete {athlete_id}: {e}")
+        result = {"status": "error", "message": str(e), "activities_synced": 0, "activities_updated": 0}
+    else:
+        async with write_session() as db:
+            athlete = await db.get(Athlete, athlete_id)
+            result = await ActivityService(db, athlete).apply_incremental_sync(activities_data, state_name, timings)
+    
+    async with write_session() as db:
+        athlete = await db.get(Athlete, athlete_id)
+        athlete.last_sync_at = datetime.utcnow()
+        athlete.last_sync_status = result["status"]
+        await db.commit()
+    
+    return result
+
+
+async def sync_all_athletes() -> Dict[str, int]:
+    """Sync every active athlete with bounded concurrency and staggered start times.
+    
+    Start offsets are spread evenly over SYNC_STAGGER_SECONDS so a large team
+    doesn't hit Intervals.icu all at once; at most SYNC_ATHLETE_CONCURRENCY
+    athletes are in flight. Returns the number of athletes per final status.
+    """
+    async with SessionLocal() as db:
+        athlete_ids = list(await db.scalars(select(Athlete.id).where(Athlete.active.is_(True)).order_by(Athlete.id)))
+    
+    semaphore = asyncio.Semaphore(settings.SYNC_ATHLETE_CONCURRENCY)
+    statuses: Dict[str, int] = {}
+    
+    async def run(index: int, athlete_id: int) -> None:
+        await asyncio.sleep(index * settings.SYNC_STAGGER_SECONDS / len(athlete_ids))
+        async with semaphore:
+            try:
+                result = await sync_athlete(athlete_id)
+                status = result["status"] if result else "missing"
+            except Exception as e:
+                logger.error(f"Error syncing athlete {athlete_id}: {e}")
+                status = "error"
+        statuses[status] = statuses.get(status, 0) + 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(run(index, athlete_id) for index, athlete_id in enumerate(athlete_ids)))
+    elapsed = time.perf_counter() - started
+    
+    logger.info(f"Synced {len(athlete_ids)} athletes in {elapsed:.1f}s: {statuses}")
+    if elapsed > settings.FETCH_INTERVAL_MINUTES * 60:
+        logger.warning(
+            f"Team sync took longer than FETCH_INTERVAL_MINUTES; "
+            f"consider raising SYNC_ATHLETE_CONCURRENCY ({settings.SYNC_ATHLETE_CONCURRENCY})"
+        )
+    return statuses
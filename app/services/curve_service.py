@@ -0,0 +1,145 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, select
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from app.database import Activity, ActivityCurve
+from app.schemas.activity import CurvePoint
+
+logger = logging.getLogger(__name__)
+
+# Fixed duration grid (seconds) shared by every cached curve, so curves combine element-wise
+CURVE_DURATIONS = np.array([
+    1, 2, 3, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 300, 420, 600, 900,
+    1200, 1800, 2700, 3600, 5400, 7200, 10800, 14400, 18000
+])
+
+CURVE_CHANNELS = ("power", "heart_rate")
+
+# Rolling window of the Normalized Power algorithm
+NP_WINDOW_SECONDS = 30
+
+
+def resample_1hz(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Place samples on a 1-second grid starting at the first timestamp; gaps become NaN"""
+    offsets = np.rint(times - times[0]).astype(np.int64)
+    grid = np.full(offsets[-1] + 1, np.nan)
+    grid[offsets] = values
+    return grid
+
+
+def _cumsum(values: np.ndarray) -> np.ndarray:
+    """Prefix sums with a leading zero; missing samples count as zero"""
+    return np.concatenate(([0.0], np.cumsum(np.nan_to_num(values, nan=0.0))))
+
+
+def mean_max_curve(values: np.ndarray, durations: np.ndarray = CURVE_DURATIONS) -> np.ndarray:
+    """Best average of a 1 Hz series over each duration, NaN where the series is too short.
+    
+    Each duration is one vectorized pass over the prefix sums:
+    max(cs[d:] - cs[:-d]) / d.
+    """
+    sums = _cumsum(values)
+    curve = np.full(len(durations), np.nan)
+    for index, duration in enumerate(durations):
+        if duration > len(values):
+            break
+        curve[index] = (sums[duration:] - sums[:-duration]).max() / duration
+    return curve
+
+
+def normalized_power(power: np.ndarray) -> Optional[float]:
+    """Fourth root of the mean of the fourth power of the 30 s rolling average"""
+    if len(power) < NP_WINDOW_SECONDS:
+        return None
+    sums = _cumsum(power)
+    rolling = (sums[NP_WINDOW_SECONDS:] - sums[:-NP_WINDOW_SECONDS]) / NP_WINDOW_SECONDS
+    return float(np.mean(rolling ** 4) ** 0.25)
+
+
+def training_load(normalized: float, seconds: float, ftp: float) -> Tuple[float, float]:
+    """Intensity factor and TSS for a ride of ``seconds`` at ``normalized`` watts"""
+    intensity = normalized / ftp
+    tss = seconds * normalized * intensity / (ftp * 3600) * 100
+    return intensity, tss
+
+
+def curve_points(curve: np.ndarray, activity_ids: Optional[np.ndarray] = None) -> List[CurvePoint]:
+    points = []
+    for index, duration in enumerate(CURVE_DURATIONS):
+        value = curve[index]
+        if np.isnan(value):
+            continue
+        points.append(CurvePoint(
+            duration=int(duration),
+            value=round(float(value), 1),
+            activity_id=int(activity_ids[index]) if activity_ids is not None else None
+        ))
+    return points
+
+
+class CurveService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def store_curves(self, activity: Activity, channels: Dict[str, np.ndarray]) -> None:
+        """Compute and cache the curves of an activity from its decoded streams (no commit)"""
+        await self.db.execute(delete(ActivityCurve).where(ActivityCurve.activity_id == activity.id))
+        
+        times = channels.get("time")
+        for channel in CURVE_CHANNELS:
+            values = channels.get(channel)
+            if values is None or not len(values):
+                continue
+            if times is not None and len(times) == len(values):
+                values = resample_1hz(times, values)
+            
+            self.db.add(ActivityCurve(
+                activity_id=activity.id,
+                channel=channel,
+                start_date=activity.start_date,
+                type=activity.type,
+                values=mean_max_curve(values).astype("<f4").tobytes()
+            ))
+    
+    async def get_activity_curve(self, activity_id: int, channel: str = "power") -> Optional[List[CurvePoint]]:
+        """Cached curve of one activity, None when it has not been computed"""
+        blob = await self.db.scalar(
+            select(ActivityCurve.values).where(
+                ActivityCurve.activity_id == activity_id,
+                ActivityCurve.channel == channel
+            )
+        )
+        if blob is None:
+            return None
+        return curve_points(np.frombuffer(blob, dtype="<f4"))
+    
+    async def get_best_curve(
+        self,
+        channel: str = "power",
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        activity_type: Optional[str] = None
+    ) -> List[CurvePoint]:
+        """Best value per duration across activities, an element-wise max over the cached curves"""
+        query = select(ActivityCurve.activity_id, ActivityCurve.values).where(ActivityCurve.channel == channel)
+        if start_date:
+            query = query.where(ActivityCurve.start_date >= datetime.combine(start_date, time.min))
+        if end_date:
+            query = query.where(ActivityCurve.start_date < datetime.combine(end_date + timedelta(days=1), time.min))
+        if activity_type:
+            query = query.where(ActivityCurve.type == activity_type)
+        
+        rows = (await self.db.execute(query)).all()
+        if not rows:
+            return []
+        
+        activity_ids = np.array([row.activity_id for row in rows])
+        curves = np.frombuffer(b"".join(row.values for row in rows), dtype="<f4").reshape(len(rows), -1)
+        
+        best = np.fmax.reduce(curves, axis=0)
+        holders = activity_ids[np.where(np.isnan(curves), -np.inf, curves).argmax(axis=0)]
+        return curve_points(best, holders)
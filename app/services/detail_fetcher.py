@@ -0,0 +1,42 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from app.config import settings
+from app.services.intervals_client import IntervalsICUClient, intervals_client
+
+logger = logging.getLogger(__name__)
+
+
+class DetailFetcher:
+    """Fetch activity details for many activities in parallel.
+    
+    Concurrency is bounded by a semaphore; request rate, 429 handling and
+    retries are enforced by the client's token bucket and ``_request``.
+    """
+    
+    def __init__(self, client: IntervalsICUClient = intervals_client, concurrency: Optional[int] = None):
+        self.client = client
+        self.concurrency = concurrency or settings.INTERVALS_ICU_MAX_CONCURRENCY
+    
+    async def iter_details(
+        self,
+        intervals_icu_ids: Iterable[str]
+    ) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Yield (intervals_icu_id, details) pairs in completion order; details is None on failure"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def fetch(intervals_icu_id: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+            async with semaphore:
+                return intervals_icu_id, await self.client.fetch_activity_details(intervals_icu_id)
+        
+        tasks = [asyncio.create_task(fetch(intervals_icu_id)) for intervals_icu_id in dict.fromkeys(intervals_icu_ids)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+detail_fetcher = DetailFetcher()
@@ -0,0 +1,173 @@
+from sqlalchemy import desc, select
+from datetime import date, datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+import csv
+import io
+import logging
+
+import orjson
+
+from app.database import Activity, SessionLocal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Columns exported, matching the public Activity schema
+EXPORT_COLUMNS = [
+    "id", "intervals_icu_id", "athlete_id", "name", "type", "start_date",
+    "moving_time", "elapsed_time", "distance",
+    "average_speed", "max_speed", "average_heartrate", "max_heartrate",
+    "average_power", "max_power",
+    "tss", "intensity_factor", "normalized_power",
+    "description", "tags",
+    "created_at", "updated_at", "synced_at",
+]
+
+# Rows fetched from the server-side cursor per batch
+EXPORT_BATCH_SIZE = 1000
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object buffering bytes until the caller drains them"""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+async def _iter_batches(
+    activity_type: Optional[str],
+    start_date: Optional[date],
+    end_date: Optional[date],
+    athlete_id: Optional[int] = None
+) -> AsyncIterator[Sequence[Tuple[Any, ...]]]:
+    """Stream activity rows in batches through a server-side cursor.
+    
+    Uses its own session because the response body is produced after the
+    request's dependencies have finished.
+    """
+    query = select(*(getattr(Activity, column) for column in EXPORT_COLUMNS))
+    if athlete_id is not None:
+        query = query.where(Activity.athlete_id == athlete_id)
+    if activity_type:
+        query = query.where(Activity.type == activity_type)
+    if start_date:
+        query = query.where(Activity.start_date >= start_date)
+    if end_date:
+        query = query.where(Activity.start_date <= end_date)
+    query = query.order_by(desc(Activity.start_date), desc(Activity.id))
+    
+    async with SessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.partitions():
+            yield batch
+
+
+async def _iter_ndjson(batches: AsyncIterator[Sequence[Tuple[Any, ...]]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield b"".join(orjson.dumps(dict(zip(EXPORT_COLUMNS, row))) + b"\n" for row in batch)
+
+
+async def _iter_csv(batches: AsyncIterator[Sequence[Tuple[Any, ...]]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    
+    async for batch in batches:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _parquet_schema():
+    string, integer, number, timestamp = pa.string(), pa.int64(), pa.float64(), pa.timestamp("us")
+    types = {
+        "id": integer, "intervals_icu_id": string, "athlete_id": integer, "name": string, "type": string, "start_date": timestamp,
+        "moving_time": integer, "elapsed_time": integer, "distance": number,
+        "average_speed": number, "max_speed": number, "average_heartrate": number, "max_heartrate": number,
+        "average_power": number, "max_power": number,
+        "tss": number, "intensity_factor": number, "normalized_power": number,
+        "description": string, "tags": string,
+        "created_at": timestamp, "updated_at": timestamp, "synced_at": timestamp,
+    }
+    return pa.schema([(column, types[column]) for column in EXPORT_COLUMNS])
+
+
+async def _iter_parquet(batches: AsyncIterator[Sequence[Tuple[Any, ...]]]) -> AsyncIterator[bytes]:
+    """Write one Parquet row group per batch, yielding the bytes as each group is flushed"""
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        async for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    
+    yield sink.drain()
+
+
+def export_activities(
+    export_format: str,
+    activity_type: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    athlete_id: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """Stream activities encoded as NDJSON, CSV or Parquet with memory bounded by one batch"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if export_format == "parquet" and not parquet_available():
+        raise ValueError("Parquet export requires the 'pyarrow' package")
+    
+    batches = _iter_batches(activity_type, start_date, end_date, athlete_id)
+    if export_format == "ndjson":
+        return _iter_ndjson(batches)
+    if export_format == "csv":
+        return _iter_csv(batches)
+    return _iter_parquet(batches)
@@ -1,17 +1,127 @@
 import httpx
 import logging
+import asyncio
 import base64
-from datetime import datetime, date
-from typing import List, Dict, Any, Optional
+import importlib.util
+import time
+from datetime import datetime, date, timedelta, timezone
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from app.config import settings
+from app.metrics import INTERVALS_RETRIES, observe_intervals_request
+from app.services.rate_limit import TokenBucket, backoff_delay, parse_retry_after
+from app.services.resilience import CircuitBreaker, RetryBudget
 
 logger = logging.getLogger(__name__)
 
+# Whole-request timeout of each endpoint, in seconds
+ENDPOINT_TIMEOUTS = {
+    "athlete": settings.INTERVALS_ICU_TIMEOUT_ATHLETE,
+    "activities": settings.INTERVALS_ICU_TIMEOUT_ACTIVITIES,
+    "activity": settings.INTERVALS_ICU_TIMEOUT_ACTIVITY,
+    "streams": settings.INTERVALS_ICU_TIMEOUT_STREAMS
+}
+
 class IntervalsICUClient:
-    def __init__(self):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        athlete_id: Optional[str] = None,
+        pool_owner: Optional["IntervalsICUClient"] = None
+    ):
         self.base_url = settings.INTERVALS_ICU_BASE_URL
-        self.api_key = settings.INTERVALS_ICU_API_KEY
-        self.athlete_id = settings.INTERVALS_ICU_ATHLETE_ID
+        self.api_key = settings.INTERVALS_ICU_API_KEY if api_key is None else api_key
+        self.athlete_id = settings.INTERVALS_ICU_ATHLETE_ID if athlete_id is None else athlete_id
+        self._client: Optional[httpx.AsyncClient] = None
+        # Per-athlete clients borrow the connection pool of the client that created them
+        self._pool_owner = pool_owner
+        self._athlete_clients: Dict[Tuple[str, str], "IntervalsICUClient"] = {}
+        # Intervals.icu rate-limits per API key, so athletes sharing a key (e.g. the coach's) share a bucket
+        self._rate_limiters: Dict[str, TokenBucket] = pool_owner._rate_limiters if pool_owner is not None else {}
+        if self.api_key not in self._rate_limiters:
+            self._rate_limiters[self.api_key] = TokenBucket(
+                settings.INTERVALS_ICU_REQUESTS_PER_SECOND,
+                settings.INTERVALS_ICU_RATE_BURST
+            )
+        self.rate_limiter = self._rate_limiters[self.api_key]
+        # The upstream is the same for every athlete, so its health (breaker) and retry budgets are shared too
+        if pool_owner is not None:
+            self.breaker = pool_owner.breaker
+            self._retry_budgets = pool_owner._retry_budgets
+        else:
+            self.breaker = CircuitBreaker(
+                "intervals_icu",
+                settings.INTERVALS_ICU_BREAKER_FAILURES,
+                settings.INTERVALS_ICU_BREAKER_RESET_SECONDS
+            )
+            self._retry_budgets: Dict[str, RetryBudget] = {}
+    
+    def for_athlete(self, athlete_id: str, api_key: Optional[str] = None) -> "IntervalsICUClient":
+        """Client for another athlete's credentials, sharing this client's connection pool.
+        
+        Each API key gets its own token bucket, so one athlete hitting its rate
+        limit doesn't slow down athletes with their own keys, while athletes
+        falling back to INTERVALS_ICU_API_KEY share its bucket. Clients are
+        cached per credentials.
+        """
+        api_key = api_key or self.api_key
+        key = (athlete_id, api_key)
+        if key not in self._athlete_clients:
+            self._athlete_clients[key] = IntervalsICUClient(api_key, athlete_id, pool_owner=self)
+        return self._athlete_clients[key]
+    
+    async def start(self) -> None:
+        """Open the shared connection pool used for all Intervals.icu requests"""
+        if self._client is not None and not self._client.is_closed:
+            return
+        
+        http2 = settings.INTERVALS_ICU_HTTP2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("INTERVALS_ICU_HTTP2 enabled but the 'h2' package is not installed, falling back to HTTP/1.1")
+            http2 = False
+        
+        limits = httpx.Limits(
+            max_connections=settings.INTERVALS_ICU_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.INTERVALS_ICU_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.INTERVALS_ICU_KEEPALIVE_EXPIRY
+        )
+        self._client = httpx.AsyncClient(limits=limits, http2=http2)
+        logger.info(
+            f"Opened Intervals.icu connection pool (max_connections={limits.max_connections}, "
+            f"keepalive={limits.max_keepalive_connections}, http2={http2})"
+        )
+    
+    async def close(self) -> None:
+        """Close the shared connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Closed Intervals.icu connection pool")
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, opening the pool on first use"""
+        if self._pool_owner is not None:
+            return await self._pool_owner._get_client()
+        if self._client is None or self._client.is_closed:
+            await self.start()
+        return self._client
+    
+    def _retry_budget(self, endpoint: str) -> RetryBudget:
+        if endpoint not in self._retry_budgets:
+            self._retry_budgets[endpoint] = RetryBudget(
+                settings.INTERVALS_ICU_RETRY_BUDGET_RATIO,
+                settings.INTERVALS_ICU_RETRY_BUDGET_MIN
+            )
+        return self._retry_budgets[endpoint]
+    
+    def _may_retry(self, attempt: int, max_retries: int, endpoint: str) -> bool:
+        if attempt >= max_retries:
+            return False
+        if not self._retry_budget(endpoint).try_retry():
+            INTERVALS_RETRIES.labels(endpoint, "denied").inc()
+            logger.warning(f"Retry budget of {endpoint} requests exhausted, not retrying")
+            return False
+        INTERVALS_RETRIES.labels(endpoint, "allowed").inc()
+        return True
     
     def _get_auth_header(self) -> Dict[str, str]:
         """Create authorization header for Intervals.icu API"""
@@ -28,29 +138,91 @@ class IntervalsICUClient:
             "Accept": "application/json"
         }
     
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, str]] = None,
+        max_retries: Optional[int] = None,
+        endpoint: str = "other"
+    ) -> httpx.Response:
+        """Send a rate-limited request, retrying 429, 5xx and transport errors.
+        
+        429 responses honour ``Retry-After`` (pausing the shared token bucket so
+        concurrent callers back off too); other retries use exponential backoff
+        with jitter. The last response is returned once retries are exhausted.
+        Every attempt is timed under ``endpoint`` in the request metrics.
+        
+        Each endpoint has its own timeout (ENDPOINT_TIMEOUTS) and retry budget.
+        Every attempt reports to the circuit breaker, which raises
+        CircuitOpenError instead of sending while Intervals.icu is down.
+        """
+        headers = self._get_auth_header()
+        client = await self._get_client()
+        max_retries = settings.INTERVALS_ICU_MAX_RETRIES if max_retries is None else max_retries
+        request_timeout = ENDPOINT_TIMEOUTS.get(endpoint, settings.INTERVALS_ICU_TIMEOUT_ACTIVITIES)
+        timeout = httpx.Timeout(request_timeout, connect=min(settings.INTERVALS_ICU_CONNECT_TIMEOUT, request_timeout))
+        self._retry_budget(endpoint).record_request()
+        
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            self.breaker.before_call()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, headers=headers, params=params, timeout=timeout)
+            except httpx.TransportError as e:
+                observe_intervals_request(endpoint, "error", time.perf_counter() - started)
+                self.breaker.record_failure(repr(e))
+                if not self._may_retry(attempt, max_retries, endpoint):
+                    raise
+                delay = backoff_delay(attempt, settings.INTERVALS_ICU_BACKOFF_BASE, settings.INTERVALS_ICU_BACKOFF_MAX)
+                logger.warning(f"{method} {url} failed ({e!r}), retrying in {delay:.2f}s")
+            else:
+                observe_intervals_request(endpoint, str(response.status_code), time.perf_counter() - started)
+                if response.status_code >= 500:
+                    self.breaker.record_failure(f"HTTP {response.status_code}")
+                else:
+                    # A 429 is throttling, not an outage: the upstream answered
+                    self.breaker.record_success()
+                
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                if not self._may_retry(attempt, max_retries, endpoint):
+                    return response
+                
+                delay = backoff_delay(attempt, settings.INTERVALS_ICU_BACKOFF_BASE, settings.INTERVALS_ICU_BACKOFF_MAX)
+                if response.status_code == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        delay = min(retry_after, settings.INTERVALS_ICU_BACKOFF_MAX)
+                    self.rate_limiter.pause(delay)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+            
+            attempt += 1
+            await asyncio.sleep(delay)
+    
     async def test_connection(self) -> bool:
         """Test connection to Intervals.icu API"""
         try:
             if not self.api_key or not self.athlete_id:
                 logger.warning("Missing API key or athlete ID")
                 return False
-                
-            headers = self._get_auth_header()
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/athlete/{self.athlete_id}",
-                    headers=headers,
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    logger.info("Successfully connected to Intervals.icu API")
-                    return True
-                else:
-                    logger.error(f"Failed to connect to Intervals.icu API: {response.status_code} - {response.text}")
-                    return False
-                    
+            response = await self._request(
+                "GET",
+                f"{self.base_url}/athlete/{self.athlete_id}",
+                max_retries=0,
+                endpoint="athlete"
+            )
+            
+            if response.status_code == 200:
+                logger.info("Successfully connected to Intervals.icu API")
+                return True
+            else:
+                logger.error(f"Failed to connect to Intervals.icu API: {response.status_code} - {response.text}")
+                return False
+        
         except Exception as e:
             logger.error(f"Error testing Intervals.icu connection: {e}")
             return False
@@ -66,8 +238,6 @@ class IntervalsICUClient:
             if not self.api_key or not self.athlete_id:
                 raise ValueError("Missing API key or athlete ID configuration")
             
-            headers = self._get_auth_header()
-            
             # Build query parameters
             params = {}
             if oldest:
@@ -81,28 +251,22 @@ class IntervalsICUClient:
             
             logger.info(f"Fetching activities from Intervals.icu: {url}")
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    headers=headers,
-                    params=params,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    activities = response.json()
-                    logger.info(f"Successfully fetched {len(activities)} activities")
-                    return activities
-                elif response.status_code == 401:
-                    logger.error("Unauthorized - check your API key")
-                    raise ValueError("Invalid API key or unauthorized access")
-                elif response.status_code == 404:
-                    logger.error("Athlete not found - check your athlete ID")
-                    raise ValueError("Athlete not found")
-                else:
-                    logger.error(f"API request failed with status {response.status_code}: {response.text}")
-                    raise ValueError(f"API request failed: {response.status_code}")
-                    
+            response = await self._request("GET", url, params=params, endpoint="activities")
+            
+            if response.status_code == 200:
+                activities = response.json()
+                logger.info(f"Successfully fetched {len(activities)} activities")
+                return activities
+            elif response.status_code == 401:
+                logger.error("Unauthorized - check your API key")
+                raise ValueError("Invalid API key or unauthorized access")
+            elif response.status_code == 404:
+                logger.error("Athlete not found - check your athlete ID")
+                raise ValueError("Athlete not found")
+            else:
+                logger.error(f"API request failed with status {response.status_code}: {response.text}")
+                raise ValueError(f"API request failed: {response.status_code}")
+        
         except httpx.TimeoutException:
             logger.error("Timeout while fetching activities from Intervals.icu")
             raise ValueError("Request timeout")
@@ -110,28 +274,66 @@ class IntervalsICUClient:
             logger.error(f"Error fetching activities from Intervals.icu: {e}")
             raise
     
+    async def iter_activity_windows(
+        self,
+        oldest: date,
+        newest: date,
+        window_days: int = 30
+    ) -> AsyncIterator[Tuple[date, date, List[Dict[str, Any]]]]:
+        """Walk a date range in fixed windows, yielding (window_oldest, window_newest, activities).
+        
+        The next window is only requested once the caller resumes the generator,
+        so at most one window of activities is held in memory at a time.
+        """
+        if window_days < 1:
+            raise ValueError("window_days must be at least 1")
+        
+        window_oldest = oldest
+        while window_oldest <= newest:
+            window_newest = min(window_oldest + timedelta(days=window_days - 1), newest)
+            activities = await self.fetch_activities(window_oldest, window_newest, limit=0)
+            yield window_oldest, window_newest, activities
+            window_oldest = window_newest + timedelta(days=1)
+    
     async def fetch_activity_details(self, activity_id: str) -> Optional[Dict[str, Any]]:
         """Fetch detailed information for a specific activity"""
         try:
-            headers = self._get_auth_header()
+            response = await self._request(
+                "GET",
+                f"{self.base_url}/activity/{activity_id}",
+                endpoint="activity"
+            )
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/activity/{activity_id}",
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.error(f"Failed to fetch activity {activity_id}: {response.status_code}")
-                    return None
-                    
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Failed to fetch activity {activity_id}: {response.status_code}")
+                return None
+        
         except Exception as e:
             logger.error(f"Error fetching activity {activity_id}: {e}")
             return None
     
+    async def fetch_activity_streams(self, activity_id: str, types: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """Fetch the recorded streams ([{"type": ..., "data": [...]}, ...]) of an activity"""
+        try:
+            response = await self._request(
+                "GET",
+                f"{self.base_url}/activity/{activity_id}/streams",
+                params={"types": ",".join(types)},
+                endpoint="streams"
+            )
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Failed to fetch streams for activity {activity_id}: {response.status_code}")
+                return None
+        
+        except Exception as e:
+            logger.error(f"Error fetching streams for activity {activity_id}: {e}")
+            return None
+    
     def _parse_activity_data(self, activity_data: Dict[str, Any]) -> Dict[str, Any]:
         """Parse activity data from Intervals.icu format to our schema"""
         try:
@@ -158,11 +360,18 @@ class IntervalsICUClient:
             }
             
             return parsed
-            
+        
         except Exception as e:
             logger.error(f"Error parsing activity data: {e}")
             return {}
     
+    def _parse_updated(self, activity_data: Dict[str, Any]) -> Optional[datetime]:
+        """Parse the server-side modification timestamp of an activity as naive UTC, if provided"""
+        updated = self._parse_datetime(activity_data.get("updated"))
+        if updated and updated.tzinfo:
+            updated = updated.astimezone(timezone.utc).replace(tzinfo=None)
+        return updated
+    
     def _parse_datetime(self, date_string: Optional[str]) -> Optional[datetime]:
         """Parse datetime string from Intervals.icu"""
         if not date_string:
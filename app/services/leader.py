@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterator, Optional
+
+from sqlalchemy import case, event, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import LeaderLease, write_session
+from app.metrics import LEADER
+
+logger = logging.getLogger(__name__)
+
+# Election whose lease must still be held for commits made in the current task to go through
+_fence: ContextVar[Optional["LeaderElection"]] = ContextVar("leader_fence", default=None)
+
+
+class LeaseLostError(Exception):
+    """Raised instead of committing background work once this process no longer holds the lease"""
+
+
+class LeaderElection:
+    """Lease-based election of the one process that runs background work.
+    
+    Every process tries to take or renew the named row of the leader_leases
+    table every third of the lease period. The holder keeps it by renewing;
+    when it dies, another process takes the lease over once it expires, so
+    failover takes at most one lease period. A leader whose renewals fail
+    steps down when its lease would have expired, before anyone can take over.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+        lease_seconds: Optional[float] = None
+    ):
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.lease_seconds = lease_seconds or settings.LEADER_LEASE_SECONDS
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leader = False
+        self._valid_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def is_leader(self) -> bool:
+        return self._leader and time.monotonic() < self._valid_until
+    
+    @contextmanager
+    def fenced(self) -> Iterator[None]:
+        """Reject commits made in this block, and in tasks it creates, unless the lease is still held"""
+        token = _fence.set(self)
+        try:
+            yield
+        finally:
+            _fence.reset(token)
+    
+    async def try_acquire(self) -> bool:
+        """Take the lease if it is free or expired, or renew it if this process holds it"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        
+        async with write_session() as db:
+            result = await db.execute(
+                update(LeaderLease)
+                .where(
+                    LeaderLease.name == self.name,
+                    or_(LeaderLease.holder == self.holder, LeaderLease.expires_at <= now)
+                )
+                .values(
+                    holder=self.holder,
+                    acquired_at=case((LeaderLease.holder == self.holder, LeaderLease.acquired_at), else_=now),
+                    renewed_at=now,
+                    expires_at=expires_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+            acquired = result.rowcount == 1
+            if not acquired and await db.get(LeaderLease, self.name) is None:
+                db.add(LeaderLease(name=self.name, holder=self.holder, acquired_at=now, renewed_at=now, expires_at=expires_at))
+                acquired = True
+            
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another process created the lease first
+                await db.rollback()
+                acquired = False
+        
+        if acquired:
+            # Counted from before the write, so this process never believes in a lease that already expired
+            self._valid_until = started + self.lease_seconds
+        return acquired
+    
+    def check_fence(self, session: Session) -> None:
+        """Raise LeaseLostError unless the lease row names this process and has not expired.
+        
+        Runs inside the committing transaction, after its writes were flushed:
+        SQLite's write lock (a row lock elsewhere) then keeps another process
+        from taking the lease over before the commit.
+        """
+        if not self.is_leader:
+            raise LeaseLostError(f"Not the {self.name} leader, refusing to commit background work")
+        if not settings.LEADER_ELECTION:
+            return
+        
+        holder = session.execute(
+            select(LeaderLease.holder)
+            .where(LeaderLease.name == self.name, LeaderLease.expires_at > datetime.utcnow())
+            .with_for_update()
+        ).scalar()
+        if holder != self.holder:
+            raise LeaseLostError(f"Lease {self.name} is held by {holder or 'nobody'}, refusing to commit background work")
+    
+    async def release(self) -> None:
+        """Expire the lease now so another process takes over without waiting"""
+        async with write_session() as db:
+            await db.execute(
+                update(LeaderLease)
+                .where(LeaderLease.name == self.name, LeaderLease.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+    
+    async def _step(self) -> None:
+        try:
+            acquired = await self.try_acquire()
+        except Exception as e:
+            logger.warning(f"Leader lease {self.name} could not be renewed: {e}")
+            # Keep leading while the last successful renewal still holds
+            acquired = self.is_leader
+        
+        if acquired and not self._leader:
+            self._leader = True
+            LEADER.labels(self.name).set(1)
+            logger.info(f"Elected leader for {self.name} ({self.holder})")
+            await self._notify(self.on_elected)
+        elif not acquired and self._leader:
+            self._leader = False
+            LEADER.labels(self.name).set(0)
+            logger.warning(f"Lost leadership for {self.name} ({self.holder})")
+            await self._notify(self.on_demoted)
+    
+    async def _notify(self, callback: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await callback()
+        except Exception as e:
+            logger.error(f"Leader {self.name} callback {callback.__name__} failed: {e}")
+    
+    async def _run(self) -> None:
+        while True:
+            delay = self.lease_seconds / 3
+            if self._leader:
+                # Wake up no later than the lease expiry so a leader that can't renew steps down in time
+                delay = min(delay, max(self._valid_until - time.monotonic(), 0))
+            await asyncio.sleep(delay)
+            await self._step()
+    
+    async def start(self) -> None:
+        """Run the first election round now, then keep renewing in the background.
+        
+        With LEADER_ELECTION disabled this process simply acts as the leader.
+        """
+        if not settings.LEADER_ELECTION:
+            self._leader = True
+            self._valid_until = float("inf")
+            LEADER.labels(self.name).set(1)
+            await self._notify(self.on_elected)
+            return
+        
+        await self._step()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop renewing; a leader steps down and releases the lease for a fast handover"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        
+        if not self._leader:
+            return
+        
+        # Still leading while background work winds down, so its last commits pass the fence
+        await self._notify(self.on_demoted)
+        self._leader = False
+        LEADER.labels(self.name).set(0)
+        if settings.LEADER_ELECTION:
+            try:
+                await self.release()
+            except Exception as e:
+                logger.warning(f"Leader lease {self.name} could not be released: {e}")
+
+
+def _check_fence(session):
+    election = _fence.get()
+    if election is None or not session.in_transaction():
+        return
+    session.flush()
+    election.check_fence(session)
+
+
+event.listen(Session, "before_commit", _check_fence)
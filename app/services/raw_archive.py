@@ -0,0 +1,189 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, desc, func, insert, select
+from typing import Any, Dict, Iterable, List, Optional
+import hashlib
+import logging
+import zlib
+
+import orjson
+
+from app.config import settings
+from app.database import ActivityRaw, ArchiveDictionary
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib with a preset dictionary stands in for it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Codec of newly archived payloads; rows keep the codec they were written with
+ARCHIVE_CODEC = "zstd" if zstandard is not None else "zlib"
+ARCHIVE_COMPRESSION_LEVELS = {"zstd": 9, "zlib": 6}
+
+# A shared dictionary is built once this many payloads are archived, from at most DICTIONARY_MAX_SAMPLES of them
+DICTIONARY_MIN_SAMPLES = 50
+DICTIONARY_MAX_SAMPLES = 1000
+# zlib only looks back 32 KiB, so a larger preset dictionary would be wasted
+DICTIONARY_SIZE = 32 * 1024
+
+# Dictionaries never change once written, so they are cached per process by id
+_dictionaries: Dict[int, bytes] = {}
+
+
+def canonical_json(payload: Dict[str, Any]) -> bytes:
+    return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+
+
+def train_dictionary(samples: List[bytes]) -> bytes:
+    """Build a shared dictionary from sample payloads for the current codec"""
+    if ARCHIVE_CODEC == "zstd":
+        return zstandard.train_dictionary(DICTIONARY_SIZE, samples).as_bytes()
+    # zlib has no trainer: sample payloads (mostly the same keys and enum values) make a good preset dictionary
+    return b"".join(samples)[-DICTIONARY_SIZE:]
+
+
+def compress_payload(data: bytes, codec: str, dictionary: Optional[bytes]) -> bytes:
+    level = ARCHIVE_COMPRESSION_LEVELS[codec]
+    if codec == "zstd":
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=level, dict_data=dict_data).compress(data)
+    
+    compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_payload(data: bytes, codec: str, dictionary: Optional[bytes]) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Payload was archived with zstd; install the 'zstandard' package to read it")
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+    
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def decode_row(row) -> Dict[str, Any]:
+    """Decompress and parse one activity_raw row; its dictionary must be loaded (see RawArchive.load_dictionaries)"""
+    dictionary = _dictionaries[row.dictionary_id] if row.dictionary_id is not None else None
+    return orjson.loads(decompress_payload(row.data, row.codec, dictionary))
+
+
+class RawArchive:
+    """Compressed archive of the raw Intervals.icu payloads behind each activity.
+    
+    Every synced payload is kept whole in activity_raw, so fields the parser
+    ignores today can be filled in later by re-parsing the archive instead of
+    re-fetching the history. Payloads are compressed one by one (so a single
+    one can be read back) against a dictionary shared by all of them, which
+    recovers most of the ratio of compressing them together.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def load_dictionaries(self) -> None:
+        """Cache every stored dictionary, so rows can be decoded outside the session"""
+        rows = await self.db.execute(select(ArchiveDictionary.id, ArchiveDictionary.data))
+        _dictionaries.update((row.id, row.data) for row in rows)
+    
+    async def _dictionary_for(self, samples: List[bytes]) -> Optional[int]:
+        """Id of the dictionary to compress with, training the first one when enough payloads are archived.
+        
+        Syncs write small batches, so payloads archived before the dictionary
+        existed are used as training samples along with ``samples``.
+        """
+        dictionary = await self.db.scalar(
+            select(ArchiveDictionary).where(ArchiveDictionary.codec == ARCHIVE_CODEC).order_by(desc(ArchiveDictionary.id)).limit(1)
+        )
+        if dictionary is None:
+            archived = await self.db.scalar(
+                select(func.count())
+                .select_from(ActivityRaw)
+                .where(ActivityRaw.codec == ARCHIVE_CODEC, ActivityRaw.dictionary_id.is_(None))
+            )
+            if len(samples) + archived < DICTIONARY_MIN_SAMPLES:
+                return None
+            rows = await self.db.execute(
+                select(ActivityRaw.codec, ActivityRaw.data)
+                .where(ActivityRaw.codec == ARCHIVE_CODEC, ActivityRaw.dictionary_id.is_(None))
+                .limit(max(DICTIONARY_MAX_SAMPLES - len(samples), 0))
+            )
+            samples = samples[:DICTIONARY_MAX_SAMPLES] + [decompress_payload(row.data, row.codec, None) for row in rows]
+            try:
+                data = train_dictionary(samples)
+            except Exception as e:
+                logger.warning(f"Could not train a {ARCHIVE_CODEC} archive dictionary: {e}")
+                return None
+            dictionary = ArchiveDictionary(codec=ARCHIVE_CODEC, data=data, samples=len(samples))
+            self.db.add(dictionary)
+            await self.db.flush()
+            logger.info(f"Trained a {len(data)} byte {ARCHIVE_CODEC} archive dictionary from {len(samples)} payloads")
+        
+        _dictionaries[dictionary.id] = dictionary.data
+        return dictionary.id
+    
+    async def store(self, payloads: Dict[str, Dict[str, Any]], athlete_id: Optional[int] = None) -> int:
+        """Archive raw payloads by Intervals.icu ID without committing; unchanged payloads are skipped.
+        
+        Returns the number of payloads written.
+        """
+        chunk_size = settings.SYNC_UPSERT_CHUNK_SIZE
+        serialized = {intervals_icu_id: canonical_json(payload) for intervals_icu_id, payload in payloads.items()}
+        hashes = {intervals_icu_id: hashlib.blake2b(data, digest_size=16).hexdigest() for intervals_icu_id, data in serialized.items()}
+        
+        intervals_icu_ids = list(serialized)
+        stored_hashes: Dict[str, str] = {}
+        for i in range(0, len(intervals_icu_ids), chunk_size):
+            rows = await self.db.execute(
+                select(ActivityRaw.intervals_icu_id, ActivityRaw.payload_hash)
+                .where(ActivityRaw.intervals_icu_id.in_(intervals_icu_ids[i:i + chunk_size]))
+            )
+            stored_hashes.update((row.intervals_icu_id, row.payload_hash) for row in rows)
+        
+        changed = [intervals_icu_id for intervals_icu_id in intervals_icu_ids if stored_hashes.get(intervals_icu_id) != hashes[intervals_icu_id]]
+        if not changed:
+            return 0
+        
+        dictionary_id = await self._dictionary_for([serialized[intervals_icu_id] for intervals_icu_id in changed])
+        dictionary = _dictionaries.get(dictionary_id)
+        rows = [
+            {
+                "intervals_icu_id": intervals_icu_id,
+                "athlete_id": athlete_id,
+                "codec": ARCHIVE_CODEC,
+                "dictionary_id": dictionary_id,
+                "payload_hash": hashes[intervals_icu_id],
+                "size": len(serialized[intervals_icu_id]),
+                "data": compress_payload(serialized[intervals_icu_id], ARCHIVE_CODEC, dictionary)
+            }
+            for intervals_icu_id in changed
+        ]
+        
+        for i in range(0, len(rows), chunk_size):
+            await self.db.execute(delete(ActivityRaw).where(ActivityRaw.intervals_icu_id.in_(changed[i:i + chunk_size])))
+            await self.db.execute(insert(ActivityRaw), rows[i:i + chunk_size])
+        return len(rows)
+    
+    async def get(self, intervals_icu_id: str) -> Optional[Dict[str, Any]]:
+        """The archived payload of one activity, or None if it was never archived"""
+        row = await self.db.get(ActivityRaw, intervals_icu_id)
+        if row is None:
+            return None
+        if row.dictionary_id is not None and row.dictionary_id not in _dictionaries:
+            await self.load_dictionaries()
+        return decode_row(row)
+    
+    async def delete(self, intervals_icu_ids: Iterable[str]) -> None:
+        await self.db.execute(delete(ActivityRaw).where(ActivityRaw.intervals_icu_id.in_(list(intervals_icu_ids))))
+    
+    async def read_batch(self, after: str, limit: int) -> List[Any]:
+        """The next ``limit`` archived rows in Intervals.icu ID order, starting after ``after``"""
+        result = await self.db.execute(
+            select(ActivityRaw.intervals_icu_id, ActivityRaw.athlete_id, ActivityRaw.codec, ActivityRaw.dictionary_id, ActivityRaw.data)
+            .where(ActivityRaw.intervals_icu_id > after)
+            .order_by(ActivityRaw.intervals_icu_id)
+            .limit(limit)
+        )
+        return result.all()
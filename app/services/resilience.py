@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from app.metrics import INTERVALS_CIRCUIT_REJECTIONS, INTERVALS_CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Gauge values of the breaker states
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open"""
+    
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is unavailable, failing fast for another {retry_in:.0f}s (circuit open)")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Fail fast while an upstream is down instead of waiting out every timeout.
+    
+    ``failure_threshold`` failed attempts in a row open the circuit: calls are
+    rejected with CircuitOpenError for ``reset_seconds``. After that the
+    circuit is half-open and lets a single trial call through; its success
+    closes the circuit, its failure opens it for another period.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.rejected = 0
+        self.last_failure: Optional[str] = None
+        self.opened_at: Optional[datetime] = None
+        self._opened = 0.0
+        self._trial_started: Optional[float] = None
+        INTERVALS_CIRCUIT_STATE.labels(name).set(CIRCUIT_STATES["closed"])
+    
+    def _set_state(self, state: str) -> None:
+        if state == self.state:
+            return
+        log = logger.info if state != "open" else logger.warning
+        log(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        INTERVALS_CIRCUIT_STATE.labels(self.name).set(CIRCUIT_STATES[state])
+    
+    def _reject(self, retry_in: float) -> None:
+        self.rejected += 1
+        INTERVALS_CIRCUIT_REJECTIONS.labels(self.name).inc()
+        raise CircuitOpenError(self.name, retry_in)
+    
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may be sent now"""
+        now = time.monotonic()
+        if self.state == "open":
+            remaining = self._opened + self.reset_seconds - now
+            if remaining > 0:
+                self._reject(remaining)
+            self._set_state("half_open")
+        
+        if self.state == "half_open":
+            # One trial at a time; a trial that never reported back (e.g. cancelled) expires after a reset period
+            if self._trial_started is not None and now - self._trial_started < self.reset_seconds:
+                self._reject(self._trial_started + self.reset_seconds - now)
+            self._trial_started = now
+    
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._trial_started = None
+        self._set_state("closed")
+    
+    def record_failure(self, reason: str) -> None:
+        self.consecutive_failures += 1
+        self.last_failure = reason
+        self._trial_started = None
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self._opened = time.monotonic()
+            self.opened_at = datetime.utcnow()
+            self._set_state("open")
+    
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = max(self._opened + self.reset_seconds - time.monotonic(), 0.0) if self.state == "open" else 0.0
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "retry_in_seconds": round(retry_in, 3),
+            "opened_at": self.opened_at.isoformat() if self.opened_at else None,
+            "last_failure": self.last_failure,
+            "rejected_calls": self.rejected
+        }
+
+
+class RetryBudget:
+    """Cap retries at a fraction of recent requests, so retries can't multiply load on a struggling upstream.
+    
+    Within the last ``window`` seconds, retries are allowed while they number
+    fewer than ``min_retries`` plus ``ratio`` times the requests made.
+    """
+    
+    def __init__(self, ratio: float, min_retries: int, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+    
+    def _trim(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and events[0] <= now - self.window:
+                events.popleft()
+    
+    def record_request(self) -> None:
+        self._requests.append(time.monotonic())
+    
+    def try_retry(self) -> bool:
+        """Spend one retry from the budget, or return False if it is exhausted"""
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+
+class CachedCheck(Generic[T]):
+    """Result of an expensive check, cached with stale-while-revalidate.
+    
+    A result younger than ``ttl`` is returned as is. An older one is still
+    returned, marked stale, while one background call refreshes it, until it
+    is ``max_stale`` past the TTL; only then (or before the first result) do
+    callers wait for the check. Concurrent callers share one check.
+    """
+    
+    def __init__(self, check: Callable[[], Awaitable[T]], ttl: float, max_stale: float):
+        self.check = check
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.value: Optional[T] = None
+        self.checked_at: Optional[datetime] = None
+        self._checked = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+    
+    async def _run_check(self) -> None:
+        value = await self.check()
+        self.value = value
+        self.checked_at = datetime.utcnow()
+        self._checked = time.monotonic()
+    
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._run_check())
+        return self._refresh
+    
+    async def get(self) -> Tuple[T, float, bool]:
+        """The cached value with its age in seconds and whether it is stale"""
+        age = time.monotonic() - self._checked if self.checked_at else None
+        if age is None or age > self.ttl + self.max_stale:
+            # shield: a caller that gives up must not cancel the check other callers wait on
+            await asyncio.shield(self._start_refresh())
+            age = time.monotonic() - self._checked
+        elif age > self.ttl:
+            self._start_refresh()
+        return self.value, age, age > self.ttl
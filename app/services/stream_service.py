@@ -0,0 +1,231 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, select
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+import zlib
+
+import numpy as np
+
+from app.config import settings
+from app.database import Activity, ActivityStream
+from app.schemas.activity import PowerMetrics
+from app.services.curve_service import CurveService, normalized_power, resample_1hz, training_load
+from app.services.intervals_client import IntervalsICUClient, intervals_client
+
+logger = logging.getLogger(__name__)
+
+# Channel name -> (Intervals.icu stream type, scale); values are stored as round(value * scale)
+STREAM_CHANNELS = {
+    "time": ("time", 1),
+    "power": ("watts", 1),
+    "heart_rate": ("heartrate", 1),
+    "cadence": ("cadence", 1),
+    "speed": ("velocity_smooth", 1000),  # mm/s
+    "altitude": ("altitude", 10),  # dm
+}
+
+STREAM_COMPRESSION_LEVEL = 6
+
+
+def encode_stream(values: np.ndarray, scale: float) -> Tuple[bytes, Optional[bytes]]:
+    """Encode a float series as zlib(int32 deltas of the scaled values) plus a null bitmap.
+    
+    Nulls are forward-filled before delta encoding so gaps cost a run of zero
+    deltas instead of two large jumps.
+    """
+    missing = np.isnan(values)
+    if missing.any():
+        # Index of the last valid sample at every position (0 before the first one)
+        last_valid = np.maximum.accumulate(np.where(missing, 0, np.arange(len(values))))
+        values = np.where(missing, values[last_valid], values)
+        values = np.nan_to_num(values, nan=0.0)
+    
+    quantized = np.rint(values * scale).astype(np.int64)
+    deltas = np.diff(quantized, prepend=0).astype("<i4")
+    data = zlib.compress(deltas.tobytes(), STREAM_COMPRESSION_LEVEL)
+    
+    missing_bitmap = None
+    if missing.any():
+        missing_bitmap = zlib.compress(np.packbits(missing).tobytes(), STREAM_COMPRESSION_LEVEL)
+    return data, missing_bitmap
+
+
+def decode_stream(stream: ActivityStream) -> np.ndarray:
+    """Inverse of ``encode_stream``; null samples come back as NaN"""
+    deltas = np.frombuffer(zlib.decompress(stream.data), dtype="<i4")
+    values = np.cumsum(deltas, dtype=np.int64) / stream.scale
+    
+    if stream.missing is not None:
+        bitmap = np.frombuffer(zlib.decompress(stream.missing), dtype=np.uint8)
+        values[np.unpackbits(bitmap, count=stream.length).astype(bool)] = np.nan
+    return values
+
+
+def downsample(values: np.ndarray, bucket_starts: np.ndarray) -> np.ndarray:
+    """Mean of the non-null samples in each bucket; NaN for buckets without any"""
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), bucket_starts)
+    counts = np.add.reduceat(valid.astype(np.int64), bucket_starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+class StreamService:
+    def __init__(self, db: AsyncSession, client: IntervalsICUClient = intervals_client):
+        self.db = db
+        self.client = client
+    
+    async def fetch_streams(self, activity: Activity) -> Tuple[List[ActivityStream], Dict[str, np.ndarray]]:
+        """Fetch and encode all known channels of an activity from Intervals.icu.
+        
+        Uses no database session, so the (possibly large) download doesn't hold
+        the writer; returns the stream rows and the decoded channels for
+        ``store_streams``.
+        """
+        types = {stream_type: channel for channel, (stream_type, _) in STREAM_CHANNELS.items()}
+        streams = await self.client.fetch_activity_streams(activity.intervals_icu_id, list(types))
+        if streams is None:
+            raise RuntimeError(f"Failed to fetch streams for activity {activity.intervals_icu_id}")
+        
+        rows = []
+        decoded = {}
+        for stream in streams:
+            channel = types.get(stream.get("type"))
+            data = stream.get("data")
+            if channel is None or not data:
+                continue
+            
+            values = np.array([np.nan if value is None else value for value in data], dtype=np.float64)
+            scale = STREAM_CHANNELS[channel][1]
+            encoded, missing = encode_stream(values, scale)
+            decoded[channel] = values
+            rows.append(ActivityStream(
+                activity_id=activity.id,
+                channel=channel,
+                length=len(values),
+                scale=scale,
+                data=encoded,
+                missing=missing
+            ))
+        return rows, decoded
+    
+    async def store_streams(self, activity: Activity, rows: List[ActivityStream], decoded: Dict[str, np.ndarray]) -> List[str]:
+        """Replace the stored streams and curves of an activity with fetched ones.
+        
+        Returns the names of the stored channels.
+        """
+        await self.db.execute(delete(ActivityStream).where(ActivityStream.activity_id == activity.id))
+        self.db.add_all(rows)
+        await CurveService(self.db).store_curves(activity, decoded)
+        await self.db.commit()
+        
+        logger.info(f"Stored {len(rows)} streams for activity {activity.id}")
+        return [row.channel for row in rows]
+    
+    async def _load_channels(self, activity_id: int, channels: Optional[set] = None) -> Dict[str, np.ndarray]:
+        """Decode the stored channels of an activity (all of them when ``channels`` is None)"""
+        query = select(ActivityStream).where(ActivityStream.activity_id == activity_id)
+        if channels:
+            query = query.where(ActivityStream.channel.in_(channels))
+        return {stream.channel: decode_stream(stream) for stream in (await self.db.scalars(query)).all()}
+    
+    async def rebuild_curves(self) -> int:
+        """Recompute the cached curves of every activity with stored streams; returns the activity count"""
+        activity_ids = (await self.db.scalars(select(ActivityStream.activity_id).distinct())).all()
+        curve_service = CurveService(self.db)
+        
+        for activity_id in activity_ids:
+            activity = await self.db.get(Activity, activity_id)
+            if activity is None:
+                continue
+            await curve_service.store_curves(activity, await self._load_channels(activity_id))
+        
+        await self.db.commit()
+        logger.info(f"Rebuilt curves for {len(activity_ids)} activities")
+        return len(activity_ids)
+    
+    async def get_power_metrics(self, activity: Activity) -> Optional[PowerMetrics]:
+        """Recompute NP / IF / TSS from the power stream, next to the values stored on the activity.
+        
+        FTP comes from ATHLETE_FTP, or is derived from the stored NP / IF when unset.
+        Returns None when no power stream is stored.
+        """
+        channels = await self._load_channels(activity.id, {"time", "power"})
+        power = channels.get("power")
+        if power is None:
+            return None
+        if "time" in channels and len(channels["time"]) == len(power):
+            power = resample_1hz(channels["time"], power)
+        
+        ftp = settings.ATHLETE_FTP or None
+        if ftp is None and activity.normalized_power and activity.intensity_factor:
+            ftp = activity.normalized_power / activity.intensity_factor
+        
+        metrics = PowerMetrics(
+            activity_id=activity.id,
+            ftp=round(ftp, 1) if ftp else None,
+            normalized_power=normalized_power(power),
+            stored_normalized_power=activity.normalized_power,
+            stored_intensity_factor=activity.intensity_factor,
+            stored_tss=activity.tss
+        )
+        if metrics.normalized_power is not None and ftp:
+            seconds = activity.moving_time or len(power)
+            metrics.intensity_factor, metrics.tss = training_load(metrics.normalized_power, seconds, ftp)
+        
+        for field in ("normalized_power", "intensity_factor", "tss"):
+            value = getattr(metrics, field)
+            if value is not None:
+                setattr(metrics, field, round(value, 3 if field == "intensity_factor" else 1))
+        return metrics
+    
+    async def get_streams(
+        self,
+        activity_id: int,
+        channels: Optional[List[str]] = None,
+        resolution: int = 1
+    ) -> Optional[Dict[str, object]]:
+        """Decode the requested channels, averaged into ``resolution``-second buckets.
+        
+        Buckets follow the ``time`` channel when it was recorded, otherwise
+        every ``resolution`` samples. Returns None when no streams are stored.
+        """
+        unknown = set(channels or []) - set(STREAM_CHANNELS)
+        if unknown:
+            raise ValueError(f"Unknown channels: {', '.join(sorted(unknown))}")
+        
+        decoded = await self._load_channels(activity_id, set(channels) | {"time"} if channels else None)
+        if not decoded:
+            return None
+        
+        length = min(len(values) for values in decoded.values())
+        
+        if resolution > 1 and length:
+            if "time" in decoded:
+                buckets = decoded["time"][:length] // resolution
+            else:
+                buckets = np.arange(length) // resolution
+            bucket_starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        
+        result = {}
+        for channel in channels or list(STREAM_CHANNELS):
+            if channel not in decoded:
+                continue
+            values = decoded[channel][:length]
+            decimals = int(math.log10(STREAM_CHANNELS[channel][1]))
+            if resolution > 1 and length:
+                # Buckets are labelled with their first timestamp rather than the mean
+                if channel == "time":
+                    values = values[bucket_starts]
+                else:
+                    values = downsample(values, bucket_starts)
+                    decimals += 1
+            result[channel] = np.round(values, decimals)
+        
+        return {
+            "activity_id": activity_id,
+            "resolution": resolution,
+            "points": len(next(iter(result.values()))) if result else 0,
+            "channels": result
+        }
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import Athlete, SessionLocal, SyncJob, write_session
+from app.schemas.activity import SyncJobStatus
+from app.services.activity_service import ActivityService
+from app.services.intervals_client import intervals_client
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def subtract_ranges(oldest: date, newest: date, covered: List[Tuple[date, date]]) -> List[Tuple[date, date]]:
+    """Parts of [oldest, newest] (inclusive days) not covered by any of ``covered``"""
+    pieces = [(oldest, newest)]
+    for covered_oldest, covered_newest in covered:
+        remaining = []
+        for piece_oldest, piece_newest in pieces:
+            if covered_newest < piece_oldest or covered_oldest > piece_newest:
+                remaining.append((piece_oldest, piece_newest))
+                continue
+            if covered_oldest > piece_oldest:
+                remaining.append((piece_oldest, covered_oldest - timedelta(days=1)))
+            if covered_newest < piece_newest:
+                remaining.append((covered_newest + timedelta(days=1), piece_newest))
+        pieces = remaining
+    return pieces
+
+
+def job_pages(oldest: date, newest: date, limit: Optional[int]) -> int:
+    """Number of fetches a job makes: one capped page, or one per SYNC_JOB_WINDOW_DAYS window"""
+    if limit:
+        return 1
+    return -(-((newest - oldest).days + 1) // settings.SYNC_JOB_WINDOW_DAYS)
+
+
+def job_status(job: SyncJob, deduplicated: bool = False, related_job_ids: Optional[List[int]] = None) -> SyncJobStatus:
+    status = SyncJobStatus.model_validate(job)
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        status.elapsed_seconds = round(elapsed, 3)
+        if elapsed > 0:
+            status.activities_per_second = round(job.activities_fetched / elapsed, 1)
+    status.deduplicated = deduplicated
+    status.related_job_ids = related_job_ids or []
+    return status
+
+
+class SyncJobRunner:
+    """Runs sync jobs from the sync_jobs table on a few in-process workers.
+    
+    Submitting a range subtracts the ranges of queued or running jobs of the
+    same athlete first, so overlapping requests never fetch the same days
+    twice; a fully covered request just returns the existing job. Jobs left
+    queued or running by a previous process are picked up again on start.
+    
+    Only the elected leader runs the workers. Other processes just insert
+    jobs, which the leader picks up by polling the table. A leader stepping
+    down lets running jobs finish their current page and puts them back in
+    the queue; the next leader resumes them from the following page.
+    """
+    
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or settings.SYNC_JOB_WORKERS
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._enqueued: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._busy: Set[asyncio.Task] = set()
+        self._stopping = False
+        self._submit_lock = asyncio.Lock()
+    
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        
+        # Ids queued in a previous term are recovered from the table below
+        self._queue = asyncio.Queue()
+        self._enqueued = set()
+        self._stopping = False
+        async with write_session() as db:
+            leftover = list(await db.scalars(
+                select(SyncJob).where(SyncJob.status.in_(ACTIVE_STATUSES)).order_by(SyncJob.id)
+            ))
+            for job in leftover:
+                job.status = "queued"
+            await db.commit()
+        
+        for job in leftover:
+            self._enqueue(job.id)
+        if leftover:
+            logger.info(f"Resuming {len(leftover)} unfinished sync jobs")
+        
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._poll()))
+    
+    async def stop(self) -> None:
+        # Idle workers are cancelled now; busy ones return after the page they are on
+        self._stopping = True
+        for task in self._tasks:
+            if task not in self._busy:
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def join(self) -> None:
+        """Wait until every submitted job has finished"""
+        await self._queue.join()
+    
+    async def submit(
+        self,
+        oldest: date,
+        newest: date,
+        limit: Optional[int] = None,
+        athlete_id: Optional[int] = None
+    ) -> SyncJobStatus:
+        """Queue a sync of [oldest, newest], deduplicated against active jobs"""
+        async with self._submit_lock:
+            async with write_session() as db:
+                query = select(SyncJob).where(
+                    SyncJob.status.in_(ACTIVE_STATUSES),
+                    SyncJob.oldest <= newest,
+                    SyncJob.newest >= oldest,
+                    SyncJob.athlete_id.is_(None) if athlete_id is None else SyncJob.athlete_id == athlete_id
+                ).order_by(SyncJob.id)
+                active = list(await db.scalars(query))
+                
+                # A job covering the whole range on its own; a capped fetch needs an identical or unlimited one
+                primary = next(
+                    (
+                        job for job in active
+                        if job.oldest <= oldest and job.newest >= newest and job.limit in (None, limit)
+                    ),
+                    None
+                )
+                if limit is None:
+                    pieces = subtract_ranges(oldest, newest, [(job.oldest, job.newest) for job in active if job.limit is None])
+                else:
+                    # A capped fetch can't be split across jobs
+                    pieces = [] if primary else [(oldest, newest)]
+                
+                if not pieces:
+                    # Covered by several unlimited jobs together: report the first, the rest are related
+                    primary = primary or next(job for job in active if job.limit is None)
+                    related = [job.id for job in active if job.id != primary.id and job.limit is None]
+                    logger.info(f"Sync of {oldest} - {newest} already covered by job {primary.id}")
+                    return job_status(primary, deduplicated=True, related_job_ids=related)
+                
+                jobs = [
+                    SyncJob(
+                        athlete_id=athlete_id,
+                        oldest=piece_oldest,
+                        newest=piece_newest,
+                        limit=limit,
+                        status="queued",
+                        pages_total=job_pages(piece_oldest, piece_newest, limit)
+                    )
+                    for piece_oldest, piece_newest in pieces
+                ]
+                db.add_all(jobs)
+                await db.commit()
+            
+            # Without local workers the leader process picks the jobs up from the table
+            if self._tasks:
+                for job in jobs:
+                    self._enqueue(job.id)
+        
+        related = [job.id for job in jobs[1:]] + [job.id for job in active if job.limit is None]
+        return job_status(jobs[0], related_job_ids=related)
+    
+    def _enqueue(self, job_id: int) -> None:
+        if job_id not in self._enqueued:
+            self._enqueued.add(job_id)
+            self._queue.put_nowait(job_id)
+    
+    async def _poll(self) -> None:
+        """Pick up jobs queued by other processes"""
+        while True:
+            await asyncio.sleep(settings.SYNC_JOB_POLL_SECONDS)
+            try:
+                async with SessionLocal() as db:
+                    queued = list(await db.scalars(
+                        select(SyncJob.id).where(SyncJob.status == "queued").order_by(SyncJob.id)
+                    ))
+                for job_id in queued:
+                    self._enqueue(job_id)
+            except Exception as e:
+                logger.error(f"Polling for sync jobs failed: {e}")
+    
+    async def _work(self) -> None:
+        while not self._stopping:
+            job_id = await self._queue.get()
+            worker = asyncio.current_task()
+            self._busy.add(worker)
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Sync job {job_id} crashed: {e}")
+            finally:
+                self._busy.discard(worker)
+                self._enqueued.discard(job_id)
+                self._queue.task_done()
+    
+    async def _run(self, job_id: int) -> None:
+        """Fetch the job's range page by page; each page is written and counted in one commit.
+        
+        A windowed job cut short by a restart or a leader change resumes after
+        its last committed page instead of walking the whole range again.
+        """
+        async with write_session() as db:
+            job = await db.get(SyncJob, job_id)
+            if job is None or job.status not in ACTIVE_STATUSES:
+                return
+            
+            athlete = await db.get(Athlete, job.athlete_id) if job.athlete_id else None
+            resumed = (
+                not job.limit
+                and job.started_at is not None
+                and 0 < job.pages_fetched < job.pages_total
+                # Committed pages only map back to days while the window size is unchanged
+                and job.pages_total == job_pages(job.oldest, job.newest, job.limit)
+            )
+            if resumed:
+                logger.info(f"Resuming sync job {job_id} after page {job.pages_fetched} of {job.pages_total}")
+            else:
+                job.started_at = datetime.utcnow()
+                job.pages_fetched = job.activities_fetched = 0
+                job.activities_created = job.activities_updated = job.activities_unchanged = 0
+            job.status = "running"
+            job.finished_at = None
+            await db.commit()
+            oldest, newest, limit, pages_total = job.oldest, job.newest, job.limit, job.pages_total
+            pages = job.pages_fetched
+        
+        # Fetches happen outside the write session so other writers aren't blocked meanwhile
+        client = intervals_client.for_athlete(athlete.intervals_icu_athlete_id, athlete.api_key) if athlete else intervals_client
+        try:
+            started = time.perf_counter()
+            status, error = "success", None
+            if limit:
+                activities_data = (await client.fetch_activities(oldest, newest, limit))[:limit]
+                await self._apply_page(job_id, athlete, activities_data, (time.perf_counter() - started) * 1000)
+            else:
+                async for _, _, activities_data in client.iter_activity_windows(
+                    oldest + timedelta(days=pages * settings.SYNC_JOB_WINDOW_DAYS), newest, settings.SYNC_JOB_WINDOW_DAYS
+                ):
+                    await self._apply_page(job_id, athlete, activities_data, (time.perf_counter() - started) * 1000)
+                    pages += 1
+                    if self._stopping and pages < pages_total:
+                        # Demoted: the next leader resumes the job after this page
+                        status = "queued"
+                        break
+                    started = time.perf_counter()
+        except Exception as e:
+            logger.error(f"Sync job {job_id} failed: {e}")
+            status, error = "error", str(e)
+        
+        async with write_session() as db:
+            job = await db.get(SyncJob, job_id)
+            job.status = status
+            job.error = error
+            job.finished_at = datetime.utcnow() if status != "queued" else None
+            await db.commit()
+            logger.info(f"Sync job {job_id} {status}: {job.activities_fetched} activities in {job.pages_fetched} pages")
+    
+    @staticmethod
+    async def _apply_page(job_id: int, athlete: Optional[Athlete], activities_data: list, fetch_ms: float) -> None:
+        async with write_session() as db:
+            await ActivityService(db, athlete).apply_sync_job_page(job_id, activities_data, {"fetch_ms": fetch_ms})
+
+
+sync_job_runner = SyncJobRunner()
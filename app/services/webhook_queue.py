@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from app.config import settings
+from app.database import Athlete, SessionLocal, WebhookEvent, write_session
+from app.services.activity_service import ActivityService, sync_activity_details
+
+logger = logging.getLogger(__name__)
+
+# Intervals.icu event types -> action applied by the worker
+WEBHOOK_ACTIONS = {
+    "ACTIVITY_UPLOADED": "upsert",
+    "ACTIVITY_CREATED": "upsert",
+    "ACTIVITY_UPDATED": "upsert",
+    "ACTIVITY_ANALYZED": "upsert",
+    "ACTIVITY_DELETED": "delete",
+}
+
+
+class WebhookQueue:
+    """In-process queue of activity changes, coalesced per activity.
+    
+    Each activity is queued at most once: further events for an activity that
+    is still waiting only replace its pending action (the latest event wins),
+    so a burst of updates costs one fetch. A single worker drains the queue in
+    batches and applies only the affected activities.
+    
+    Only the elected leader runs the worker. Other processes store received
+    events in the webhook_events table, which the leader drains by polling,
+    and a leader stepping down stores its pending events there as well.
+    """
+    
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        # intervals_icu_id -> (action, Intervals.icu athlete id)
+        self._pending: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._worker: Optional[asyncio.Task] = None
+        self._poller: Optional[asyncio.Task] = None
+        self.coalesced = 0
+        self.applied = 0
+    
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+    
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+    
+    def enqueue(self, intervals_icu_id: str, action: str, athlete_id: Optional[str] = None) -> bool:
+        """Queue an activity change; returns False when it was merged into a pending one"""
+        merged = intervals_icu_id in self._pending
+        self._pending[intervals_icu_id] = (action, athlete_id)
+        if merged:
+            self.coalesced += 1
+            return False
+        
+        self._queue.put_nowait(intervals_icu_id)
+        return True
+    
+    async def submit(self, events: List[Tuple[str, str, Optional[str]]]) -> int:
+        """Queue (intervals_icu_id, action, athlete_id) events here, or store them for the leader.
+        
+        Returns how many were not merged into an already pending change.
+        """
+        if self.running:
+            return sum(self.enqueue(*event) for event in events)
+        return await self._store({intervals_icu_id: (action, athlete_id) for intervals_icu_id, action, athlete_id in events})
+    
+    async def _store(self, events: Dict[str, Tuple[str, Optional[str]]]) -> int:
+        if not events:
+            return 0
+        async with write_session() as db:
+            stored = set(await db.scalars(
+                select(WebhookEvent.intervals_icu_id).where(WebhookEvent.intervals_icu_id.in_(list(events)))
+            ))
+            for intervals_icu_id, (action, athlete_id) in events.items():
+                await db.merge(WebhookEvent(intervals_icu_id=intervals_icu_id, action=action, athlete_id=athlete_id))
+            await db.commit()
+        self.coalesced += len(stored)
+        return len(events) - len(stored)
+    
+    def start(self) -> None:
+        if not self.running:
+            # Ids queued in a previous term were stored by stop()
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+            self._poller = asyncio.create_task(self._poll())
+            logger.info("Webhook worker started")
+    
+    async def stop(self) -> None:
+        tasks = [task for task in (self._worker, self._poller) if task is not None]
+        if not tasks:
+            return
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = self._poller = None
+        
+        # Hand the pending events over to the next leader
+        pending, self._pending = self._pending, {}
+        try:
+            await self._store(pending)
+        except Exception as e:
+            logger.error(f"Could not store {len(pending)} pending webhook events: {e}")
+        logger.info(f"Webhook worker stopped ({len(pending)} events left pending)")
+    
+    async def join(self) -> None:
+        """Wait until every queued change has been applied"""
+        await self._queue.join()
+    
+    def _take_batch(self, first: str) -> Dict[str, Tuple[str, Optional[str]]]:
+        keys = [first]
+        while len(keys) < self.batch_size and not self._queue.empty():
+            keys.append(self._queue.get_nowait())
+        return {key: self._pending.pop(key) for key in keys}
+    
+    async def _poll(self) -> None:
+        """Move events stored by other processes into the queue"""
+        while True:
+            try:
+                async with write_session() as db:
+                    stored = list(await db.scalars(select(WebhookEvent).order_by(WebhookEvent.received_at)))
+                    if stored:
+                        await db.execute(
+                            delete(WebhookEvent).where(WebhookEvent.intervals_icu_id.in_([event.intervals_icu_id for event in stored]))
+                        )
+                        await db.commit()
+                for event in stored:
+                    self.enqueue(event.intervals_icu_id, event.action, event.athlete_id)
+            except Exception as e:
+                logger.error(f"Polling for stored webhook events failed: {e}")
+            await asyncio.sleep(settings.SYNC_JOB_POLL_SECONDS)
+    
+    async def _run(self) -> None:
+        while True:
+            batch = self._take_batch(await self._queue.get())
+            try:
+                await self._apply(batch)
+                self.applied += len(batch)
+            except asyncio.CancelledError:
+                # Stopped mid-batch: keep the events so stop() hands them over (re-applying is idempotent)
+                for intervals_icu_id, event in batch.items():
+                    self._pending.setdefault(intervals_icu_id, event)
+                raise
+            except Exception as e:
+                # Missed changes are repaired by the periodic full-history reconciliation (reconcile_activities_job)
+                logger.error(f"Error applying {len(batch)} webhook events: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def _apply(self, batch: Dict[str, Tuple[str, Optional[str]]]) -> None:
+        """Group the batch per athlete and action, then fetch/upsert or delete"""
+        groups: Dict[Tuple[Optional[str], str], List[str]] = {}
+        for intervals_icu_id, (action, athlete_id) in batch.items():
+            groups.setdefault((athlete_id, action), []).append(intervals_icu_id)
+        
+        for (athlete_id, action), intervals_icu_ids in groups.items():
+            athlete = await self._get_athlete(athlete_id)
+            if athlete is None and athlete_id and athlete_id != settings.INTERVALS_ICU_ATHLETE_ID:
+                logger.warning(f"Ignoring {len(intervals_icu_ids)} webhook events for unknown athlete {athlete_id}")
+                continue
+            
+            if action == "delete":
+                async with write_session() as db:
+                    activity_service = ActivityService(db, athlete)
+                    for intervals_icu_id in intervals_icu_ids:
+                        await activity_service.delete_activity_by_intervals_id(intervals_icu_id)
+            else:
+                # Fetches hold no session; each fetched batch is written in its own short write session
+                result = await sync_activity_details(intervals_icu_ids, athlete)
+                logger.info(f"Applied {len(intervals_icu_ids)} webhook upserts: {result.get('status')}")
+    
+    @staticmethod
+    async def _get_athlete(athlete_id: Optional[str]) -> Optional[Athlete]:
+        if not athlete_id:
+            return None
+        async with SessionLocal() as db:
+            return await db.scalar(select(Athlete).where(Athlete.intervals_icu_athlete_id == athlete_id))
+
+
+def parse_webhook_events(payload: Dict[str, Any]) -> List[Tuple[str, str, Optional[str]]]:
+    """Extract (intervals_icu_id, action, athlete_id) from an Intervals.icu webhook body.
+    
+    Unknown event types and events without an activity ID are skipped.
+    """
+    events = []
+    for event in payload.get("events") or []:
+        action = WEBHOOK_ACTIONS.get(event.get("type"))
+        activity = event.get("activity") or {}
+        intervals_icu_id = activity.get("id") or event.get("activity_id")
+        if action is None or not intervals_icu_id:
+            continue
+        
+        athlete_id = event.get("athlete_id") or activity.get("icu_athlete_id")
+        events.append((str(intervals_icu_id), action, str(athlete_id) if athlete_id else None))
+    return events
+
+
+webhook_queue = WebhookQueue()
@@ -0,0 +1,64 @@
+"""Benchmark: read endpoint latency over a database holding the whole synthetic history."""
+from benchmarks.conftest import BENCH_ACTIVITIES
+
+
+def _get(run, client, url: str, headers: dict = None, expected_status: int = 200):
+    async def request():
+        response = await client.get(url, headers=headers)
+        assert response.status_code == expected_status, response.text
+        return response
+    
+    return lambda: run(request())
+
+
+def bench_activities_first_page(benchmark, client, run, synced_database):
+    response = benchmark(_get(run, client, "/api/v1/activities?limit=100"))
+    assert len(response.json()) == 100
+
+
+def bench_activities_offset_page(benchmark, client, run, synced_database):
+    """A page from the middle of the history using skip/limit"""
+    response = benchmark(_get(run, client, f"/api/v1/activities?skip={BENCH_ACTIVITIES // 2}&limit=100"))
+    assert len(response.json()) == 100
+
+
+def bench_activities_cursor_page(benchmark, client, run, synced_database):
+    """The same middle page reached through the keyset cursor"""
+    previous = _get(run, client, f"/api/v1/activities?skip={BENCH_ACTIVITIES // 2 - 100}&limit=100")()
+    cursor = previous.headers["X-Next-Cursor"]
+    
+    response = benchmark(_get(run, client, f"/api/v1/activities?cursor={cursor}&limit=100"))
+    assert len(response.json()) == 100
+
+
+def bench_activities_filtered_page(benchmark, client, run, synced_database):
+    benchmark(_get(run, client, "/api/v1/activities?activity_type=Run&start_date=2020-01-01&limit=100"))
+
+
+def bench_summary(benchmark, client, run, synced_database):
+    summary = benchmark(_get(run, client, "/api/v1/activities/summary")).json()
+    assert summary["total_activities"] == BENCH_ACTIVITIES
+
+
+def bench_summary_not_modified(benchmark, client, run, synced_database):
+    etag = _get(run, client, "/api/v1/activities/summary")().headers["ETag"]
+    benchmark(_get(run, client, "/api/v1/activities/summary", {"If-None-Match": etag}, expected_status=304))
+
+
+def bench_weekly_aggregates(benchmark, client, run, synced_database):
+    benchmark(_get(run, client, "/api/v1/activities/aggregates?bucket=week"))
+
+
+def bench_activities_first_page_cached(benchmark, client, run, synced_database, response_cache):
+    # Warm the cache outside the timed call, so every measured round (one with --benchmark-disable) is a hit
+    get = _get(run, client, "/api/v1/activities?limit=100")
+    assert get().headers["X-Cache"] == "MISS"
+    response = benchmark(get)
+    assert response.headers["X-Cache"] == "HIT"
+
+
+def bench_summary_cached_not_modified(benchmark, client, run, synced_database, response_cache):
+    # The warm-up request also stores the response, so the conditional requests below are hits
+    etag = _get(run, client, "/api/v1/activities/summary")().headers["ETag"]
+    response = benchmark(_get(run, client, "/api/v1/activities/summary", {"If-None-Match": etag}, expected_status=304))
+    assert response.headers["X-Cache"] == "HIT"
@@ -0,0 +1,136 @@
+"""Benchmark: request latency under mixed read + sync load.
+
+Drives the ASGI app in-process while one task repeatedly runs a large
+``POST /activities/sync`` (Intervals.icu replaced by an in-memory fake; a
+queued ``202`` job is polled until it finishes) and
+several readers poll ``/health``, ``/activities`` and ``/activities/summary``.
+Because everything shares one event loop, any database call that blocks the
+loop shows up directly in the readers' p99 latency.
+
+The script only talks HTTP, so it can be run unchanged against an older
+checkout for a before/after comparison.
+
+Usage:
+    python -m benchmarks.bench_concurrency --duration 10 --readers 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+READ_ROUTES = ["/api/v1/health", "/api/v1/activities?limit=100", "/api/v1/activities/summary"]
+
+
+def fake_activities(count: int, offset: int = 0) -> List[dict]:
+    return [
+        {
+            "id": f"i{offset + i}",
+            "name": f"Activity {offset + i}",
+            "type": "Ride" if i % 3 else "Run",
+            "start_date_local": f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}T07:{i % 60:02d}:00",
+            "moving_time": 3600 + i,
+            "distance": 30000.0 + i,
+            "training_stress_score": 50.0 + i % 40,
+        }
+        for i in range(count)
+    ]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def format_ms(samples: List[float], fraction: float) -> str:
+    if not samples:
+        return f"{'-':>9}"
+    return f"{percentile(samples, fraction) * 1000:>9.2f}"
+
+
+async def run(duration: float, readers: int, sync_size: int) -> None:
+    import httpx
+    from app.database import init_db
+    from app.main import app
+    from app.services.intervals_client import intervals_client
+    
+    generation = {"value": 0}
+    
+    async def fetch_activities(oldest=None, newest=None, limit=100):
+        # New content on every call so each sync really writes
+        generation["value"] += 1
+        activities = fake_activities(sync_size)
+        for activity in activities:
+            activity["name"] = f"{activity['name']} v{generation['value']}"
+        return activities
+    
+    intervals_client.fetch_activities = fetch_activities
+    await init_db()
+    
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    syncs: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        
+        async def sync() -> None:
+            response = await client.post("/api/v1/activities/sync", params={"oldest": "2024-01-01", "limit": 1000})
+            response.raise_for_status()
+            job = response.json()
+            # Queued sync jobs: wait until the job is done so the timing covers the whole write
+            while response.status_code == 202 and job["status"] in ("queued", "running"):
+                await asyncio.sleep(0.01)
+                job = (await client.get(f"/api/v1/sync/jobs/{job['id']}")).json()
+        
+        await sync()
+        # Warm the connection pool so cold connects don't land in the measured window
+        await asyncio.gather(*(client.get(READ_ROUTES[i % len(READ_ROUTES)]) for i in range(readers)))
+        deadline = time.perf_counter() + duration
+        
+        async def reader(index: int) -> None:
+            route = READ_ROUTES[index % len(READ_ROUTES)]
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(route)
+                response.raise_for_status()
+                latencies[route].append(time.perf_counter() - started)
+                # In-process /health never suspends; yield so it can't starve the loop
+                await asyncio.sleep(0)
+        
+        async def syncer() -> None:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await sync()
+                syncs.append(time.perf_counter() - started)
+        
+        await asyncio.gather(syncer(), *(reader(i) for i in range(readers)))
+    
+    print(f"{'route':<32} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for route in READ_ROUTES:
+        samples = latencies[route]
+        print(
+            f"{route:<32} {len(samples):>9} {format_ms(samples, 0.5)} "
+            f"{format_ms(samples, 0.99)} {format_ms(samples, 1.0)}"
+        )
+    print(f"{'POST /activities/sync':<32} {len(syncs):>9} {format_ms(syncs, 0.5)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--sync-size", type=int, default=1000)
+    args = parser.parse_args()
+    
+    # Fresh database per run so results are comparable
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ.setdefault("INTERVALS_ICU_API_KEY", "")
+    
+    asyncio.run(run(args.duration, args.readers, args.sync_size))
+
+
+if __name__ == "__main__":
+    main()
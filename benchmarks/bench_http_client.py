@@ -0,0 +1,114 @@
+"""Benchmark: per-request latency of a fresh httpx client vs the shared connection pool.
+
+Starts a local stub of the Intervals.icu activity endpoint and fetches the same
+activity repeatedly, first opening a new ``httpx.AsyncClient`` for every request
+(the previous behaviour) and then through the pooled ``IntervalsICUClient``.
+
+Usage:
+    python -m benchmarks.bench_http_client --requests 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+ACTIVITY_PAYLOAD = json.dumps({
+    "id": "i1000",
+    "name": "Stub Ride",
+    "type": "Ride",
+    "start_date_local": "2024-01-01T10:00:00",
+    "moving_time": 3600,
+    "distance": 30000.0,
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(ACTIVITY_PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(ACTIVITY_PAYLOAD)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    """Start the stub server on a free local port in a background thread"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def report(label: str, samples: List[float]) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(
+        f"{label:<22} mean={statistics.mean(samples_ms):7.3f}ms "
+        f"median={statistics.median(samples_ms):7.3f}ms p95={p95:7.3f}ms"
+    )
+
+
+async def run(requests: int) -> None:
+    import httpx
+    from app.services.intervals_client import IntervalsICUClient
+    
+    client = IntervalsICUClient()
+    headers = client._get_auth_header()
+    url = f"{client.base_url}/activity/i1000"
+    
+    fresh = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        async with httpx.AsyncClient() as http_client:
+            response = await http_client.get(url, headers=headers, timeout=30.0)
+            response.json()
+        fresh.append(time.perf_counter() - started)
+    
+    await client.start()
+    pooled = []
+    try:
+        for _ in range(requests):
+            started = time.perf_counter()
+            await client.fetch_activity_details("i1000")
+            pooled.append(time.perf_counter() - started)
+    finally:
+        await client.close()
+    
+    report("fresh client/request", fresh)
+    report("shared pool", pooled)
+    print(f"speedup (mean): {statistics.mean(fresh) / statistics.mean(pooled):.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    
+    server = start_stub_server()
+    host, port = server.server_address
+    os.environ["INTERVALS_ICU_BASE_URL"] = f"http://{host}:{port}/api/v1"
+    os.environ.setdefault("INTERVALS_ICU_API_KEY", "benchmark")
+    os.environ.setdefault("INTERVALS_ICU_ATHLETE_ID", "i0")
+    # Measure connection reuse, not the client-side rate limiter
+    os.environ.setdefault("INTERVALS_ICU_REQUESTS_PER_SECOND", "100000")
+    os.environ.setdefault("INTERVALS_ICU_RATE_BURST", "100000")
+    
+    try:
+        asyncio.run(run(args.requests))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark: end-to-end sync of a synthetic history from the mock Intervals.icu server.
+
+Each round syncs the whole history through ``POST /activities/sync`` and the
+sync job workers, so the numbers cover fetching, parsing, upserting and the
+summary / rollup maintenance in ``activity_service.py``.
+"""
+import tracemalloc
+
+from benchmarks.conftest import BENCH_ACTIVITIES, clear_database, full_sync
+from benchmarks.mock_intervals import FaultProfile
+
+
+def _report_throughput(benchmark, job: dict) -> None:
+    benchmark.extra_info["activities"] = job["activities_fetched"]
+    benchmark.extra_info["pages"] = job["pages_fetched"]
+    if benchmark.disabled or benchmark.stats is None:
+        # --benchmark-disable runs each benchmark once without collecting timings
+        return
+    benchmark.extra_info["activities_per_second"] = round(job["activities_fetched"] / benchmark.stats.stats.mean, 1)
+
+
+def bench_initial_sync(benchmark, client, run, empty_database):
+    """Sync into an empty database: every activity is inserted"""
+    job = benchmark.pedantic(
+        lambda: run(full_sync(client)),
+        setup=lambda: run(clear_database()),
+        rounds=3
+    )
+    assert job["activities_created"] == BENCH_ACTIVITIES
+    _report_throughput(benchmark, job)
+
+
+def bench_unchanged_resync(benchmark, client, run, synced_database):
+    """Sync again with nothing changed upstream: every activity is skipped by its content hash"""
+    job = benchmark.pedantic(lambda: run(full_sync(client)), rounds=3)
+    assert job["activities_unchanged"] == BENCH_ACTIVITIES
+    _report_throughput(benchmark, job)
+
+
+def bench_changed_resync(benchmark, client, run, mock_intervals, synced_database):
+    """Sync again after every activity changed upstream: every activity is updated"""
+    def bump_version():
+        mock_intervals.history.version += 1
+    
+    job = benchmark.pedantic(lambda: run(full_sync(client)), setup=bump_version, rounds=3)
+    assert job["activities_updated"] == BENCH_ACTIVITIES
+    _report_throughput(benchmark, job)
+
+
+def bench_sync_with_faults(benchmark, client, run, mock_intervals, empty_database):
+    """Initial sync against 5 ms latency with 2% server errors and 2% 429s, retried by the client"""
+    mock_intervals.faults = FaultProfile(latency_ms=5, error_rate=0.02, rate_limit_rate=0.02, retry_after=0)
+    
+    job = benchmark.pedantic(
+        lambda: run(full_sync(client)),
+        setup=lambda: run(clear_database()),
+        rounds=3
+    )
+    assert job["activities_created"] == BENCH_ACTIVITIES
+    _report_throughput(benchmark, job)
+    benchmark.extra_info["injected_500"] = mock_intervals.counters.get("500", 0)
+    benchmark.extra_info["injected_429"] = mock_intervals.counters.get("429", 0)
+
+
+def bench_sync_peak_memory(benchmark, client, run, empty_database):
+    """Peak Python heap during an initial sync (tracemalloc slows the round down, so it runs once)"""
+    def traced_sync():
+        tracemalloc.start()
+        try:
+            job = run(full_sync(client))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_memory_mb"] = round(peak / 1024 / 1024, 1)
+        return job
+    
+    job = benchmark.pedantic(traced_sync, rounds=1)
+    assert job["activities_created"] == BENCH_ACTIVITIES
+
+
+def bench_reparse_archive(benchmark, client, run, synced_database):
+    """Re-parse the whole raw archive with no network; nothing changed, so every row is skipped by its hash"""
+    def reparse():
+        response = run(client.post("/api/v1/activities/reparse"))
+        response.raise_for_status()
+        return response.json()
+    
+    result = benchmark.pedantic(reparse, rounds=3)
+    assert result["status"] == "success", result["message"]
+    assert result["activities_unchanged"] == BENCH_ACTIVITIES
+    if not (benchmark.disabled or benchmark.stats is None):
+        benchmark.extra_info["activities_per_second"] = round(BENCH_ACTIVITIES / benchmark.stats.stats.mean, 1)
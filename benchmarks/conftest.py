@@ -0,0 +1,148 @@
+"""Fixtures of the end-to-end benchmark suite.
+
+Every benchmark talks to the app in-process over ASGI, backed by a fresh
+SQLite database, while ``IntervalsICUClient`` fetches from the local mock
+Intervals.icu server. Coroutines all run on one event loop, because the
+database engines and the sync job runner are bound to the loop they first
+ran on.
+
+Usage:
+    pytest benchmarks
+    BENCH_ACTIVITIES=500000 pytest benchmarks --benchmark-json=bench.json
+"""
+import asyncio
+import os
+import tempfile
+from datetime import date
+
+import pytest
+
+from benchmarks.mock_intervals import FaultProfile, MockIntervalsServer, SyntheticHistory
+
+# Size of the synthetic history synced and queried by the suite
+BENCH_ACTIVITIES = int(os.getenv("BENCH_ACTIVITIES", "10000"))
+
+_mock_server = MockIntervalsServer(SyntheticHistory(BENCH_ACTIVITIES, seed=1))
+
+
+def pytest_configure(config):
+    # Settings are read on import, so the environment is set before the app is imported
+    _mock_server.start()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["INTERVALS_ICU_BASE_URL"] = _mock_server.base_url
+    os.environ["INTERVALS_ICU_API_KEY"] = "benchmark"
+    os.environ["INTERVALS_ICU_ATHLETE_ID"] = "i1"
+    # Measure the app, not the client-side rate limiter or retry sleeps
+    os.environ["INTERVALS_ICU_REQUESTS_PER_SECOND"] = "100000"
+    os.environ["INTERVALS_ICU_RATE_BURST"] = "100000"
+    os.environ["INTERVALS_ICU_BACKOFF_BASE"] = "0.001"
+    os.environ["INTERVALS_ICU_BACKOFF_MAX"] = "0.01"
+    # Read benchmarks measure the database path; cached variants enable the cache explicitly
+    os.environ["CACHE_BACKEND"] = "none"
+
+
+def pytest_unconfigure(config):
+    _mock_server.shutdown()
+    _mock_server.server_close()
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine to completion on the suite's event loop"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def app(run):
+    from app.database import dispose_db, init_db
+    from app.main import app as fastapi_app
+    from app.services.intervals_client import intervals_client
+    from app.services.sync_jobs import sync_job_runner
+    
+    run(init_db())
+    run(sync_job_runner.start())
+    yield fastapi_app
+    run(sync_job_runner.stop())
+    run(intervals_client.close())
+    run(dispose_db())
+
+
+@pytest.fixture(scope="session")
+def client(app, run):
+    import httpx
+    
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    yield http_client
+    run(http_client.aclose())
+
+
+@pytest.fixture
+def mock_intervals():
+    """The mock server, with its history, fault profile and counters restored after the test"""
+    history = _mock_server.history
+    yield _mock_server
+    _mock_server.history = history
+    _mock_server.faults = FaultProfile()
+    _mock_server.counters.clear()
+
+
+async def full_sync(client) -> dict:
+    """Sync the mock athlete's whole history through POST /activities/sync and wait for the jobs"""
+    from app.services.sync_jobs import sync_job_runner
+    
+    response = await client.post(
+        "/api/v1/activities/sync",
+        params={"oldest": _mock_server.history.oldest.isoformat(), "newest": date.today().isoformat()}
+    )
+    response.raise_for_status()
+    await sync_job_runner.join()
+    
+    job = (await client.get(f"/api/v1/sync/jobs/{response.json()['id']}")).json()
+    assert job["status"] == "success", job["error"]
+    return job
+
+
+async def clear_database() -> None:
+    from sqlalchemy import delete
+    
+    from app.database import Base, write_session
+    
+    async with write_session() as db:
+        for table in reversed(Base.metadata.sorted_tables):
+            await db.execute(delete(table))
+        await db.commit()
+
+
+async def count_activities() -> int:
+    from sqlalchemy import func, select
+    
+    from app.database import Activity, SessionLocal
+    
+    async with SessionLocal() as db:
+        return await db.scalar(select(func.count(Activity.id)))
+
+
+@pytest.fixture
+def empty_database(app, run):
+    run(clear_database())
+
+
+@pytest.fixture
+def synced_database(app, client, run):
+    """Database holding the whole mock history, synced once and reused across benchmarks"""
+    if run(count_activities()) != BENCH_ACTIVITIES:
+        run(clear_database())
+        run(full_sync(client))
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    """Enable an in-process response cache for one benchmark"""
+    import app.cache
+    from app.cache import MemoryCache, ResponseCache
+    
+    cache = ResponseCache(MemoryCache(), ttl=300, max_body_bytes=1 << 20)
+    monkeypatch.setattr(app.cache, "response_cache", cache)
+    return cache
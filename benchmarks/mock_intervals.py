@@ -0,0 +1,378 @@
+"""Local stand-in for the Intervals.icu API.
+
+Serves synthetic athlete histories (or activities recorded from the real API)
+on the endpoints ``IntervalsICUClient`` uses, with configurable latency,
+server errors and 429 responses:
+
+    GET /api/v1/athlete/{athlete_id}
+    GET /api/v1/athlete/{athlete_id}/activities?oldest=&newest=&limit=
+    GET /api/v1/activity/{activity_id}
+    GET /api/v1/activity/{activity_id}/streams?types=
+
+Synthetic activities are generated on demand from their index, so a history
+of 500k activities costs no memory until a window of it is requested, and the
+same seed always produces the same history.
+
+Usage:
+    # Serve 100k activities with 20 ms latency, 1% errors and 2% 429s
+    python -m benchmarks.mock_intervals --activities 100000 --latency-ms 20 --error-rate 0.01 --rate-limit-rate 0.02
+
+    # Point the app at it
+    INTERVALS_ICU_BASE_URL=http://127.0.0.1:8090/api/v1 INTERVALS_ICU_API_KEY=mock INTERVALS_ICU_ATHLETE_ID=i1 uvicorn app.main:app
+
+    # Record the real account once and serve it back instead of synthetic data
+    python -m benchmarks.mock_intervals --record fixtures/activities.json
+    python -m benchmarks.mock_intervals --fixture fixtures/activities.json
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# (type, weight, typical speed m/s, typical duration s, has power)
+ACTIVITY_TYPES = [
+    ("Ride", 45, 8.0, 5400, True),
+    ("VirtualRide", 15, 9.0, 3600, True),
+    ("Run", 25, 3.2, 2700, False),
+    ("Swim", 8, 0.9, 2400, False),
+    ("Walk", 4, 1.4, 3000, False),
+    ("WeightTraining", 3, 0.0, 2700, False),
+]
+TYPE_WEIGHTS = [weight for _, weight, _, _, _ in ACTIVITY_TYPES]
+DAY_PARTS = [(6, "Morning"), (12, "Lunch"), (17, "Afternoon"), (19, "Evening")]
+TAGS = ["race", "intervals", "commute", "recovery", "long", "group"]
+
+# Stream types served by /activity/{id}/streams
+STREAM_TYPES = ("time", "watts", "heartrate", "cadence", "velocity_smooth", "altitude")
+
+ID_OFFSET = 1_000_000
+
+
+@dataclass
+class FaultProfile:
+    """Latency and failure injection applied to every request"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 0.0
+
+
+class SyntheticHistory:
+    """Deterministic activity history of ``count`` activities ending at ``end``.
+    
+    Activity ``index`` starts ``(count - 1 - index) / per_day`` days before the
+    end, so start dates grow with the index and a date range is found by
+    bisecting the indexes.
+    Bumping ``version`` edits every activity, as if each was renamed upstream.
+    """
+    
+    def __init__(
+        self,
+        count: int,
+        per_day: float = 1.5,
+        end: Optional[date] = None,
+        seed: int = 1,
+        streams: bool = False
+    ):
+        self.count = count
+        self.per_day = per_day
+        self.end = datetime.combine(end or date.today(), datetime.min.time())
+        self.seed = seed
+        self.streams = streams
+        self.version = 0
+    
+    @property
+    def oldest(self) -> date:
+        return self._start(0).date()
+    
+    def _start(self, index: int) -> datetime:
+        day_offset = (self.count - 1 - index) / self.per_day
+        day = self.end - timedelta(days=math.floor(day_offset))
+        hour, _ = DAY_PARTS[index % len(DAY_PARTS)]
+        return day + timedelta(hours=hour, minutes=index % 60)
+    
+    def _index_range(self, oldest: Optional[date], newest: Optional[date]) -> range:
+        indexes = range(self.count)
+        start_date = lambda index: self._start(index).date()
+        first = bisect_left(indexes, oldest, key=start_date) if oldest else 0
+        last = bisect_right(indexes, newest, key=start_date) if newest else self.count
+        return range(first, last)
+    
+    def activities(self, oldest: Optional[date], newest: Optional[date], limit: int = 0) -> List[Dict[str, Any]]:
+        """Activities in [oldest, newest], newest first like the real API"""
+        indexes = reversed(self._index_range(oldest, newest))
+        if limit:
+            indexes = list(indexes)[:limit]
+        return [self.activity(index) for index in indexes]
+    
+    def index_of(self, activity_id: str) -> Optional[int]:
+        try:
+            index = int(activity_id.lstrip("i")) - ID_OFFSET
+        except ValueError:
+            return None
+        return index if 0 <= index < self.count else None
+    
+    def activity(self, index: int) -> Dict[str, Any]:
+        rng = random.Random(self.seed * 7919 + index)
+        activity_type, _, speed, duration, has_power = rng.choices(ACTIVITY_TYPES, TYPE_WEIGHTS)[0]
+        start = self._start(index)
+        moving_time = int(duration * rng.uniform(0.4, 2.0))
+        average_speed = speed * rng.uniform(0.8, 1.2) if speed else None
+        part = next(name for hour, name in reversed(DAY_PARTS) if start.hour >= hour)
+        average_heartrate = rng.randint(115, 165)
+        
+        activity = {
+            "id": f"i{ID_OFFSET + index}",
+            "name": f"{part} {activity_type}" + (f" (edit {self.version})" if self.version else ""),
+            "type": activity_type,
+            "start_date_local": start.isoformat(),
+            "moving_time": moving_time,
+            "elapsed_time": moving_time + rng.randint(0, 900),
+            "distance": round(average_speed * moving_time, 1) if average_speed else 0.0,
+            "average_speed": round(average_speed, 3) if average_speed else None,
+            "max_speed": round(average_speed * rng.uniform(1.3, 2.0), 3) if average_speed else None,
+            "average_heartrate": average_heartrate,
+            "max_heartrate": average_heartrate + rng.randint(10, 30),
+            "training_stress_score": round(moving_time / 3600 * rng.uniform(35, 95), 1),
+            "description": "",
+            "tags": rng.sample(TAGS, rng.randint(0, 2)),
+            "updated": (start + timedelta(hours=2, seconds=self.version)).isoformat() + "Z",
+        }
+        if has_power:
+            average_watts = rng.randint(140, 260)
+            normalized = average_watts * rng.uniform(1.02, 1.15)
+            activity.update({
+                "average_watts": average_watts,
+                "max_watts": average_watts * rng.randint(3, 5),
+                "normalized_power": round(normalized, 1),
+                "intensity_factor": round(normalized / 250, 3),
+            })
+        return activity
+    
+    def activity_streams(self, index: int, types: List[str]) -> List[Dict[str, Any]]:
+        """1 Hz streams for an activity: a noisy random walk per channel"""
+        activity = self.activity(index)
+        length = min(activity["moving_time"], 6 * 3600)
+        rng = np.random.default_rng(self.seed * 7919 + index)
+        base_power = activity.get("average_watts") or 0
+        speed = activity["average_speed"] or 0.0
+        
+        generators = {
+            "time": lambda: np.arange(length),
+            "watts": lambda: np.clip(base_power + rng.normal(0, base_power * 0.3, length), 0, None).round(),
+            "heartrate": lambda: np.clip(activity["average_heartrate"] + np.cumsum(rng.normal(0, 0.3, length)), 60, 200).round(),
+            "cadence": lambda: np.clip(rng.normal(88, 6, length), 0, None).round(),
+            "velocity_smooth": lambda: np.clip(speed + rng.normal(0, speed * 0.1 + 0.01, length), 0, None).round(3),
+            "altitude": lambda: (200 + np.cumsum(rng.normal(0, 0.2, length))).round(1),
+        }
+        streams = []
+        for stream_type in types:
+            if stream_type not in generators or (stream_type == "watts" and not base_power):
+                continue
+            streams.append({"type": stream_type, "data": generators[stream_type]().tolist()})
+        return streams
+
+
+class RecordedHistory:
+    """Activities recorded from the real API (a JSON list), served back as-is"""
+    
+    def __init__(self, activities: List[Dict[str, Any]]):
+        self.streams = False
+        self._activities = sorted(activities, key=lambda activity: activity.get("start_date_local") or "")
+        self._dates = [(activity.get("start_date_local") or "")[:10] for activity in self._activities]
+        self._by_id = {str(activity.get("id")): activity for activity in self._activities}
+        self.count = len(self._activities)
+    
+    @classmethod
+    def load(cls, path: str) -> "RecordedHistory":
+        with open(path) as fixture:
+            return cls(json.load(fixture))
+    
+    @property
+    def oldest(self) -> date:
+        return date.fromisoformat(self._dates[0]) if self._dates else date.today()
+    
+    def activities(self, oldest: Optional[date], newest: Optional[date], limit: int = 0) -> List[Dict[str, Any]]:
+        first = bisect_left(self._dates, oldest.isoformat()) if oldest else 0
+        last = bisect_right(self._dates, newest.isoformat()) if newest else self.count
+        selected = self._activities[first:last][::-1]
+        return selected[:limit] if limit else selected
+    
+    def index_of(self, activity_id: str) -> Optional[str]:
+        return activity_id if activity_id in self._by_id else None
+    
+    def activity(self, activity_id: str) -> Dict[str, Any]:
+        return self._by_id[activity_id]
+    
+    def activity_streams(self, activity_id: str, types: List[str]) -> List[Dict[str, Any]]:
+        return []
+
+
+class MockIntervalsServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the served history, fault profile and request counters"""
+    
+    daemon_threads = True
+    
+    def __init__(self, history, faults: Optional[FaultProfile] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), MockIntervalsHandler)
+        self.history = history
+        self.faults = faults or FaultProfile()
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+    
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+    
+    def draw(self) -> float:
+        with self._lock:
+            return self._random.random()
+    
+    def start(self) -> "MockIntervalsServer":
+        """Serve in a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class MockIntervalsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: MockIntervalsServer
+    
+    def do_GET(self):
+        faults = self.server.faults
+        if faults.latency_ms or faults.jitter_ms:
+            time.sleep((faults.latency_ms + self.server.draw() * faults.jitter_ms) / 1000)
+        
+        if not self.headers.get("Authorization"):
+            return self._send(401, {"error": "Unauthorized"})
+        
+        draw = self.server.draw()
+        if draw < faults.rate_limit_rate:
+            self.server.count("429")
+            return self._send(429, {"error": "Too many requests"}, {"Retry-After": f"{faults.retry_after:g}"})
+        if draw < faults.rate_limit_rate + faults.error_rate:
+            self.server.count("500")
+            return self._send(500, {"error": "Injected failure"})
+        
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        if parts[:2] != ["api", "v1"]:
+            return self._send(404, {"error": "Not found"})
+        parts = parts[2:]
+        history = self.server.history
+        
+        if len(parts) == 2 and parts[0] == "athlete":
+            self.server.count("athlete")
+            return self._send(200, {"id": parts[1], "name": "Mock Athlete"})
+        
+        if len(parts) == 3 and parts[0] == "athlete" and parts[2] == "activities":
+            self.server.count("activities")
+            oldest = date.fromisoformat(params["oldest"][:10]) if params.get("oldest") else None
+            newest = date.fromisoformat(params["newest"][:10]) if params.get("newest") else None
+            return self._send(200, history.activities(oldest, newest, int(params.get("limit") or 0)))
+        
+        if len(parts) in (2, 3) and parts[0] == "activity":
+            index = history.index_of(parts[1])
+            if index is None:
+                return self._send(404, {"error": "Activity not found"})
+            if len(parts) == 2:
+                self.server.count("activity")
+                return self._send(200, history.activity(index))
+            if parts[2] == "streams" and history.streams:
+                self.server.count("streams")
+                types = [t for t in (params.get("types") or ",".join(STREAM_TYPES)).split(",") if t]
+                return self._send(200, history.activity_streams(index, types))
+        
+        return self._send(404, {"error": "Not found"})
+    
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+async def record_fixture(path: str, oldest: date, window_days: int = 90) -> int:
+    """Save every activity of the configured athlete since ``oldest`` as a fixture file"""
+    from app.services.intervals_client import intervals_client
+    
+    activities = []
+    try:
+        async for _, _, window in intervals_client.iter_activity_windows(oldest, date.today(), window_days):
+            activities.extend(window)
+    finally:
+        await intervals_client.close()
+    
+    with open(path, "w") as fixture:
+        json.dump(activities, fixture)
+    return len(activities)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--activities", type=int, default=10000)
+    parser.add_argument("--per-day", type=float, default=1.5, help="Activities per day of history")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--streams", action="store_true", help="Serve 1 Hz streams for every activity")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--fixture", help="Serve activities recorded with --record instead of synthetic ones")
+    parser.add_argument("--record", metavar="PATH", help="Record the configured athlete's activities to PATH and exit")
+    parser.add_argument("--record-since", type=date.fromisoformat, default=date(2010, 1, 1))
+    args = parser.parse_args()
+    
+    if args.record:
+        import asyncio
+        count = asyncio.run(record_fixture(args.record, args.record_since))
+        print(f"Recorded {count} activities to {args.record}")
+        return
+    
+    if args.fixture:
+        history = RecordedHistory.load(args.fixture)
+    else:
+        history = SyntheticHistory(args.activities, args.per_day, seed=args.seed, streams=args.streams)
+    faults = FaultProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.retry_after)
+    
+    server = MockIntervalsServer(history, faults, args.host, args.port)
+    print(f"Serving {history.count} activities since {history.oldest} at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
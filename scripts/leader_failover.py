@@ -0,0 +1,173 @@
+"""Check leader election failover across several local worker processes.
+
+Starts ``--workers`` processes that compete for one lease in a shared
+database (a temporary SQLite file unless DATABASE_URL is set). The script
+then repeatedly stops the current leader: gracefully (SIGTERM, the lease is
+released) or by crashing it (SIGKILL, the lease has to expire). It reports
+how long each handover took, restarts the stopped worker, and fails if two
+processes ever led at once or a failover took longer than one lease period.
+
+Usage:
+    python -m scripts.leader_failover --workers 4 --lease 3 --rounds 6
+    DATABASE_URL=postgresql://localhost/tracker python -m scripts.leader_failover
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+
+async def run_worker(lease_seconds: float) -> None:
+    """Compete for the lease until SIGTERM, printing elected/demoted events as JSON lines"""
+    from app.services.leader import LeaderElection
+    
+    def report(event: str) -> None:
+        print(json.dumps({"event": event, "pid": os.getpid(), "at": time.time()}), flush=True)
+    
+    async def on_elected():
+        report("elected")
+    
+    async def on_demoted():
+        report("demoted")
+    
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    
+    election = LeaderElection("failover-demo", on_elected, on_demoted, lease_seconds=lease_seconds)
+    await election.start()
+    report("started")
+    await stopping.wait()
+    await election.stop()
+
+
+class Cluster:
+    """The worker processes and the leadership events they report"""
+    
+    def __init__(self, lease_seconds: float, env: Dict[str, str]):
+        self.lease_seconds = lease_seconds
+        self.env = env
+        self.processes: Dict[int, asyncio.subprocess.Process] = {}
+        self.leaders: Dict[int, float] = {}
+        self.violations: List[str] = []
+        self.elected = asyncio.Event()
+    
+    async def spawn(self) -> None:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "scripts.leader_failover", "--worker", "--lease", str(self.lease_seconds),
+            stdout=asyncio.subprocess.PIPE, env=self.env
+        )
+        self.processes[process.pid] = process
+        asyncio.create_task(self._read(process))
+    
+    async def _read(self, process: asyncio.subprocess.Process) -> None:
+        async for line in process.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event["event"] == "elected":
+                self.leaders[event["pid"]] = event["at"]
+                if len(self.leaders) > 1:
+                    self.violations.append(f"{sorted(self.leaders)} led at the same time")
+                self.elected.set()
+            elif event["event"] == "demoted":
+                self.leaders.pop(event["pid"], None)
+    
+    async def wait_for_leader(self, timeout: float) -> Optional[int]:
+        deadline = time.monotonic() + timeout
+        while not self.leaders:
+            self.elected.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self.elected.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+        return next(iter(self.leaders))
+    
+    async def stop(self, pid: int, crash: bool) -> None:
+        process = self.processes.pop(pid)
+        process.send_signal(signal.SIGKILL if crash else signal.SIGTERM)
+        await process.wait()
+        # A killed leader never reports its demotion
+        self.leaders.pop(pid, None)
+    
+    async def shutdown(self) -> None:
+        for pid in list(self.processes):
+            await self.stop(pid, crash=False)
+
+
+async def run(workers: int, lease_seconds: float, rounds: int) -> bool:
+    env = dict(os.environ)
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'leader.db')}"
+    env["LEADER_ELECTION"] = "true"
+    os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+    
+    from app.database import dispose_db, init_db
+    await init_db()
+    await dispose_db()
+    
+    cluster = Cluster(lease_seconds, env)
+    for _ in range(workers):
+        await cluster.spawn()
+    
+    ok = True
+    try:
+        leader = await cluster.wait_for_leader(lease_seconds * 2)
+        if leader is None:
+            print("No leader was elected")
+            return False
+        print(f"{workers} workers, lease {lease_seconds:g} s, first leader: pid {leader}")
+        
+        for round_number in range(rounds):
+            crash = round_number % 2 == 1
+            # Let the lease be renewed a few times before stopping its holder
+            await asyncio.sleep(lease_seconds)
+            
+            stopped_at = time.time()
+            await cluster.stop(leader, crash)
+            leader = await cluster.wait_for_leader(lease_seconds * 2)
+            if leader is None:
+                print(f"round {round_number + 1}: no new leader within {lease_seconds * 2:g} s")
+                return False
+            
+            failover = cluster.leaders[leader] - stopped_at
+            within_lease = failover <= lease_seconds + 0.5
+            ok = ok and within_lease
+            how = "SIGKILL" if crash else "SIGTERM"
+            print(f"round {round_number + 1}: {how:7} -> pid {leader} in {failover:.2f} s{'' if within_lease else ' (slower than one lease)'}")
+            await cluster.spawn()
+    finally:
+        await cluster.shutdown()
+    
+    for violation in cluster.violations:
+        print(f"violation: {violation}")
+    return ok and not cluster.violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lease", type=float, default=3.0, help="lease period in seconds")
+    parser.add_argument("--rounds", type=int, default=6, help="leaders to stop, alternating SIGTERM and SIGKILL")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        asyncio.run(run_worker(args.lease))
+        return
+    
+    ok = asyncio.run(run(args.workers, args.lease, args.rounds))
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
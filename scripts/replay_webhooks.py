@@ -0,0 +1,79 @@
+"""Replay Intervals.icu webhook events against a running instance.
+
+Events come from a file (a JSON webhook body, a JSON list of events or one
+event per line) or are generated: ``--generate 50 --repeat 5`` sends 50
+activities updated five times each, which the receiver should coalesce.
+
+Usage:
+    python -m scripts.replay_webhooks events.json --secret $WEBHOOK_SECRET
+    python -m scripts.replay_webhooks --generate 50 --repeat 5 --athlete i123 --secret s3cret
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from typing import List
+
+import httpx
+
+
+def load_events(path: str) -> List[dict]:
+    with open(path) as f:
+        text = f.read().strip()
+    if text.startswith("{") and "\n{" not in text:
+        body = json.loads(text)
+        return body.get("events", [body])
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def generate_events(count: int, repeat: int, athlete_id: str, delete_fraction: float) -> List[dict]:
+    events = []
+    for _ in range(repeat):
+        for i in range(count):
+            event_type = "ACTIVITY_DELETED" if random.random() < delete_fraction else "ACTIVITY_UPDATED"
+            events.append({"athlete_id": athlete_id, "type": event_type, "activity": {"id": f"i{i}"}})
+    random.shuffle(events)
+    return events
+
+
+async def replay(url: str, secret: str, events: List[dict], batch_size: int, delay: float) -> None:
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        for i in range(0, len(events), batch_size):
+            batch = events[i:i + batch_size]
+            response = await client.post(url, json={"secret": secret, "events": batch})
+            print(f"{i + len(batch):>6}/{len(events)}  {response.status_code}  {response.text}")
+            if delay:
+                await asyncio.sleep(delay)
+        
+        status = await client.get(url.replace("/webhooks/intervals", "/webhooks/status"))
+        print(f"worker status: {status.text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file", nargs="?", help="events file (JSON body, JSON list or NDJSON)")
+    parser.add_argument("--url", default="http://localhost:8000/api/v1/webhooks/intervals")
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", ""))
+    parser.add_argument("--generate", type=int, default=0, help="generate events for N activities instead of reading a file")
+    parser.add_argument("--repeat", type=int, default=1, help="events per generated activity")
+    parser.add_argument("--athlete", default=os.getenv("INTERVALS_ICU_ATHLETE_ID", ""))
+    parser.add_argument("--delete-fraction", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=20, help="events per POST")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds between POSTs")
+    args = parser.parse_args()
+    
+    if args.generate:
+        events = generate_events(args.generate, args.repeat, args.athlete, args.delete_fraction)
+    elif args.file:
+        events = load_events(args.file)
+    else:
+        parser.error("pass an events file or --generate N")
+    
+    asyncio.run(replay(args.url, args.secret, events, args.batch_size, args.delay))
+
+
+if __name__ == "__main__":
+    main()
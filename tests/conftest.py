@@ -0,0 +1,29 @@
+"""Fixtures of the unit test suite.
+
+Tests run against a fresh SQLite database in a temporary directory; nothing
+talks to Intervals.icu.
+
+Usage:
+    pytest tests
+"""
+import os
+import tempfile
+
+import pytest
+
+
+def pytest_configure(config):
+    # Settings are read on import, so the environment is set before the app is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+    os.environ["INTERVALS_ICU_API_KEY"] = ""
+    os.environ["CACHE_BACKEND"] = "none"
+    os.environ["LEADER_ELECTION"] = "false"
+
+
+@pytest.fixture(scope="session")
+async def database():
+    from app.database import dispose_db, init_db
+    
+    await init_db()
+    yield
+    await dispose_db()
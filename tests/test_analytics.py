@@ -0,0 +1,63 @@
+import math
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.database import SessionLocal, write_session
+from app.schemas.activity import ActivityCreate
+from app.services.activity_service import ActivityService
+from app.services.analytics_service import EWMA_BLOCK_SIZE, AnalyticsService, ewma
+
+
+def ewma_loop(values, time_constant, initial=0.0):
+    """Reference day-by-day EWMA"""
+    alpha = 1 - math.exp(-1 / time_constant)
+    out, state = [], initial
+    for value in values:
+        state += alpha * (value - state)
+        out.append(state)
+    return np.array(out)
+
+
+@pytest.mark.parametrize("time_constant", [7, 42])
+def test_ewma_matches_day_by_day_loop_across_blocks(time_constant):
+    values = np.random.default_rng(1).uniform(0, 200, EWMA_BLOCK_SIZE * 3 + 17)
+    
+    np.testing.assert_allclose(ewma(values, time_constant), ewma_loop(values, time_constant), rtol=1e-9)
+
+
+def test_ewma_decays_from_initial_value():
+    result = ewma(np.zeros(10), 7, initial=100.0)
+    
+    np.testing.assert_allclose(result, 100.0 * math.exp(-1 / 7) ** np.arange(1, 11))
+
+
+def test_ewma_of_empty_series():
+    assert len(ewma(np.array([]), 42)) == 0
+
+
+async def test_fitness_series(database):
+    async with write_session() as db:
+        for day, tss in ((1, 100.0), (3, 50.0)):
+            await ActivityService(db).create_activity(ActivityCreate(
+                intervals_icu_id=f"fitness-{day}",
+                name="Fitness test",
+                type="FitnessTest",
+                start_date=datetime(2024, 1, day, 8),
+                tss=tss
+            ))
+    
+    async with SessionLocal() as db:
+        points = await AnalyticsService(db).get_fitness(end_date=date(2024, 1, 5), activity_type="FitnessTest")
+    
+    daily_tss = [100.0, 0.0, 50.0, 0.0, 0.0]
+    ctl = ewma_loop(daily_tss, settings.FITNESS_CTL_DAYS)
+    atl = ewma_loop(daily_tss, settings.FITNESS_ATL_DAYS)
+    assert [point.day for point in points] == [date(2024, 1, day) for day in range(1, 6)]
+    assert [point.tss for point in points] == daily_tss
+    assert [point.ctl for point in points] == pytest.approx(ctl, abs=0.01)
+    assert [point.atl for point in points] == pytest.approx(atl, abs=0.01)
+    # Form is the previous day's fitness minus fatigue
+    assert [point.tsb for point in points] == pytest.approx([0.0, *(ctl - atl)[:-1]], abs=0.01)
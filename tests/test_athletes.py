@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from app.database import Activity, Athlete, write_session
+from app.schemas.athlete import AthleteCreate
+from app.services.activity_service import ActivityService
+from app.services.athlete_service import AthleteService
+
+
+async def register(intervals_icu_athlete_id: str) -> Athlete:
+    async with write_session() as db:
+        return await AthleteService(db).create_athlete(AthleteCreate(intervals_icu_athlete_id=intervals_icu_athlete_id))
+
+
+async def sync(athlete: Athlete, intervals_icu_id: str) -> None:
+    """Store one Intervals.icu payload the way a sync of the athlete does"""
+    async with write_session() as db:
+        await ActivityService(db, athlete)._upsert_activities([
+            {"id": intervals_icu_id, "name": intervals_icu_id, "type": "Ride", "start_date_local": "2024-03-01T08:00:00"}
+        ])
+        await db.commit()
+
+
+async def test_athlete_loads_its_activities(database):
+    athlete = await register("i-fk-loaded")
+    await sync(athlete, "fk-loaded")
+    
+    async with write_session() as db:
+        loaded = await db.scalar(select(Athlete).where(Athlete.id == athlete.id).options(selectinload(Athlete.activities)))
+        assert [activity.intervals_icu_id for activity in loaded.activities] == ["fk-loaded"]
+
+
+async def test_athlete_with_activities_cannot_be_deleted(database):
+    athlete = await register("i-fk-restricted")
+    await sync(athlete, "fk-restricted")
+    
+    async with write_session() as db:
+        await db.delete(await db.get(Athlete, athlete.id))
+        with pytest.raises(IntegrityError):
+            await db.commit()
+        await db.rollback()
+    
+    async with write_session() as db:
+        activity = await db.scalar(select(Activity).where(Activity.intervals_icu_id == "fk-restricted"))
+        assert activity.athlete_id == athlete.id
+
+
+async def test_activity_of_an_unknown_athlete_is_rejected(database):
+    with pytest.raises(IntegrityError):
+        await sync(Athlete(id=999999, intervals_icu_athlete_id="i-fk-unknown"), "fk-unknown")
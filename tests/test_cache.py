@@ -0,0 +1,195 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.cache
+from app.cache import MemoryCache, ResponseCache, ResponseCacheMiddleware
+from app.database import DATABASE_URL, write_session
+from app.metrics import instrument_engines
+from app.schemas.activity import ActivityCreate
+from app.services.activity_service import ActivityService
+
+
+class FakeRedis:
+    """Async Redis stand-in that validates ``ex`` the way redis-py does"""
+    
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+    
+    async def get(self, key):
+        return self.values.get(key)
+    
+    async def set(self, key, value, ex=None):
+        if ex is not None and not isinstance(ex, (int, timedelta)):
+            raise TypeError("ex must be datetime.timedelta or int")
+        self.values[key] = value
+        self.expiries[key] = ex
+    
+    async def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+    
+    async def aclose(self):
+        pass
+
+
+def make_client(asgi_app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app), base_url="http://test")
+
+
+@pytest.fixture
+def items_app():
+    items = FastAPI()
+    calls = []
+    
+    @items.get("/items")
+    async def list_items(size: int = 1):
+        calls.append(size)
+        return {"items": ["x" * size]}
+    
+    items.state.calls = calls
+    return ResponseCacheMiddleware(items, prefixes=["/items"])
+
+
+@pytest.fixture
+def redis_cache(monkeypatch):
+    cache = ResponseCache(FakeRedis(), ttl=300.0, max_body_bytes=1 << 10)
+    monkeypatch.setattr(app.cache, "response_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    cache = ResponseCache(MemoryCache(), ttl=300.0, max_body_bytes=1 << 20, generation_check=60)
+    monkeypatch.setattr(app.cache, "response_cache", cache)
+    return cache
+
+
+async def test_redis_backend_stores_with_whole_second_ttl(items_app, redis_cache):
+    async with make_client(items_app) as client:
+        miss = await client.get("/items")
+        hit = await client.get("/items")
+    
+    assert (miss.status_code, miss.headers["X-Cache"]) == (200, "MISS")
+    assert (hit.status_code, hit.headers["X-Cache"]) == (200, "HIT")
+    assert hit.json() == miss.json()
+    assert list(redis_cache.backend.expiries.values()) == [300]
+    assert items_app.app.state.calls == [1]
+
+
+async def test_redis_generation_bump_invalidates(items_app, redis_cache):
+    async with make_client(items_app) as client:
+        await client.get("/items")
+        redis_cache.invalidate()
+        await asyncio.gather(*redis_cache._pending)
+        response = await client.get("/items")
+    
+    assert response.headers["X-Cache"] == "MISS"
+
+
+async def test_oversized_responses_bypass_the_cache(items_app, redis_cache):
+    async with make_client(items_app) as client:
+        first = await client.get("/items", params={"size": 2000})
+        second = await client.get("/items", params={"size": 2000})
+    
+    assert first.headers["X-Cache"] == second.headers["X-Cache"] == "BYPASS"
+    assert items_app.app.state.calls == [2000, 2000]
+
+
+async def test_query_parameter_order_shares_an_entry(items_app, redis_cache):
+    async with make_client(items_app) as client:
+        await client.get("/items?size=3&x=1")
+        response = await client.get("/items?x=1&size=3")
+    
+    assert response.headers["X-Cache"] == "HIT"
+
+
+async def test_etag_revalidation_answers_304(items_app, redis_cache):
+    async with make_client(items_app) as client:
+        etag = (await client.get("/items")).headers["ETag"]
+        not_modified = await client.get("/items", headers={"If-None-Match": f"W/{etag}"})
+        modified = await client.get("/items", headers={"If-None-Match": '"other"'})
+    
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    assert not_modified.headers["ETag"] == etag
+    assert modified.status_code == 200
+    assert modified.headers["Cache-Control"] == "no-cache"
+
+
+async def test_hits_do_not_query_the_database(database, memory_cache):
+    from app.main import app as fastapi_app
+    
+    instrument_engines()
+    async with make_client(fastapi_app) as client:
+        miss = await client.get("/api/v1/activities")
+        hit = await client.get("/api/v1/activities")
+    
+    assert miss.headers["X-Cache"] == "MISS"
+    assert (hit.headers["X-Cache"], hit.headers["X-DB-Queries"]) == ("HIT", "0")
+
+
+async def test_local_write_invalidates_at_once(database, memory_cache):
+    from app.main import app as fastapi_app
+    
+    async with make_client(fastapi_app) as client:
+        await client.get("/api/v1/activities")
+        async with write_session() as db:
+            await ActivityService(db).create_activity(ActivityCreate(
+                intervals_icu_id="cache-new",
+                name="cache-new",
+                type="Ride",
+                start_date=datetime(2030, 1, 1)
+            ))
+        response = await client.get("/api/v1/activities")
+    
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.json()[0]["intervals_icu_id"] == "cache-new"
+
+
+async def test_other_workers_write_is_seen_after_the_check_interval(database, memory_cache):
+    from app.main import app as fastapi_app
+    
+    async with make_client(fastapi_app) as client:
+        await client.get("/api/v1/activities/summary")
+        
+        # Another worker commits: the shared row is bumped, this process gets no commit event
+        with sqlite3.connect(DATABASE_URL.split(":///", 1)[1]) as connection:
+            connection.execute("UPDATE cache_generation SET value = value + 1 WHERE id = 1")
+        within_interval = await client.get("/api/v1/activities/summary")
+        
+        memory_cache.generation_check = 0
+        after_interval = await client.get("/api/v1/activities/summary")
+    
+    assert within_interval.headers["X-Cache"] == "HIT"
+    assert after_interval.headers["X-Cache"] == "MISS"
+
+
+async def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    await cache.set("a", b"1")
+    await cache.set("b", b"2")
+    await cache.get("a")
+    
+    await cache.set("c", b"3")
+    
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"1"
+    assert await cache.get("c") == b"3"
+
+
+async def test_memory_cache_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(app.cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = MemoryCache()
+    await cache.set("a", b"1", ex=300)
+    
+    now[0] += 299
+    assert await cache.get("a") == b"1"
+    now[0] += 1
+    assert await cache.get("a") is None
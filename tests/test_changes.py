@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import SessionLocal, write_session
+from app.schemas.activity import ActivityCreate, ActivityUpdate
+from app.services.activity_service import ActivityService
+
+
+async def changes(since=None, limit=500):
+    async with SessionLocal() as db:
+        return await ActivityService(db).get_changes(since, limit)
+
+
+async def latest_token() -> str:
+    feed = await changes(limit=100000)
+    return feed["next_token"]
+
+
+async def create(intervals_icu_id: str):
+    async with write_session() as db:
+        return await ActivityService(db).create_activity(ActivityCreate(
+            intervals_icu_id=intervals_icu_id,
+            name=intervals_icu_id,
+            type="Ride",
+            start_date=datetime(2024, 2, 1, 8)
+        ))
+
+
+async def test_deletion_leaves_a_tombstone(database):
+    kept = await create("changes-kept")
+    deleted = await create("changes-deleted")
+    since = await latest_token()
+    
+    async with write_session() as db:
+        activity_service = ActivityService(db)
+        await activity_service.update_activity(kept.id, ActivityUpdate(name="renamed"))
+        assert await activity_service.delete_activity(deleted.id)
+    
+    feed = await changes(since)
+    
+    assert [(row["id"], row["name"]) for row in feed["upserted"]] == [(kept.id, "renamed")]
+    assert [(row["id"], row["intervals_icu_id"]) for row in feed["deleted"]] == [(deleted.id, "changes-deleted")]
+    assert feed["deleted"][0]["deleted_at"] is not None
+    assert not feed["has_more"]
+
+
+async def test_activity_created_and_deleted_since_the_token_is_only_a_tombstone(database):
+    since = await latest_token()
+    activity = await create("changes-short-lived")
+    async with write_session() as db:
+        await ActivityService(db).delete_activity(activity.id)
+    
+    feed = await changes(since)
+    
+    assert feed["upserted"] == []
+    assert [row["intervals_icu_id"] for row in feed["deleted"]] == ["changes-short-lived"]
+
+
+async def test_batches_resume_after_the_last_change(database):
+    since = await latest_token()
+    created = [await create(f"changes-batch-{index}") for index in range(3)]
+    async with write_session() as db:
+        await ActivityService(db).delete_activity(created[1].id)
+    
+    first = await changes(since, limit=2)
+    second = await changes(first["next_token"], limit=2)
+    
+    assert first["has_more"]
+    assert not second["has_more"]
+    # The deleted activity is only reported by its tombstone
+    assert [row["id"] for row in first["upserted"] + second["upserted"]] == [created[0].id, created[2].id]
+    assert [row["id"] for row in first["deleted"] + second["deleted"]] == [created[1].id]
+
+
+async def test_empty_feed_keeps_the_token(database):
+    since = await latest_token()
+    
+    feed = await changes(since)
+    
+    assert feed == {"upserted": [], "deleted": [], "next_token": since, "has_more": False}
+
+
+def test_invalid_token_raises_value_error():
+    with pytest.raises(ValueError, match="Invalid change token"):
+        ActivityService.decode_change_token("not-a-token")
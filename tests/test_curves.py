@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.services.curve_service import CURVE_DURATIONS, mean_max_curve, normalized_power, resample_1hz, training_load
+
+
+def mean_max_loop(values, duration):
+    """Reference brute-force best average over ``duration`` samples"""
+    return max(np.nansum(values[start:start + duration]) / duration for start in range(len(values) - duration + 1))
+
+
+def test_mean_max_curve_matches_brute_force():
+    values = np.random.default_rng(3).uniform(0, 600, 400)
+    durations = np.array([1, 5, 30, 60, 399, 400])
+    
+    curve = mean_max_curve(values, durations)
+    
+    np.testing.assert_allclose(curve, [mean_max_loop(values, duration) for duration in durations])
+
+
+def test_durations_longer_than_the_series_are_nan():
+    curve = mean_max_curve(np.full(90, 200.0))
+    
+    assert np.isnan(curve[CURVE_DURATIONS > 90]).all()
+    np.testing.assert_allclose(curve[CURVE_DURATIONS <= 90], 200.0)
+
+
+def test_curve_never_increases_with_duration():
+    curve = mean_max_curve(np.random.default_rng(4).uniform(0, 1000, 4000))
+    
+    valid = curve[~np.isnan(curve)]
+    assert (np.diff(valid) <= 1e-9).all()
+
+
+def test_gaps_count_as_zero():
+    values = np.array([300.0, np.nan, 300.0])
+    
+    np.testing.assert_allclose(mean_max_curve(values, np.array([1, 3])), [300.0, 200.0])
+
+
+def test_resample_places_samples_on_a_one_second_grid():
+    grid = resample_1hz(np.array([10.0, 11.0, 14.0]), np.array([100.0, 110.0, 140.0]))
+    
+    np.testing.assert_array_equal(np.isnan(grid), [False, False, True, True, False])
+    np.testing.assert_allclose(grid[[0, 1, 4]], [100.0, 110.0, 140.0])
+
+
+def test_normalized_power_of_steady_ride_equals_its_power():
+    assert normalized_power(np.full(3600, 250.0)) == pytest.approx(250.0)
+    assert normalized_power(np.full(10, 250.0)) is None
+
+
+def test_one_hour_at_ftp_is_100_tss():
+    intensity, tss = training_load(250.0, 3600, 250.0)
+    
+    assert intensity == pytest.approx(1.0)
+    assert tss == pytest.approx(100.0)
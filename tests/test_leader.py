@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import LeaderLease, SessionLocal, SyncState, write_session
+from app.services.leader import LeaderElection, LeaseLostError
+
+
+async def nothing():
+    pass
+
+
+@pytest.fixture
+def election_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "LEADER_ELECTION", True)
+
+
+async def commit_state(name: str) -> None:
+    async with write_session() as db:
+        db.add(SyncState(name=name))
+        await db.commit()
+
+
+async def stored_states():
+    async with SessionLocal() as db:
+        return set(await db.scalars(select(SyncState.name)))
+
+
+async def test_only_the_current_lease_holder_commits_fenced_writes(database, election_enabled):
+    old = LeaderElection("fence-test", nothing, nothing)
+    new = LeaderElection("fence-test", nothing, nothing)
+    await old._step()
+    
+    with old.fenced():
+        await commit_state("fence-leader")
+    
+    # The lease expires without the old leader noticing, and another process takes it over
+    async with write_session() as db:
+        await db.execute(
+            update(LeaderLease).where(LeaderLease.name == "fence-test").values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+    await new._step()
+    assert old.is_leader and new.is_leader
+    
+    with pytest.raises(LeaseLostError):
+        with old.fenced():
+            await commit_state("fence-stale")
+    with new.fenced():
+        await commit_state("fence-new-leader")
+    
+    assert {"fence-leader", "fence-new-leader"} <= await stored_states()
+    assert "fence-stale" not in await stored_states()
+
+
+async def test_writes_outside_the_fence_are_not_checked(database, election_enabled):
+    follower = LeaderElection("fence-test-follower", nothing, nothing)
+    
+    await commit_state("unfenced")
+    with pytest.raises(LeaseLostError):
+        with follower.fenced():
+            await commit_state("fenced-follower")
+    
+    assert "unfenced" in await stored_states()
+    assert "fenced-follower" not in await stored_states()
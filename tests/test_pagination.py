@@ -0,0 +1,31 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.activity_service import ActivityService
+
+
+def test_cursor_round_trip():
+    activity = SimpleNamespace(start_date=datetime(2024, 5, 1, 7, 30, 15), id=42)
+    
+    cursor = ActivityService.encode_cursor(activity)
+    
+    assert ActivityService.decode_cursor(cursor) == (datetime(2024, 5, 1, 7, 30, 15), 42)
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    activity = SimpleNamespace(start_date=datetime(2024, 5, 1, 7, 30, 15, 123456), id=123456789)
+    
+    cursor = ActivityService.encode_cursor(activity)
+    
+    assert "=" not in cursor
+    assert "+" not in cursor and "/" not in cursor
+    assert ActivityService.decode_cursor(cursor) == (activity.start_date, activity.id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "bnVsbA", "WyJ4IiwgMV0"])
+def test_invalid_cursor_raises_value_error(cursor):
+    # "bnVsbA" is null, "WyJ4IiwgMV0" is ["x", 1]
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        ActivityService.decode_cursor(cursor)
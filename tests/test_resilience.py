@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, CircuitOpenError, RetryBudget
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=10)
+    
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure("timeout")
+    assert breaker.state == "closed"
+    
+    breaker.before_call()
+    breaker.record_failure("timeout")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=10)
+    
+    breaker.record_failure("timeout")
+    breaker.record_success()
+    breaker.record_failure("timeout")
+    
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=10)
+    breaker.record_failure("timeout")
+    
+    clock.now += 10
+    breaker.before_call()
+    
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_trial_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_seconds=10)
+    for _ in range(5):
+        breaker.record_failure("timeout")
+    
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_failure("still down")
+    
+    assert breaker.state == "open"
+    assert breaker.snapshot()["retry_in_seconds"] == 10
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_abandoned_trial_expires_after_a_reset_period(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=10)
+    breaker.record_failure("timeout")
+    clock.now += 10
+    breaker.before_call()
+    
+    # The trial never reports back (e.g. it was cancelled)
+    clock.now += 10
+    breaker.before_call()
+    
+    assert breaker.state == "half_open"
+
+
+def test_retry_budget_allows_minimum_plus_ratio_of_requests(clock):
+    budget = RetryBudget(ratio=0.2, min_retries=2, window=10)
+    for _ in range(10):
+        budget.record_request()
+    
+    assert [budget.try_retry() for _ in range(5)] == [True, True, True, True, False]
+
+
+def test_retry_budget_refills_after_the_window(clock):
+    budget = RetryBudget(ratio=0.0, min_retries=1, window=10)
+    
+    assert budget.try_retry()
+    assert not budget.try_retry()
+    
+    clock.now += 10
+    assert budget.try_retry()
+
+
+def test_athletes_share_the_rate_limit_of_their_api_key():
+    from app.services.intervals_client import IntervalsICUClient
+    
+    client = IntervalsICUClient(api_key="coach", athlete_id="i0")
+    
+    # Athletes without a key of their own fall back to the coach's key and its bucket
+    assert client.for_athlete("i1").rate_limiter is client.for_athlete("i2").rate_limiter is client.rate_limiter
+    assert client.for_athlete("i3", "own-key").rate_limiter is not client.rate_limiter
+    assert client.for_athlete("i4", "own-key").rate_limiter is client.for_athlete("i3", "own-key").rate_limiter
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.database import ActivityStream
+from app.services.stream_service import decode_stream, downsample, encode_stream
+
+
+def round_trip(values: np.ndarray, scale: float) -> np.ndarray:
+    data, missing = encode_stream(values, scale)
+    return decode_stream(ActivityStream(length=len(values), scale=scale, data=data, missing=missing))
+
+
+@pytest.mark.parametrize("scale", [1, 10, 1000])
+def test_round_trip_at_the_stored_precision(scale):
+    values = np.random.default_rng(2).uniform(0, 1500, 3600)
+    
+    decoded = round_trip(values, scale)
+    
+    np.testing.assert_allclose(decoded, np.rint(values * scale) / scale)
+
+
+def test_nulls_come_back_as_nan():
+    values = np.array([np.nan, np.nan, 200.0, 210.0, np.nan, np.nan, 190.0, np.nan])
+    
+    data, missing = encode_stream(values, 1)
+    decoded = decode_stream(ActivityStream(length=len(values), scale=1, data=data, missing=missing))
+    
+    assert missing is not None
+    np.testing.assert_array_equal(np.isnan(decoded), np.isnan(values))
+    np.testing.assert_array_equal(decoded[~np.isnan(values)], values[~np.isnan(values)])
+
+
+def test_complete_stream_has_no_null_bitmap():
+    _, missing = encode_stream(np.arange(100, dtype=np.float64), 1)
+    
+    assert missing is None
+
+
+def test_negative_values_and_large_jumps():
+    values = np.array([-50.0, 8848.0, -430.5, 0.0, 2000000.0])
+    
+    np.testing.assert_allclose(round_trip(values, 10), values)
+
+
+def test_constant_stream_compresses_to_runs_of_zero_deltas():
+    data, _ = encode_stream(np.full(36000, 250.0), 1)
+    
+    assert len(data) < 36000 * 4 / 100
+
+
+def test_downsample_ignores_nulls():
+    values = np.array([100.0, np.nan, 300.0, np.nan, np.nan, 50.0])
+    
+    means = downsample(values, np.array([0, 3, 5]))
+    
+    np.testing.assert_array_equal(np.isnan(means), [False, True, False])
+    np.testing.assert_allclose(means[[0, 2]], [200.0, 50.0])
@@ -0,0 +1,147 @@
+from datetime import date, datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import delete
+
+import app.routers.activities
+import app.services.sync_jobs
+from app.database import SyncJob, write_session
+from app.schemas.athlete import AthleteCreate
+from app.services.athlete_service import AthleteService
+from app.services.sync_jobs import SyncJobRunner, subtract_ranges
+
+
+def d(day: int) -> date:
+    return date(2024, 1, day)
+
+
+def test_nothing_covered():
+    assert subtract_ranges(d(1), d(31), []) == [(d(1), d(31))]
+
+
+def test_fully_covered():
+    assert subtract_ranges(d(5), d(10), [(d(1), d(31))]) == []
+
+
+def test_covered_middle_splits_the_range():
+    assert subtract_ranges(d(1), d(31), [(d(10), d(20))]) == [(d(1), d(9)), (d(21), d(31))]
+
+
+def test_overlapping_ends_are_trimmed():
+    assert subtract_ranges(d(5), d(25), [(d(1), d(10)), (d(20), d(31))]) == [(d(11), d(19))]
+
+
+def test_disjoint_ranges_are_ignored():
+    assert subtract_ranges(d(10), d(20), [(d(1), d(9)), (d(21), d(31))]) == [(d(10), d(20))]
+
+
+def test_days_are_inclusive():
+    assert subtract_ranges(d(1), d(3), [(d(2), d(2))]) == [(d(1), d(1)), (d(3), d(3))]
+    assert subtract_ranges(d(1), d(1), [(d(1), d(1))]) == []
+
+
+@pytest.fixture
+async def runner(database):
+    async with write_session() as db:
+        await db.execute(delete(SyncJob))
+        await db.commit()
+    # Not started: submitted jobs stay queued
+    return SyncJobRunner()
+
+
+async def test_overlapping_submission_only_queues_missing_days(runner):
+    first = await runner.submit(d(1), d(15))
+    
+    second = await runner.submit(d(10), d(31))
+    
+    assert not second.deduplicated
+    assert (second.oldest, second.newest) == (d(16), d(31))
+    assert second.related_job_ids == [first.id]
+
+
+async def test_capped_submission_is_deduplicated_only_by_a_containing_job(runner):
+    overlapping = await runner.submit(d(1), d(10), limit=10)
+    unlimited = await runner.submit(d(1), d(31))
+    
+    status = await runner.submit(d(5), d(20), limit=10)
+    
+    # The capped job only overlaps the request; the unlimited one contains it
+    assert status.deduplicated
+    assert status.id == unlimited.id != overlapping.id
+
+
+async def test_capped_submission_with_another_limit_is_queued(runner):
+    await runner.submit(d(1), d(10), limit=10)
+    
+    status = await runner.submit(d(1), d(10), limit=5)
+    
+    assert not status.deduplicated
+
+
+class WindowsClient:
+    """Records where a job starts walking its windows; every window is empty"""
+    
+    def __init__(self):
+        self.walked_from = None
+    
+    async def fetch_activities(self, oldest, newest, limit):
+        return []
+    
+    async def iter_activity_windows(self, oldest, newest, window_days):
+        self.walked_from = oldest
+        return
+        yield
+
+
+async def test_interrupted_job_resumes_after_its_last_page(runner, monkeypatch):
+    client = WindowsClient()
+    monkeypatch.setattr(app.services.sync_jobs, "intervals_client", client)
+    status = await runner.submit(date(2024, 1, 1), date(2024, 12, 31))
+    async with write_session() as db:
+        job = await db.get(SyncJob, status.id)
+        # Left running by a previous leader after two 30-day pages
+        job.status, job.started_at = "running", datetime(2024, 1, 1)
+        job.pages_fetched, job.activities_fetched = 2, 7
+        await db.commit()
+    
+    await runner._run(status.id)
+    
+    assert client.walked_from == date(2024, 3, 1)
+    async with write_session() as db:
+        job = await db.get(SyncJob, status.id)
+        assert (job.status, job.pages_fetched, job.activities_fetched) == ("success", 2, 7)
+
+
+async def test_capped_job_starts_over(runner, monkeypatch):
+    monkeypatch.setattr(app.services.sync_jobs, "intervals_client", WindowsClient())
+    status = await runner.submit(date(2024, 1, 1), date(2024, 12, 31), limit=10)
+    async with write_session() as db:
+        job = await db.get(SyncJob, status.id)
+        job.status, job.started_at = "running", datetime(2024, 1, 1)
+        job.activities_fetched = 7
+        await db.commit()
+    
+    await runner._run(status.id)
+    
+    async with write_session() as db:
+        job = await db.get(SyncJob, status.id)
+        assert (job.status, job.pages_fetched, job.activities_fetched) == ("success", 1, 0)
+
+
+async def test_sync_endpoint_queues_a_job_for_the_athlete(runner, monkeypatch):
+    monkeypatch.setattr(app.routers.activities, "sync_job_runner", runner)
+    api = FastAPI()
+    api.include_router(app.routers.activities.router, prefix="/api/v1")
+    async with write_session() as db:
+        athlete = await AthleteService(db).create_athlete(AthleteCreate(intervals_icu_athlete_id="i-sync-endpoint"))
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://test") as client:
+        params = {"oldest": "2024-01-01", "newest": "2024-01-31"}
+        queued = await client.post("/api/v1/activities/sync", params={**params, "athlete_id": athlete.id})
+        unknown = await client.post("/api/v1/activities/sync", params={**params, "athlete_id": 999999})
+    
+    assert queued.status_code == 202
+    assert queued.json()["athlete_id"] == athlete.id
+    assert unknown.status_code == 404